@@ -1,31 +1,113 @@
 from django.contrib import admin
+
+from . import reviews
 from .models import (
     Student, Department, Faculty, Hostel, Bursary, StudentClearanceRequests
 )
+from .pagination import EstimatedCountPaginator, UnitCountPaginator
+from .search import prefix_match
+
+
+class StudentSearchMixin:
+    """
+    Searches by prefix of the student's matric number, first name or last name through the indexes on
+    Student, where the default search runs LIKE '%term%' on every row. Each word of the search must match.
+    """
+    student_field = 'student__'
+    search_fields = ['student__matric_number', 'student__first_name', 'student__last_name']  # Shows the search box
+    search_help_text = 'Start of a matric number, first name or last name'
+
+    def get_search_results(self, request, queryset, search_term):
+        for word in search_term.split():
+            queryset = queryset.filter(
+                prefix_match(f'{self.student_field}matric_number', word)
+                | prefix_match(f'{self.student_field}last_name', word)
+                | prefix_match(f'{self.student_field}first_name', word)
+            )
+        return queryset, False
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """
+    Changelist settings for tables with tens of thousands of rows
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False  # Skips the second COUNT(*) of the unfiltered table when a filter is applied
+
+
+class UnitNameFilter(admin.SimpleListFilter):
+    """
+    Filters on the names of the proxy's own unit; the shared name column lists every unit's
+    """
+    title = "name"
+    parameter_name = "name"
+
+    def lookups(self, request, model_admin):
+        return model_admin.model.NAME_CHOICES
+
+    def queryset(self, request, queryset):
+        return queryset.filter(name=self.value()) if self.value() else queryset
+
+
+class ClearanceRequirementAdmin(StudentSearchMixin, LargeTableAdmin):
+    paginator = UnitCountPaginator
+    list_select_related = ["student"]  # student.__str__ would otherwise query per row
+    list_filter = ["session", "semester", "status"]
+    raw_id_fields = ["student", "documents"]  # Select widgets would load every student and document
+    exclude = ["unit_type", "total_amount_paid", "total_fees", "outstanding_fees"]
+    actions = ["mark_completed", "mark_incomplete"]
+
+    def formfield_for_choice_field(self, db_field, request, **kwargs):
+        if db_field.name == "name":
+            kwargs["choices"] = self.model.NAME_CHOICES
+        return super().formfield_for_choice_field(db_field, request, **kwargs)
+
+    def mark_as(self, request, queryset, status):
+        changed = reviews.set_status(queryset, status)
+        self.message_user(request, f"Marked {changed} {self.model._meta.verbose_name_plural} {status}.")
+
+    @admin.action(description="Mark selected as completed", permissions=["change"])
+    def mark_completed(self, request, queryset):
+        self.mark_as(request, queryset, "completed")
+
+    @admin.action(description="Mark selected as incomplete", permissions=["change"])
+    def mark_incomplete(self, request, queryset):
+        self.mark_as(request, queryset, "incomplete")
 
 
-class DepartmentAdmin(admin.ModelAdmin):
-    list_display = ["student", "semester", "session", "name"]  # Display department name
+class DepartmentAdmin(ClearanceRequirementAdmin):
+    list_display = ["student", "semester", "session", "name", "status"]  # Display department name
+    list_filter = ClearanceRequirementAdmin.list_filter + [UnitNameFilter]
 
 
-class FacultyAdmin(admin.ModelAdmin):
-    list_display = ["student", "semester", "session", "name"]  # Display faculty name
+class FacultyAdmin(ClearanceRequirementAdmin):
+    list_display = ["student", "semester", "session", "name", "status"]  # Display faculty name
+    list_filter = ClearanceRequirementAdmin.list_filter + [UnitNameFilter]
 
 
-class HostelAdmin(admin.ModelAdmin):
-    list_display = ["student", "semester", "session", "name"]  # Display hostel name
+class HostelAdmin(ClearanceRequirementAdmin):
+    list_display = ["student", "semester", "session", "name", "status"]  # Display hostel name
+    list_filter = ClearanceRequirementAdmin.list_filter + [UnitNameFilter]
 
 
-class BursaryAdmin(admin.ModelAdmin):
-    list_display = ["student", "semester", "session", "total_amount_paid", "total_fees", "outstanding_fees"]  # Display financial details
+class BursaryAdmin(ClearanceRequirementAdmin):
+    list_display = ["student", "semester", "session", "total_amount_paid", "total_fees", "outstanding_fees", "status"]  # Display financial details
+    exclude = ["unit_type", "name"]
 
 
-class StudentAdmin(admin.ModelAdmin):
+class StudentAdmin(StudentSearchMixin, LargeTableAdmin):
     list_display = ["user", "first_name", "last_name", "matric_number", "email"]  # Display student details
+    list_select_related = ["user"]
+    student_field = ''
+    search_fields = ["matric_number", "first_name", "last_name"]
+    raw_id_fields = ["user"]
 
 
-class StudentClearanceRequestsAdmin(admin.ModelAdmin):
+class StudentClearanceRequestsAdmin(StudentSearchMixin, LargeTableAdmin):
     list_display = ["student", "semester", "session"]  # Display student, semester, and session
+    list_select_related = ["student"]
+    list_filter = ["session", "semester"]
+    raw_id_fields = ["student", "faculty", "department", "hostel", "bursary"]
 
 
 # Register the models with the admin site
@@ -0,0 +1,46 @@
+from collections import defaultdict
+
+from .models import ClearanceCounter, DEPARTMENT_CHOICES, FACULTY_CHOICES, HOSTEL_CHOICES
+
+# Names reported for every term, with zeros where nothing is counted yet; bursaries have a single unnamed row.
+# Uploading a document before the clearance request creates the requirement without a name, counted under ''
+UNNAMED = (('', 'Not yet requested'),)
+UNIT_NAMES = {
+    'department': DEPARTMENT_CHOICES + UNNAMED,
+    'faculty': FACULTY_CHOICES + UNNAMED,
+    'hostel': HOSTEL_CHOICES + UNNAMED,
+    'bursary': (('', 'Bursary'),),
+}
+STATUSES = ('pending', 'completed', 'incomplete')
+
+
+def completion_rates(session=None, semester=None, unit=None):
+    """
+    Requirement counts and completion rate per unit, name and term, read from ClearanceCounter in one query
+    """
+    counters = ClearanceCounter.objects.all()
+    for field, value in (('session', session), ('semester', semester), ('unit', unit)):
+        if value:
+            counters = counters.filter(**{field: value})
+
+    counts = defaultdict(int)
+    terms = set()
+    for row_unit, name, row_session, row_semester, status, count in counters.values_list(
+            'unit', 'name', 'session', 'semester', 'status', 'count'):
+        counts[(row_unit, name, row_session, row_semester, status)] += count
+        terms.add((row_session, row_semester))
+
+    results = []
+    for term_session, term_semester in sorted(terms):
+        for row_unit, names in UNIT_NAMES.items():
+            if unit and row_unit != unit:
+                continue
+            for name, label in names:
+                row = {'unit': row_unit, 'name': name, 'label': label, 'session': term_session,
+                       'semester': term_semester}
+                row.update({status: counts[(row_unit, name, term_session, term_semester, status)]
+                            for status in STATUSES})
+                row['total'] = sum(row[status] for status in STATUSES)
+                row['completion_rate'] = round(row['completed'] / row['total'], 4) if row['total'] else 0.0
+                results.append(row)
+    return results
@@ -1,71 +1,313 @@
-from rest_framework import viewsets, serializers
-from rest_framework.permissions import IsAuthenticated
+import hashlib
 
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.http import parse_etags
+from rest_framework import viewsets, serializers, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import PermissionDenied
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from . import metrics, reviews
+from .analytics import completion_rates
+from .caching import cache_stats, model_generation
 from .models import (
-    Student, Department, Faculty, Hostel, Bursary, StudentClearanceRequests, ClearanceDocument
+    Student, Department, Faculty, Hostel, Bursary, StudentClearanceRequests, ClearanceDocument,
+    ClearanceStatusSummary, ChunkedUpload, REQUIREMENT_MODELS, prefetch_unit_documents
 )
+from .routers import ReplicaReadMixin
+from .search import search_students
 from .serializers import ( DepartmentSerializer, FacultySerializer, HostelSerializer,
-    BursarySerializer, StudentSerializer, StudentClearanceRequestsSerializer, ClearanceDocumentSerializer
+    BursarySerializer, StudentSerializer, StudentClearanceRequestsSerializer, ClearanceDocumentSerializer,
+    ClearanceStatusSummarySerializer, StudentClearanceRequestsListSerializer,
+    ChunkedUploadSerializer, BulkReviewSerializer
 )
+from .uploads import UploadError, append_chunk, finalize_upload
+
+
+class QueryParamFilterMixin:
+    """
+    Filters the queryset on exact query parameters listed in ``filter_fields``; commas select several values
+    """
+    filter_fields = ()
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        for field in self.filter_fields:
+            value = self.request.query_params.get(field)
+            if not value:
+                continue
+            values = [item.strip() for item in value.split(',') if item.strip()]
+            if len(values) == 1:
+                queryset = queryset.filter(**{field: values[0]})
+            else:
+                queryset = queryset.filter(**{f'{field}__in': values})
+        return queryset
+
 
-class ClearanceDocumentViewSet(viewsets.ReadOnlyModelViewSet):
+class CachedResponseMixin:
+    """
+    Caches list and retrieve responses per URL under the model's generation number, which saves and deletes bump.
+    Clients repeating the returned ETag in If-None-Match get a 304 without the model being queried.
+    """
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        model = self.get_queryset().model
+        url = f'{request.accepted_renderer.format}:{request.build_absolute_uri()}'
+        digest = hashlib.sha1(url.encode()).hexdigest()[:16]
+        etag = f'"{model._meta.model_name}-{model_generation(model)}-{digest}"'
+
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            metrics.inc('api_response_cache_total', model=model._meta.model_name, outcome='not_modified')
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+        key = f'api_response:{etag}'
+        data = cache.get(key)
+        metrics.inc('api_response_cache_total', model=model._meta.model_name,
+                    outcome='miss' if data is None else 'hit')
+        if data is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            cache.set(key, response.data, settings.API_RESPONSE_CACHE_TIMEOUT)
+        else:
+            response = Response(data)
+        response['ETag'] = etag
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
+
+
+class ClearanceDocumentViewSet(ReplicaReadMixin, CachedResponseMixin, QueryParamFilterMixin, viewsets.ReadOnlyModelViewSet):
     """
     API endpoint for viewing clearance requirements
     """
     permission_classes = [IsAuthenticated]  # Require authentication
     queryset = ClearanceDocument.objects.all()
     serializer_class = ClearanceDocumentSerializer
+    filter_fields = ('document_type',)
 
 
-class DepartmentViewSet(viewsets.ReadOnlyModelViewSet):
+class DepartmentViewSet(ReplicaReadMixin, CachedResponseMixin, QueryParamFilterMixin, viewsets.ReadOnlyModelViewSet):
     """
     API endpoint for viewing departments
     """
     permission_classes = [IsAuthenticated]  # Require authentication
-    queryset = Department.objects.all()
+    queryset = Department.objects.prefetch_related('documents')
     serializer_class = DepartmentSerializer
+    filter_fields = ('session', 'semester', 'status', 'name')
 
 
-class FacultyViewSet(viewsets.ReadOnlyModelViewSet):
+class FacultyViewSet(ReplicaReadMixin, CachedResponseMixin, QueryParamFilterMixin, viewsets.ReadOnlyModelViewSet):
     """
     API endpoint for viewing faculties
     """
     permission_classes = [IsAuthenticated]  # Require authentication
-    queryset = Faculty.objects.all()
+    queryset = Faculty.objects.prefetch_related('documents')
     serializer_class = FacultySerializer
+    filter_fields = ('session', 'semester', 'status', 'name')
 
 
-class HostelViewSet(viewsets.ReadOnlyModelViewSet):
+class HostelViewSet(ReplicaReadMixin, CachedResponseMixin, QueryParamFilterMixin, viewsets.ReadOnlyModelViewSet):
     """
     API endpoint for viewing hostels
     """
     permission_classes = [IsAuthenticated]  # Require authentication
-    queryset = Hostel.objects.all()
+    queryset = Hostel.objects.prefetch_related('documents')
     serializer_class = HostelSerializer
+    filter_fields = ('session', 'semester', 'status', 'name')
 
 
-class BursaryViewSet(viewsets.ReadOnlyModelViewSet):
+class BursaryViewSet(ReplicaReadMixin, CachedResponseMixin, QueryParamFilterMixin, viewsets.ReadOnlyModelViewSet):
     """
     API endpoint for viewing bursary information
     """
     permission_classes = [IsAuthenticated]  # Require authentication
-    queryset = Bursary.objects.all()
+    queryset = Bursary.objects.prefetch_related('documents')
     serializer_class = BursarySerializer
+    filter_fields = ('session', 'semester', 'status')
 
 
-class StudentViewSet(viewsets.ModelViewSet):
+class StudentViewSet(QueryParamFilterMixin, viewsets.ModelViewSet):
     """
     API endpoint for managing student data (create, view, update, delete)
     """
     permission_classes = [IsAuthenticated]  # Require authentication
-    queryset = Student.objects.all()
+    queryset = Student.objects.select_related('user')
     serializer_class = StudentSerializer
+    filter_fields = ('matric_number', 'email')
 
+    @action(detail=False, permission_classes=[IsAdminUser])
+    def search(self, request):
+        """
+        Students whose matric number, names or email start with each word of ``q``, best match first;
+        ``limit`` caps the results at STUDENT_SEARCH_MAX_RESULTS
+        """
+        try:
+            limit = int(request.query_params.get('limit', settings.STUDENT_SEARCH_RESULTS))
+        except ValueError:
+            raise serializers.ValidationError({'limit': 'Must be a number.'})
+        limit = min(max(limit, 1), settings.STUDENT_SEARCH_MAX_RESULTS)
+        students = search_students(request.query_params.get('q', ''), limit)
+        return Response({'results': self.get_serializer(students, many=True).data})
 
-class StudentClearanceRequestsViewSet(viewsets.ModelViewSet):
+
+class StudentClearanceRequestsViewSet(QueryParamFilterMixin, viewsets.ModelViewSet):
     """
     API endpoint for managing student clearance requests
     """
     permission_classes = [IsAuthenticated]  # Require authentication
-    queryset = StudentClearanceRequests.objects.all()
+    queryset = StudentClearanceRequests.objects.with_clearance_graph()
     serializer_class = StudentClearanceRequestsSerializer
+    filter_fields = ('session', 'semester')
+
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return StudentClearanceRequestsListSerializer  # Skip per-field ModelSerializer work on large pages
+        return super().get_serializer_class()
+
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        if page is not None:
+            prefetch_unit_documents(page)
+        return page
+
+    def get_object(self):
+        clearance_request = super().get_object()
+        prefetch_unit_documents([clearance_request])
+        return clearance_request
+
+
+class ClearanceStatusSummaryViewSet(ReplicaReadMixin, QueryParamFilterMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    API endpoint for viewing clearance status summaries, limited to the caller's own for students
+    """
+    permission_classes = [IsAuthenticated]  # Require authentication
+    serializer_class = ClearanceStatusSummarySerializer
+    filter_fields = ('session', 'semester')
+
+    def get_queryset(self):
+        queryset = ClearanceStatusSummary.objects.order_by('-semester', '-session')
+        if self.request.user.is_staff or self.request.user.is_superuser:
+            return queryset
+        return queryset.filter(student_id=self.request.user.pk)  # Student primary key is the user id
+
+
+class ChunkedUploadViewSet(viewsets.GenericViewSet):
+    """
+    API endpoint for resumable document uploads: create, append chunks by offset, then finalize
+    """
+    permission_classes = [IsAuthenticated]  # Require authentication
+    serializer_class = ChunkedUploadSerializer
+    pagination_class = None
+
+    def get_student(self):
+        try:
+            return Student.objects.get(user=self.request.user)
+        except Student.DoesNotExist:
+            raise PermissionDenied('Only students can upload clearance documents.')
+
+    def get_queryset(self):
+        return ChunkedUpload.objects.filter(student_id=self.request.user.pk)  # Student primary key is the user id
+
+    def create(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save(student=self.get_student())
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    def retrieve(self, request, pk=None):
+        return Response(self.get_serializer(self.get_object()).data)
+
+    @action(detail=True, methods=['put'], parser_classes=[])
+    def chunk(self, request, pk=None):
+        """
+        Append the raw request body at the ``Upload-Offset`` header; a mismatch answers 409 with the offset to resume from
+        """
+        try:
+            offset = int(request.headers.get('Upload-Offset', ''))
+            length = int(request.headers.get('Content-Length', ''))
+        except ValueError:
+            return Response({'detail': 'Upload-Offset and Content-Length headers are required.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            upload = self.get_queryset().select_for_update().get(pk=self.get_object().pk)
+            try:
+                append_chunk(upload, offset, request.stream, length)
+            except UploadError as error:
+                return Response({'detail': str(error), 'offset': error.offset}, status=status.HTTP_409_CONFLICT)
+        return Response(self.get_serializer(upload).data)
+
+    @action(detail=True, methods=['post'])
+    def finalize(self, request, pk=None):
+        with transaction.atomic():  # Locked like chunk, so a repeated finalize sees the first one's status
+            upload = self.get_queryset().select_for_update().get(pk=self.get_object().pk)
+            try:
+                finalize_upload(upload, sha256=request.data.get('sha256'))
+            except UploadError as error:
+                return Response({'detail': str(error), 'offset': error.offset}, status=status.HTTP_409_CONFLICT)
+        return Response(self.get_serializer(upload).data)
+
+
+class CacheStatsView(APIView):
+    """
+    API endpoint reporting hit and miss counters of the student page cache
+    """
+    permission_classes = [IsAdminUser]  # Staff only
+
+    def get(self, request):
+        return Response(cache_stats())
+
+
+class ClearanceAnalyticsView(APIView):
+    """
+    API endpoint reporting requirement counts and completion rates per department, faculty, hostel and bursary
+    for each session and semester, optionally filtered by ``session``, ``semester`` and ``unit``.
+    Read from the signal-maintained ClearanceCounter table and cached for CLEARANCE_ANALYTICS_CACHE_SECONDS.
+    """
+    permission_classes = [IsAdminUser]  # Staff only
+
+    def get(self, request):
+        filters = {field: request.query_params.get(field) or '' for field in ('session', 'semester', 'unit')}
+        key = 'clearance_analytics:' + ':'.join(filters.values())
+        results = cache.get(key)
+        if results is None:
+            results = completion_rates(**filters)
+            cache.set(key, results, settings.CLEARANCE_ANALYTICS_CACHE_SECONDS)
+        return Response({'results': results})
+
+
+class BulkReviewView(APIView):
+    """
+    API endpoint for officers to set the status of many requirements at once, listed by id or selected by a
+    filter; answers with a result per requirement (see MySite.reviews.review)
+    """
+    permission_classes = [IsAdminUser]  # Staff only
+
+    def post(self, request):
+        serializer = BulkReviewSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        items = data.get('items')
+        if items is None:
+            ids = list(REQUIREMENT_MODELS[data['type']].objects.filter(**data['filter']).order_by('pk').values_list(
+                'pk', flat=True,
+            )[:settings.BULK_REVIEW_MAX_ITEMS + 1])
+            if len(ids) > settings.BULK_REVIEW_MAX_ITEMS:
+                return Response({'filter': [f'Selects more than {settings.BULK_REVIEW_MAX_ITEMS} requirements.']},
+                                status=status.HTTP_400_BAD_REQUEST)
+            items = [(data['type'], pk, data['status']) for pk in ids]
+
+        results = reviews.review(items)
+        counts = {outcome: 0 for outcome in ('updated', 'unchanged', 'not_found', 'invalid_transition', 'duplicate')}
+        for result in results:
+            counts[result['result']] += 1
+        return Response({**counts, 'results': results})
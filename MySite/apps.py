@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class MysiteConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'MySite'
+
+    def ready(self):
+        from . import signals  # noqa: F401  Register model signal handlers
@@ -0,0 +1,78 @@
+"""
+Async versions of the read-heavy student views for ASGI deployments (see ASYNC_STUDENT_VIEWS)
+"""
+import asyncio
+import time
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, StreamingHttpResponse
+
+from .caching import acached_student_page, astudent_cache_version
+from .decorators import student_required
+from .events import format_event, subscribe
+from .routers import replica_reads
+from .views import clearance_status_context, status_summaries
+
+STATUS_FIELDS = ('department_status', 'faculty_status', 'hostel_status', 'bursary_status')
+
+
+@student_required
+async def student_dashboard_view(request):
+    student = request.student  # Resolved once by student_required
+
+    async def get_context():
+        return {'student': student}
+
+    return await acached_student_page(request, student, 'student_dashboard.html', get_context)
+
+
+@student_required
+@replica_reads
+async def student_clearance_status(request):
+    student = request.student  # Resolved once by student_required
+
+    async def get_context():
+        return clearance_status_context(student, await status_summaries(student).afirst())
+
+    return await acached_student_page(request, student, 'student_clearance_status.html', get_context)
+
+
+async def clearance_status_events(student, last_event_id):
+    """
+    Yield the student's clearance statuses whenever their page cache version moves past ``last_event_id``
+    """
+    yield format_event(None, retry=settings.STATUS_EVENTS_RETRY_MILLISECONDS)
+    deadline = time.monotonic() + settings.STATUS_EVENTS_MAX_SECONDS
+    with subscribe(student.pk) as changes:
+        while True:
+            version = str(await astudent_cache_version(student.pk))
+            if version != last_event_id:  # New stream, missed changes while reconnecting, or a fresh save
+                context = clearance_status_context(student, await status_summaries(student).afirst())
+                yield format_event({field: context[field] for field in STATUS_FIELDS}, event='status',
+                                   event_id=version)
+                last_event_id = version
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return  # The browser reconnects with Last-Event-ID after the retry delay
+            try:
+                await asyncio.wait_for(changes.get(), min(settings.STATUS_EVENTS_HEARTBEAT_SECONDS, remaining))
+            except asyncio.TimeoutError:
+                yield ': heartbeat\n\n'  # Comment line keeps proxies from closing an idle stream
+
+
+@student_required
+async def student_clearance_status_stream(request):
+    if not isinstance(request, ASGIRequest):
+        # A WSGI server buffers the whole stream before sending any of it, holding a worker for
+        # STATUS_EVENTS_MAX_SECONDS; 204 tells EventSource to stop reconnecting and keep the rendered page
+        return HttpResponse(status=204)
+    student = request.student  # Resolved once by student_required
+    response = StreamingHttpResponse(
+        clearance_status_events(student, request.headers.get('Last-Event-ID')),
+        content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Stop nginx from buffering the stream
+    return response
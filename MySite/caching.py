@@ -0,0 +1,119 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+
+STATS_KEYS = {'hits': 'student_page_cache:hits', 'misses': 'student_page_cache:misses'}
+
+
+def _version_key(student_id):
+    return f'student_page_cache:version:{student_id}'
+
+
+def student_cache_version(student_id):
+    """
+    Current version of a student's cached pages; starts from the clock so an evicted counter never reuses a value
+    """
+    key = _version_key(student_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, int(time.time() * 1000), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_student_cache_version(student_id):
+    """
+    Invalidate every cached page of the student by moving to a new version
+    """
+    try:
+        cache.incr(_version_key(student_id))
+    except ValueError:
+        student_cache_version(student_id)  # Missing counter restarts from the clock, past any old version
+
+
+def _count(outcome):
+    key = STATS_KEYS[outcome]
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 1, timeout=None)  # First count; a lost race only drops one count
+
+
+async def astudent_cache_version(student_id):
+    key = _version_key(student_id)
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, int(time.time() * 1000), timeout=None)
+        version = await cache.aget(key)
+    return version
+
+
+async def _acount(outcome):
+    key = STATS_KEYS[outcome]
+    try:
+        await cache.aincr(key)
+    except ValueError:
+        await cache.aadd(key, 1, timeout=None)
+
+
+def cache_stats():
+    stats = {outcome: cache.get(key, 0) for outcome, key in STATS_KEYS.items()}
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+    return stats
+
+
+def cached_student_page(request, student, template_name, get_context):
+    """
+    Render ``template_name`` for the student, reusing the cached HTML until the student's version changes
+    """
+    key = f'student_page_cache:{student.pk}:{student_cache_version(student.pk)}:{template_name}'
+    html = cache.get(key)
+    if html is None:
+        _count('misses')
+        html = render_to_string(template_name, get_context(), request=request)
+        cache.set(key, html, settings.STUDENT_PAGE_CACHE_TIMEOUT)
+    else:
+        _count('hits')
+    return HttpResponse(html)
+
+
+async def acached_student_page(request, student, template_name, aget_context):
+    """
+    Async cached_student_page; ``aget_context`` is a coroutine function and only runs on a miss
+    """
+    key = f'student_page_cache:{student.pk}:{await astudent_cache_version(student.pk)}:{template_name}'
+    html = await cache.aget(key)
+    if html is None:
+        await _acount('misses')
+        html = render_to_string(template_name, await aget_context(), request=request)
+        await cache.aset(key, html, settings.STUDENT_PAGE_CACHE_TIMEOUT)
+    else:
+        await _acount('hits')
+    return HttpResponse(html)
+
+
+def _generation_key(model):
+    return f'api_generation:{model._meta.label_lower}'
+
+
+def model_generation(model):
+    """
+    Generation number of a model's API responses; starts from the clock like the student page versions
+    """
+    key = _generation_key(model)
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, int(time.time() * 1000), timeout=None)
+        generation = cache.get(key)
+    return generation
+
+
+def bump_model_generation(model):
+    try:
+        cache.incr(_generation_key(model))
+    except ValueError:
+        model_generation(model)
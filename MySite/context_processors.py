@@ -0,0 +1,8 @@
+from .decorators import get_request_student
+
+
+def student(request):
+    """
+    Expose the logged-in student to every template as ``student``
+    """
+    return {'student': get_request_student(request)}
@@ -0,0 +1,22 @@
+"""
+SQLite backend accepting the ``transaction_mode`` option that Django only gained in 5.1.
+
+With ``'transaction_mode': 'IMMEDIATE'`` atomic blocks take the write lock when they begin. Under the default
+deferred BEGIN, a block that reads and then writes fails at once with "database is locked" if another writer
+got in first, whatever busy_timeout says.
+"""
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        kwargs.pop('transaction_mode', None)  # Not a sqlite3.connect() argument
+        return kwargs
+
+    def _start_transaction_under_autocommit(self):
+        transaction_mode = self.settings_dict['OPTIONS'].get('transaction_mode')
+        if transaction_mode:
+            self.cursor().execute(f'BEGIN {transaction_mode}')
+        else:
+            super()._start_transaction_under_autocommit()
@@ -0,0 +1,73 @@
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.contrib.auth.models import User
+from django.contrib.auth.views import redirect_to_login
+from django.shortcuts import redirect
+
+from .models import Student
+
+
+def get_request_student(request):
+    """
+    The Student for the logged-in user, resolved once per request; None for anonymous or non-student users
+    """
+    if not hasattr(request, '_cached_student'):
+        student = None
+        if request.user.is_authenticated:
+            try:
+                student = request.user.student  # Already joined by StudentModelBackend
+            except Student.DoesNotExist:
+                pass
+        request._cached_student = student
+    return request._cached_student
+
+
+async def aget_request_student(request):
+    """
+    Async get_request_student; only queries when the session user was loaded without its student
+    """
+    if not hasattr(request, '_cached_student'):
+        user = await request.auser()
+        student = None
+        if user.is_authenticated:
+            if User.student.is_cached(user):
+                student = getattr(user, 'student', None)
+            else:
+                student = await Student.objects.filter(pk=user.pk).afirst()
+        request._cached_student = student
+    return request._cached_student
+
+
+def student_required(view_func):
+    """
+    Require a logged-in student, turning staff and users without a profile back to login, and set request.student.
+    Works for both sync and async views.
+    """
+    if iscoroutinefunction(view_func):
+        async def async_wrapper(request, *args, **kwargs):
+            user = await request.auser()
+            if not user.is_authenticated:
+                return redirect_to_login(request.get_full_path())
+            request.user = user  # Templates then never trigger a sync user lookup
+            student = await aget_request_student(request)
+            if user.is_staff or user.is_superuser or student is None:
+                messages.error(request, "User does not have authorized access")
+                return redirect('login')  # Redirect staff/superuser to home
+            request.student = student
+            return await view_func(request, *args, **kwargs)
+
+        return markcoroutinefunction(wraps(view_func)(async_wrapper))
+
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        student = get_request_student(request)
+        if request.user.is_staff or request.user.is_superuser or student is None:
+            messages.error(request, "User does not have authorized access")
+            return redirect('login')  # Redirect staff/superuser to home
+        request.student = student
+        return view_func(request, *args, **kwargs)
+
+    return login_required(wrapper)
@@ -0,0 +1,60 @@
+"""
+In-process fan-out of clearance status changes to the open Server-Sent Events streams
+"""
+import asyncio
+import json
+import threading
+from contextlib import contextmanager
+
+_subscribers = {}  # student_id -> set of (event loop, queue)
+_lock = threading.Lock()
+
+
+@contextmanager
+def subscribe(student_id):
+    """
+    Register a queue that receives a nudge whenever the student's clearance status may have changed
+    """
+    subscriber = (asyncio.get_running_loop(), asyncio.Queue(maxsize=1))
+    with _lock:
+        _subscribers.setdefault(student_id, set()).add(subscriber)
+    try:
+        yield subscriber[1]
+    finally:
+        with _lock:
+            subscribers = _subscribers.get(student_id, set())
+            subscribers.discard(subscriber)
+            if not subscribers:
+                _subscribers.pop(student_id, None)
+
+
+def _nudge(queue):
+    if not queue.full():  # One pending nudge is enough; the stream re-reads the current status
+        queue.put_nowait(None)
+
+
+def publish(student_id):
+    """
+    Wake the student's streams; safe to call from any thread, e.g. a signal handler in a sync view
+    """
+    with _lock:
+        subscribers = list(_subscribers.get(student_id, ()))
+    for loop, queue in subscribers:
+        if not loop.is_closed():
+            loop.call_soon_threadsafe(_nudge, queue)
+
+
+def format_event(data, event=None, event_id=None, retry=None):
+    """
+    Encode one Server-Sent Events message
+    """
+    lines = []
+    if retry is not None:
+        lines.append(f'retry: {retry}')
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    if event is not None:
+        lines.append(f'event: {event}')
+    if data is not None:
+        lines.append(f'data: {json.dumps(data)}')
+    return '\n'.join(lines) + '\n\n'
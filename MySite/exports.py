@@ -0,0 +1,81 @@
+import csv
+import json
+
+from django.db.models import Q
+
+from .models import StudentClearanceRequests, CLEARANCE_UNITS
+
+# (column name, lookup on StudentClearanceRequests)
+EXPORT_COLUMNS = (
+    ('request_id', 'id'),
+    ('matric_number', 'student__matric_number'),
+    ('first_name', 'student__first_name'),
+    ('last_name', 'student__last_name'),
+    ('email', 'student__email'),
+    ('semester', 'semester'),
+    ('session', 'session'),
+    ('department', 'department__name'),
+    ('department_status', 'department__status'),
+    ('faculty', 'faculty__name'),
+    ('faculty_status', 'faculty__status'),
+    ('hostel', 'hostel__name'),
+    ('hostel_status', 'hostel__status'),
+    ('bursary_status', 'bursary__status'),
+    ('total_fees', 'bursary__total_fees'),
+    ('total_amount_paid', 'bursary__total_amount_paid'),
+    ('outstanding_fees', 'bursary__outstanding_fees'),
+)
+
+EXPORT_FORMATS = ('csv', 'ndjson')
+
+
+def export_queryset(session=None, semester=None, status=None):
+    """
+    Clearance requests to export; ``status`` matches requests where any requirement has that status
+    """
+    queryset = StudentClearanceRequests.objects.all()
+    if session:
+        queryset = queryset.filter(session=session)
+    if semester:
+        queryset = queryset.filter(semester=semester)
+    if status:
+        any_status = Q()
+        for unit in CLEARANCE_UNITS:
+            any_status |= Q(**{f'{unit}__status': status})
+        queryset = queryset.filter(any_status)
+    return queryset.order_by('pk')
+
+
+def export_rows(queryset, chunk_size=2000):
+    """
+    Yield one tuple per clearance request, fetched in chunks through a single joined query
+    """
+    return queryset.values_list(*[lookup for _, lookup in EXPORT_COLUMNS]).iterator(chunk_size=chunk_size)
+
+
+class Echo:
+    """
+    File-like object whose write returns the value, so csv.writer output can be yielded directly
+    """
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow([name for name, _ in EXPORT_COLUMNS])
+    for row in rows:
+        yield writer.writerow(['' if value is None else value for value in row])
+
+
+def ndjson_lines(rows):
+    names = [name for name, _ in EXPORT_COLUMNS]
+    for row in rows:
+        yield json.dumps(dict(zip(names, row)), default=str) + '\n'
+
+
+def export_lines(export_format, rows):
+    if export_format == 'ndjson':
+        return ndjson_lines(rows)
+    return csv_lines(rows)
@@ -65,7 +65,7 @@ class StudentClearanceRequestForm(forms.Form):
 
 
 class StudentClearanceDocumentForm(forms.Form):
-    file = forms.CharField(widget=forms.FileInput(attrs={'class': 'form-control p-3', 'required': ''}))
+    file = forms.FileField(widget=forms.FileInput(attrs={'class': 'form-control p-3', 'required': ''}))
     description = forms.CharField(widget=forms.Textarea(attrs={'class': 'form-control p-3', 'required': '', 'placeholder': 'Type here'}))
     document_type = forms.CharField(
         widget=forms.Select(choices=(
@@ -0,0 +1,146 @@
+import posixpath
+import re
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.template.loader import render_to_string
+from django.test.utils import override_settings
+
+try:
+    import rcssmin
+except ImportError:  # Bundles are concatenated but not minified
+    rcssmin = None
+
+try:
+    import rjsmin
+except ImportError:
+    rjsmin = None
+
+CSS_URL = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)')
+CSS_IMPORT = re.compile(r'@import\s+(?:url\()?\s*[\'"]?([^\'")]+)[\'"]?\s*\)?[^;]*;')
+STATIC_REFERENCE = re.compile(r'(?:href|src)="([^"]+)"')
+PAGE_TEMPLATES = ['login.html', 'register.html', 'forgot_password.html', 'retrieve_password.html',
+                  'change_password.html', 'student_dashboard.html', 'student_clearance_request.html',
+                  'student_upload_clearance.html', 'student_clearance_status.html']
+
+
+def is_external(url):
+    return url.startswith(('data:', 'http:', 'https:', '//', '/', '#'))
+
+
+def rebase_css(text, source, bundle):
+    """
+    Rewrite the relative url()s of ``source`` so they resolve from ``bundle``'s directory, and drop @imports of
+    files that do not exist (they only ever produced 404s)
+    """
+    def resolve(url):
+        path = posixpath.normpath(posixpath.join(posixpath.dirname(source), url.split('#')[0].split('?')[0]))
+        return path, url[len(url.split('#')[0].split('?')[0]):]
+
+    def rebase(match):
+        quote, url = match.groups()
+        if is_external(url):
+            return match.group(0)
+        path, suffix = resolve(url)
+        return f'url({quote}{posixpath.relpath(path, posixpath.dirname(bundle))}{suffix}{quote})'
+
+    def keep_import(match):
+        url = match.group(1)
+        if is_external(url):
+            return match.group(0)
+        path = resolve(url)[0]
+        return match.group(0) if not path.startswith('..') and finders.find(path) else ''
+
+    return CSS_URL.sub(rebase, CSS_IMPORT.sub(keep_import, text))
+
+
+def build_bundle(name, sources):
+    """
+    Concatenate and minify ``sources`` into STATIC_BUNDLES_DIR/``name``, returning the bytes written
+    """
+    parts = []
+    for source in sources:
+        path = finders.find(source)
+        if path is None:
+            raise CommandError(f'{name}: static file {source} not found')
+        text = Path(path).read_text(encoding='utf-8')
+        if name.endswith('.css'):
+            text = rebase_css(text, source, name)
+            if rcssmin is not None:
+                text = rcssmin.cssmin(text)
+        elif rjsmin is not None and '.min.' not in source:
+            text = rjsmin.jsmin(text)
+        parts.append(text)
+    content = ('\n' if name.endswith('.css') else ';\n').join(parts).encode('utf-8')
+    output = Path(settings.STATIC_BUNDLES_DIR) / name
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_bytes(content)
+    return len(content)
+
+
+def page_assets(template, bundled):
+    """
+    Distinct static URLs the page built from ``template`` references, either as production serves it or with
+    the unhashed source files debug serves
+    """
+    if bundled:
+        with override_settings(DEBUG=False):  # Manifest storage only hands out hashed names outside debug
+            html = render_to_string(template, {'csrf_token': 'report'})
+    else:
+        storages = {**settings.STORAGES,
+                    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'}}
+        with override_settings(STATIC_BUNDLES_ENABLED=False, STORAGES=storages):
+            html = render_to_string(template, {'csrf_token': 'report'})
+    return list(dict.fromkeys(url for url in STATIC_REFERENCE.findall(html) if url.startswith(settings.STATIC_URL)))
+
+
+def transfer_size(url):
+    """
+    Bytes a browser downloads for ``url``: the smallest of the collected file and its .br/.gz variants when it
+    has been collected, otherwise the source file
+    """
+    name = url[len(settings.STATIC_URL):]
+    collected = Path(settings.STATIC_ROOT) / name
+    sizes = [path.stat().st_size for path in (collected, collected.with_name(collected.name + '.br'),
+                                              collected.with_name(collected.name + '.gz')) if path.exists()]
+    if sizes:
+        return min(sizes)
+    path = finders.find(name)
+    return Path(path).stat().st_size if path else 0
+
+
+class Command(BaseCommand):
+    help = ('Build STATIC_BUNDLES, collect static files with hashed names and gzip/brotli variants, and report '
+            'the asset bytes each page downloads before and after bundling')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--no-collect', action='store_true', help='Only write the bundles')
+
+    def handle(self, *args, **options):
+        if rcssmin is None or rjsmin is None:
+            self.stderr.write(self.style.WARNING('rcssmin/rjsmin not installed, bundles will not be minified'))
+        for name, sources in settings.STATIC_BUNDLES.items():
+            size = build_bundle(name, sources)
+            self.stdout.write(f'{name}: {len(sources)} files, {size} bytes')
+
+        if options['no_collect']:
+            return
+        call_command('collectstatic', interactive=False, verbosity=0)
+        if not hasattr(staticfiles_storage, 'manifest_name'):
+            self.stderr.write(self.style.WARNING(
+                'STATIC_BUNDLES_ENABLED is off: files were collected without hashed names or compressed variants'
+            ))
+            return
+
+        # Before: every source file uncompressed, as served in debug. After: the bundles as WhiteNoise sends them.
+        self.stdout.write(f'{"page":36} {"requests":^14} {"bytes":^22}')
+        for template in PAGE_TEMPLATES:
+            before, after = page_assets(template, False), page_assets(template, True)
+            before_bytes = sum(Path(finders.find(url[len(settings.STATIC_URL):])).stat().st_size for url in before)
+            after_bytes = sum(transfer_size(url) for url in after)
+            self.stdout.write(f'{template:36} {len(before):>5} -> {len(after):<5} '
+                              f'{before_bytes:>9} -> {after_bytes:<9}')
@@ -0,0 +1,72 @@
+import hashlib
+import os
+import shutil
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from MySite.models import ClearanceDocument, ContentBlob
+from MySite.storage import content_name, is_content_name
+
+
+def file_digest(path, block_size=64 * 1024):
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as stored:
+        for block in iter(lambda: stored.read(block_size), b''):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+class Command(BaseCommand):
+    help = 'Move existing clearance documents into content-addressed storage, sharing identical files'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report what would be reclaimed without changes')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        storage = ClearanceDocument._meta.get_field('file').storage
+        dry_run = options['dry_run']
+        renamed = {}  # Legacy name -> content-addressed name
+        reclaimed = 0
+        missing = 0
+        updates = []
+
+        for document in ClearanceDocument.objects.only('pk', 'file').order_by('pk').iterator(
+                chunk_size=options['batch_size']):
+            old_name = document.file.name
+            if not old_name or is_content_name(old_name):
+                continue
+            if old_name not in renamed:
+                old_path = storage.path(old_name)
+                if not os.path.exists(old_path):
+                    missing += 1
+                    self.stderr.write(f'Missing file for document {document.pk}: {old_name}')
+                    continue
+                new_name = content_name(os.path.dirname(old_name), file_digest(old_path),
+                                        os.path.splitext(old_name)[1]).replace('\\', '/')
+                new_path = storage.path(new_name)
+                if os.path.exists(new_path) or new_name in renamed.values():
+                    reclaimed += os.path.getsize(old_path)
+                elif not dry_run:
+                    os.makedirs(os.path.dirname(new_path), exist_ok=True)
+                    try:
+                        os.link(old_path, new_path)  # The legacy file is removed once rows point at the blob
+                    except OSError:
+                        shutil.copy2(old_path, new_path)
+                renamed[old_name] = new_name
+            document.file.name = renamed[old_name]
+            updates.append(document)
+
+        if not dry_run:
+            with transaction.atomic():
+                ClearanceDocument.objects.bulk_update(updates, ['file'], batch_size=options['batch_size'])
+                blobs = ContentBlob.objects.recount(batch_size=options['batch_size'])
+            for old_name in renamed:
+                storage.delete(old_name)
+            self.stdout.write(f'Tracking {blobs} content blobs')
+
+        verb = 'Would reclaim' if dry_run else 'Reclaimed'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {reclaimed} bytes across {len(updates)} documents ({len(renamed)} legacy files, {missing} missing)'
+        ))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from MySite.exports import EXPORT_FORMATS, export_lines, export_queryset, export_rows
+
+
+class Command(BaseCommand):
+    help = 'Stream clearance requests with their requirements to CSV or NDJSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=EXPORT_FORMATS, default='csv')
+        parser.add_argument('--output', help='File to write to; defaults to standard output')
+        parser.add_argument('--session', help='Only export this session, e.g. 2023/2024')
+        parser.add_argument('--semester', help='Only export this semester')
+        parser.add_argument('--status', help='Only export requests with a requirement in this status')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Rows fetched from the database per chunk')
+
+    def handle(self, *args, **options):
+        queryset = export_queryset(session=options['session'], semester=options['semester'],
+                                   status=options['status'])
+        lines = export_lines(options['format'], export_rows(queryset, chunk_size=options['chunk_size']))
+
+        if not options['output']:
+            for line in lines:
+                self.stdout.write(line, ending='')  # Lines end in their own newline
+            return
+
+        written = 0
+        with open(options['output'], 'w', newline='', encoding='utf-8') as output:
+            for line in lines:
+                output.write(line)
+                written += 1
+        if options['format'] == 'csv':
+            written -= 1  # Header row
+        self.stderr.write(self.style.SUCCESS(f"Exported {written} clearance requests to {options['output']}"))
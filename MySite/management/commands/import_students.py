@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from MySite.onboarding import StudentImporter, read_roster
+
+
+class Command(BaseCommand):
+    help = ('Register students in bulk from a CSV (with header) or JSON Lines roster with matric_number, '
+            'first_name, last_name, email and optional password columns')
+
+    def add_arguments(self, parser):
+        parser.add_argument('roster', help='Path to a .csv or .jsonl roster')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows inserted per bulk_create batch')
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Processes used to hash passwords; defaults to the CPU count')
+
+    def handle(self, *args, **options):
+        importer = StudentImporter(batch_size=options['batch_size'], workers=options['workers'])
+        summary = importer.run(read_roster(options['roster']))
+
+        for matric_number, reason in importer.conflicts:
+            self.stderr.write(f'{matric_number}: {reason}')
+        self.stdout.write(self.style.SUCCESS(
+            f"Inserted {summary['inserted']}, skipped {summary['skipped']}, "
+            f"conflicting {summary['conflicting']}, invalid {summary['invalid']}"
+        ))
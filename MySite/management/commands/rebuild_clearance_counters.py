@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from MySite.models import ClearanceCounter
+
+
+class Command(BaseCommand):
+    help = 'Recount the clearance analytics counters from the requirement tables, correcting any drift'
+
+    def handle(self, *args, **options):
+        written = ClearanceCounter.objects.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {written} clearance counters'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from MySite.models import ClearanceStatusSummary
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the clearance status summary table from the existing clearance requests'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000, help='Rows fetched and inserted per batch')
+
+    def handle(self, *args, **options):
+        written = ClearanceStatusSummary.objects.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {written} clearance status summaries'))
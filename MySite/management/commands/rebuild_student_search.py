@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from MySite.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Refill the student search index from the Student table, e.g. after students were bulk loaded'
+
+    def handle(self, *args, **options):
+        indexed = rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f'Indexed {indexed} students'))
@@ -0,0 +1,54 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+from MySite.models import SESSION_CHOICES
+from MySite.reconciliation import DEFAULT_COLUMNS, BursaryReconciler
+
+
+class Command(BaseCommand):
+    help = ('Reconcile bursary payments from a bank or payment-gateway CSV statement: match rows to students by '
+            'matric number, sum them per student and term and recompute total paid and outstanding fees')
+
+    def add_arguments(self, parser):
+        parser.add_argument('statement', help='Path to the CSV statement, with a header row')
+        parser.add_argument('--session', choices=[value for value, _ in SESSION_CHOICES],
+                            help='Session of rows without one, e.g. 2023/2024')
+        parser.add_argument('--add', action='store_true',
+                            help='Add the payments to the stored totals instead of replacing them; for statements '
+                                 'that only cover payments since the last import')
+        parser.add_argument('--dry-run', action='store_true', help='Report without writing')
+        parser.add_argument('--report', help='Write the rows that could not be applied to this CSV file')
+        parser.add_argument('--encoding', default='utf-8-sig')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows written per executemany batch')
+        for name, header in DEFAULT_COLUMNS.items():
+            parser.add_argument(f'--{name.replace("_", "-")}-column', default=header,
+                                help=f'Statement header holding the {name.replace("_", " ")}')
+
+    def handle(self, *args, **options):
+        columns = {name: options[f'{name}_column'] for name in DEFAULT_COLUMNS}
+        reconciler = BursaryReconciler(columns=columns, session=options['session'], add=options['add'],
+                                       batch_size=options['batch_size'])
+        try:
+            with open(options['statement'], newline='', encoding=options['encoding']) as statement:
+                summary = reconciler.run(statement, dry_run=options['dry_run'])
+        except OSError as error:
+            raise CommandError(error)
+
+        if options['report']:
+            with open(options['report'], 'w', newline='', encoding='utf-8') as report:
+                writer = csv.writer(report)
+                writer.writerow(['line', 'matric_number', 'amount', 'reason'])
+                writer.writerows(reconciler.unmatched)
+        else:
+            for line, matric_number, amount, reason in reconciler.unmatched[:20]:
+                self.stderr.write(f'line {line}: {matric_number} {amount}: {reason}')
+            if len(reconciler.unmatched) > 20:
+                self.stderr.write(f'... {len(reconciler.unmatched) - 20} more; use --report to list them all')
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{'Would update' if options['dry_run'] else 'Updated'} {summary['updated']} bursaries from "
+            f"{summary['matched']} of {summary['rows']} rows; unmatched {summary['unmatched']}, "
+            f"invalid {summary['invalid']}, duplicates {summary['duplicates']}, "
+            f"unapplied {summary['unapplied']}"
+        ))
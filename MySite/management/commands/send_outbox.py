@@ -0,0 +1,35 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from MySite.notifications import send_due_emails
+
+
+class Command(BaseCommand):
+    help = 'Send queued outbox emails in batches over one reused mail connection'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.OUTBOX_BATCH_SIZE)
+        parser.add_argument('--loop', action='store_true', help='Keep polling the outbox instead of exiting')
+        parser.add_argument('--interval', type=float, default=5.0, help='Seconds to sleep when the outbox is empty')
+
+    def handle(self, *args, **options):
+        total_sent = total_failed = 0
+        while True:
+            try:
+                sent, failed = send_due_emails(batch_size=options['batch_size'])
+            except Exception as error:
+                if not options['loop']:
+                    raise
+                self.stderr.write(f'Outbox batch failed: {error}')
+                sent = failed = 0
+            total_sent += sent
+            total_failed += failed
+            if sent or failed:
+                self.stdout.write(f'Sent {sent}, failed {failed}')
+                continue  # Drain the backlog before sleeping
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS(f'Outbox drained: sent {total_sent}, failed {total_failed}'))
@@ -0,0 +1,150 @@
+"""
+Prometheus metrics that add up across worker processes.
+
+Each process keeps its counters and histograms in memory and writes them to ``METRICS_DIR/<pid>.json`` at most
+every METRICS_FLUSH_SECONDS; the metrics view sums every process's file, so a scrape sees the whole server
+whichever worker answers it.
+"""
+import atexit
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+
+from django.conf import settings
+
+# name: (type, help)
+METRICS = {
+    'http_requests_total': ('counter', 'Requests by route, method and status code'),
+    'http_request_duration_seconds': ('histogram', 'Request latency by route and method'),
+    'http_request_db_seconds': ('histogram', 'Database time per request by route and method'),
+    'http_request_db_queries_total': ('counter', 'SQL statements run by route and method'),
+    'api_response_cache_total': ('counter', 'API response cache lookups by model and outcome'),
+    'upload_bytes_total': ('counter', 'Clearance document bytes received, by upload kind'),
+    'upload_seconds_total': ('counter', 'Time spent receiving clearance document bytes, by upload kind'),
+}
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Registry:
+    """
+    This process's metric values, keyed by (name, sorted label pairs)
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = defaultdict(float)
+        self.histograms = {}  # key -> [count per bucket..., +Inf count, sum]
+        self.flushed_at = 0.0
+
+    def inc(self, name, value=1, **labels):
+        with self.lock:
+            self.counters[(name, tuple(sorted(labels.items())))] += value
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            histogram = self.histograms.setdefault(key, [0] * (len(BUCKETS) + 2))
+            for index, bound in enumerate(BUCKETS):
+                if value <= bound:
+                    histogram[index] += 1
+                    break
+            else:
+                histogram[len(BUCKETS)] += 1
+            histogram[-1] += value
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'counters': [[name, labels, value] for (name, labels), value in self.counters.items()],
+                'histograms': [[name, labels, values] for (name, labels), values in self.histograms.items()],
+            }
+
+    def flush(self, force=False):
+        """
+        Write this process's values to its file, unless that was done less than METRICS_FLUSH_SECONDS ago
+        """
+        now = time.monotonic()
+        if not force and now - self.flushed_at < settings.METRICS_FLUSH_SECONDS:
+            return
+        self.flushed_at = now
+        directory = Path(settings.METRICS_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        handle, temporary_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(handle, 'w') as file:
+            json.dump(self.snapshot(), file)
+        os.replace(temporary_path, directory / f'{os.getpid()}.json')  # Readers never see a half-written file
+
+
+registry = Registry()
+inc = registry.inc
+observe = registry.observe
+atexit.register(lambda: registry.flush(force=True) if registry.counters or registry.histograms else None)
+
+
+def collect():
+    """
+    Sum the files of every process that has written metrics, this one included
+    """
+    registry.flush(force=True)
+    counters, histograms = defaultdict(float), {}
+    for path in Path(settings.METRICS_DIR).glob('*.json'):
+        try:
+            data = json.loads(path.read_text())
+        except (OSError, ValueError):
+            continue  # Removed or replaced while listing
+        for name, labels, value in data['counters']:
+            counters[(name, tuple(map(tuple, labels)))] += value
+        for name, labels, values in data['histograms']:
+            key = (name, tuple(map(tuple, labels)))
+            totals = histograms.setdefault(key, [0] * len(values))
+            histograms[key] = [total + value for total, value in zip(totals, values)]
+    return counters, histograms
+
+
+def _labels(pairs):
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def _number(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+def render(gauges=()):
+    """
+    Prometheus text exposition of every process's metrics plus ``gauges``, (name, help, labels, value) tuples
+    read at scrape time
+    """
+    counters, histograms = collect()
+    lines = []
+    for name, (kind, help_text) in METRICS.items():
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+        if kind == 'counter':
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f'{name}{_labels(labels)} {_number(value)}')
+            continue
+        for (metric, labels), values in sorted(histograms.items()):
+            if metric != name:
+                continue
+            cumulative = 0
+            for bound, count in zip(BUCKETS + (math.inf,), values):
+                cumulative += count
+                lines.append(f'{name}_bucket{_labels(labels + (("le", _number(bound)),))} {cumulative}')
+            lines.append(f'{name}_sum{_labels(labels)} {_number(values[-1])}')
+            lines.append(f'{name}_count{_labels(labels)} {cumulative}')
+    for name, help_text, labels, value in gauges:
+        if f'# TYPE {name} gauge' not in lines:
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} gauge']
+        lines.append(f'{name}{_labels(tuple(sorted(labels.items())))} {_number(value)}')
+    return '\n'.join(lines) + '\n'
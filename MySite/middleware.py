@@ -0,0 +1,126 @@
+import heapq
+import logging
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class QueryStats:
+    """
+    SQL count, total database time and the slowest statements seen while handling one request
+    """
+
+    def __init__(self, keep_slowest):
+        self.count = 0
+        self.duration = 0.0  # Seconds
+        self.slowest = []  # Min-heap of (seconds, sql), at most keep_slowest long
+        self.keep_slowest = keep_slowest
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.count += 1
+            self.duration += elapsed
+            if len(self.slowest) < self.keep_slowest:
+                heapq.heappush(self.slowest, (elapsed, sql))
+            elif self.slowest and elapsed > self.slowest[0][0]:
+                heapq.heapreplace(self.slowest, (elapsed, sql))
+
+    def slowest_statements(self):
+        return sorted(self.slowest, reverse=True)
+
+
+class QueryInstrumentationMiddleware:
+    """
+    Measures the queries of each request on every database alias, stores them as ``request.query_stats``, logs
+    requests over QUERY_LOG_MAX_QUERIES or QUERY_LOG_MAX_DB_MILLISECONDS with their view name, and adds a
+    Server-Timing header when QUERY_STATS_HEADER is on.
+
+    Only sync requests are measured: async views query through per-thread connections this wrapper cannot see.
+    Queries made while a streaming response is iterated are not counted either.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.get_response(request)  # Returns the coroutine for the async handler to await
+
+        stats = QueryStats(settings.QUERY_LOG_SLOWEST)
+        request.query_stats = stats
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(stats))
+            response = self.get_response(request)
+
+        self.log(request, stats)
+        if settings.QUERY_STATS_HEADER:
+            response['Server-Timing'] = f'db;dur={stats.duration * 1000:.2f};desc="{stats.count} queries"'
+        return response
+
+    def log(self, request, stats):
+        milliseconds = stats.duration * 1000
+        if stats.count <= settings.QUERY_LOG_MAX_QUERIES and milliseconds <= settings.QUERY_LOG_MAX_DB_MILLISECONDS:
+            return
+        match = request.resolver_match
+        view = (match.view_name or match._func_path) if match else request.path
+        slowest = '; '.join(f'{seconds * 1000:.1f}ms {sql}' for seconds, sql in stats.slowest_statements())
+        logger.warning('%s %s (%s) ran %d queries in %.1fms; slowest: %s', request.method, request.path, view,
+                       stats.count, milliseconds, slowest)
+
+
+class MetricsMiddleware:
+    """
+    Records each request's latency, status code and, when QueryInstrumentationMiddleware runs outside it,
+    database time in MySite.metrics under the view name of the matched route
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        started = time.perf_counter()
+        response = self.get_response(request)
+        self.record(request, response, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        response = await self.get_response(request)
+        self.record(request, response, time.perf_counter() - started)
+        return response
+
+    def record(self, request, response, elapsed):
+        match = request.resolver_match
+        route = (match.view_name or match._func_path) if match else 'unmatched'  # Keeps label values bounded
+        labels = {'route': route, 'method': request.method}
+        metrics.inc('http_requests_total', status=str(response.status_code), **labels)
+        metrics.observe('http_request_duration_seconds', elapsed, **labels)
+        stats = getattr(request, 'query_stats', None)
+        if stats is not None:
+            metrics.observe('http_request_db_seconds', stats.duration, **labels)
+            metrics.inc('http_request_db_queries_total', stats.count, **labels)
+        metrics.registry.flush()
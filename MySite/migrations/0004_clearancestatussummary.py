@@ -0,0 +1,37 @@
+# Generated by Django 5.0.6 on 2026-10-18 08:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('MySite', '0003_bursary_semester_bursary_session_department_semester_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='hostel',
+            name='name',
+            field=models.CharField(choices=[('victory_hall', 'Victory Hall'), ('faith_hall', 'Faith Hall'), ('bishop_hall', 'Bishop Hall'), ('new_hall', 'New Hall'), ('rehoboth_hall', 'Rehoboth Hall')], max_length=255, unique=True),
+        ),
+        migrations.CreateModel(
+            name='ClearanceStatusSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('semester', models.CharField(choices=[('alpha', 'Alpha'), ('omega', 'Omega')], max_length=255)),
+                ('session', models.CharField(choices=[('2023/2024', '2023/2024'), ('2024/2025', '2024/2025'), ('2025/2026', '2025/2026'), ('2026/2027', '2026/2027'), ('2027/2028', '2027/2028'), ('2028/2029', '2028/2029'), ('2029/2030', '2029/2030')], default='2023/2024', max_length=11)),
+                ('department_status', models.CharField(default='Unknown', max_length=255)),
+                ('faculty_status', models.CharField(default='Unknown', max_length=255)),
+                ('hostel_status', models.CharField(default='Unknown', max_length=255)),
+                ('bursary_status', models.CharField(default='Unknown', max_length=255)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='status_summaries', to='MySite.student')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='clearancestatussummary',
+            constraint=models.UniqueConstraint(fields=('student', 'semester', 'session'), name='unique_status_summary'),
+        ),
+    ]
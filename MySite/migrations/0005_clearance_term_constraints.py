@@ -0,0 +1,96 @@
+# Generated by Django 5.0.6 on 2026-10-18 08:37
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def merge_duplicate_terms(apps, schema_editor):
+    """
+    Collapse rows sharing (student, semester, session) onto the newest one so the unique constraints apply
+    """
+    StudentClearanceRequests = apps.get_model('MySite', 'StudentClearanceRequests')
+
+    for unit in ('department', 'faculty', 'hostel', 'bursary'):
+        model = apps.get_model('MySite', unit)
+        duplicates = model.objects.values('student', 'semester', 'session').annotate(
+            keep=Max('pk'), rows=Count('pk'),
+        ).filter(rows__gt=1)
+        for group in duplicates:
+            stale = model.objects.filter(
+                student=group['student'], semester=group['semester'], session=group['session'],
+            ).exclude(pk=group['keep'])
+            kept = model.objects.get(pk=group['keep'])
+            for requirement in stale:
+                kept.documents.add(*requirement.documents.all())
+            StudentClearanceRequests.objects.filter(**{f'{unit}__in': stale}).update(**{unit: kept})
+            stale.delete()
+
+    duplicates = StudentClearanceRequests.objects.values('student', 'semester', 'session').annotate(
+        keep=Max('pk'), rows=Count('pk'),
+    ).filter(rows__gt=1)
+    for group in duplicates:
+        StudentClearanceRequests.objects.filter(
+            student=group['student'], semester=group['semester'], session=group['session'],
+        ).exclude(pk=group['keep']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('MySite', '0004_clearancestatussummary'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_terms, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='department',
+            name='name',
+            field=models.CharField(choices=[('computer_science', 'Computer Science'), ('software_engineering', 'Software Engineering'), ('cyber_security', 'Cyber Security'), ('microbiology', 'Microbiology'), ('biochemistry', 'Biochemistry'), ('industrial_chemistry', 'Industrial Chemistry'), ('economics', 'Economics'), ('accounting', 'Accounting'), ('business_administration', 'Business Administration'), ('mass_communication', 'Mass Communication'), ('criminology', 'Criminology')], max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='faculty',
+            name='name',
+            field=models.CharField(choices=[('computing_and_applied_sciences', 'Computing and Applied Sciences'), ('arts_and_management_sciences', 'Arts and Management Sciences')], max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='hostel',
+            name='name',
+            field=models.CharField(choices=[('victory_hall', 'Victory Hall'), ('faith_hall', 'Faith Hall'), ('bishop_hall', 'Bishop Hall'), ('new_hall', 'New Hall'), ('rehoboth_hall', 'Rehoboth Hall')], max_length=255),
+        ),
+        migrations.AddIndex(
+            model_name='bursary',
+            index=models.Index(fields=['session', 'semester', 'status'], name='bursary_term_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='department',
+            index=models.Index(fields=['session', 'semester', 'status'], name='department_term_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='faculty',
+            index=models.Index(fields=['session', 'semester', 'status'], name='faculty_term_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='hostel',
+            index=models.Index(fields=['session', 'semester', 'status'], name='hostel_term_status_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='bursary',
+            constraint=models.UniqueConstraint(fields=('student', 'semester', 'session'), name='unique_bursary_per_term'),
+        ),
+        migrations.AddConstraint(
+            model_name='department',
+            constraint=models.UniqueConstraint(fields=('student', 'semester', 'session'), name='unique_department_per_term'),
+        ),
+        migrations.AddConstraint(
+            model_name='faculty',
+            constraint=models.UniqueConstraint(fields=('student', 'semester', 'session'), name='unique_faculty_per_term'),
+        ),
+        migrations.AddConstraint(
+            model_name='hostel',
+            constraint=models.UniqueConstraint(fields=('student', 'semester', 'session'), name='unique_hostel_per_term'),
+        ),
+        migrations.AddConstraint(
+            model_name='studentclearancerequests',
+            constraint=models.UniqueConstraint(fields=('student', 'semester', 'session'), name='unique_clearance_request_per_term'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.0.6 on 2026-10-18 08:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('MySite', '0005_clearance_term_constraints'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='department',
+            name='name',
+            field=models.CharField(choices=[('computer_science', 'Computer Science'), ('software_engineering', 'Software Engineering'), ('cyber_security', 'Cyber Security'), ('microbiology', 'Microbiology'), ('biochemistry', 'Biochemistry'), ('industrial_chemistry', 'Industrial Chemistry'), ('economics', 'Economics'), ('accounting', 'Accounting'), ('business_administration', 'Business Administration'), ('mass_communication', 'Mass Communication'), ('criminology', 'Criminology')], db_index=True, max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='faculty',
+            name='name',
+            field=models.CharField(choices=[('computing_and_applied_sciences', 'Computing and Applied Sciences'), ('arts_and_management_sciences', 'Arts and Management Sciences')], db_index=True, max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='hostel',
+            name='name',
+            field=models.CharField(choices=[('victory_hall', 'Victory Hall'), ('faith_hall', 'Faith Hall'), ('bishop_hall', 'Bishop Hall'), ('new_hall', 'New Hall'), ('rehoboth_hall', 'Rehoboth Hall')], db_index=True, max_length=255),
+        ),
+        migrations.AddIndex(
+            model_name='studentclearancerequests',
+            index=models.Index(fields=['session', 'semester'], name='clearance_request_term_idx'),
+        ),
+    ]
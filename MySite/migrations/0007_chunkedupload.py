@@ -0,0 +1,35 @@
+# Generated by Django 5.0.6 on 2026-10-18 08:53
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('MySite', '0006_index_api_filters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChunkedUpload',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('filename', models.CharField(max_length=255)),
+                ('total_size', models.PositiveBigIntegerField()),
+                ('offset', models.PositiveBigIntegerField(default=0)),
+                ('clearance_type', models.CharField(choices=[('department', 'Department'), ('faculty', 'Faculty'), ('hostel', 'Hostel'), ('bursary', 'Bursary')], max_length=255)),
+                ('document_type', models.CharField(choices=[('course_form_100l_alpha', 'Course Form (100L Alpha Semester)'), ('course_form_100l_omega', 'Course Form (100L Omega Semester)'), ('course_form_200l_alpha', 'Course Form (200L Alpha Semester)'), ('course_form_200l_omega', 'Course Form (200L Omega Semester)'), ('course_form_300l_alpha', 'Course Form (300L Alpha Semester)'), ('course_form_300l_omega', 'Course Form (300L Omega Semester)'), ('course_form_400l_alpha', 'Course Form (400L Alpha Semester)'), ('course_form_400l_omega', 'Course Form (400L Omega Semester)'), ('bio_data', 'Bio-data'), ('local_government_certificate', 'Local Government Certificate'), ('birth_certificate', 'Birth Certificate'), ('jamb_admission_letter', 'Jamb Admission Letter'), ('du_admission_letter', 'DU Admission Letter'), ('letter_of_undertaking', 'Letter of Undertaking'), ('others', 'Others')], max_length=255)),
+                ('description', models.TextField()),
+                ('semester', models.CharField(choices=[('alpha', 'Alpha'), ('omega', 'Omega')], max_length=255)),
+                ('session', models.CharField(choices=[('2023/2024', '2023/2024'), ('2024/2025', '2024/2025'), ('2025/2026', '2025/2026'), ('2026/2027', '2026/2027'), ('2027/2028', '2027/2028'), ('2028/2029', '2028/2029'), ('2029/2030', '2029/2030')], default='2023/2024', max_length=11)),
+                ('status', models.CharField(choices=[('uploading', 'Uploading'), ('complete', 'Complete')], default='uploading', max_length=255)),
+                ('sha256', models.CharField(blank=True, max_length=64)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('document', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='MySite.clearancedocument')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chunked_uploads', to='MySite.student')),
+            ],
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.0.6 on 2026-10-18 08:54
+
+import MySite.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('MySite', '0007_chunkedupload'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContentBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('size', models.PositiveBigIntegerField(default=0)),
+                ('references', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='clearancedocument',
+            name='file',
+            field=models.FileField(storage=MySite.storage.clearance_document_storage, upload_to='clearance_documents/'),
+        ),
+    ]
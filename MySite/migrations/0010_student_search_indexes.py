@@ -0,0 +1,28 @@
+# Generated by Django 5.0.6 on 2026-10-18 09:21
+
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('MySite', '0009_outboxemail'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(django.db.models.functions.text.Upper('matric_number'), name='student_matric_upper_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(django.db.models.functions.text.Upper('last_name'), name='student_last_name_upper_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(django.db.models.functions.text.Upper('first_name'), name='student_first_name_upper_idx'),
+        ),
+    ]
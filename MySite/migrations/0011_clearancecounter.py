@@ -0,0 +1,45 @@
+# Generated by Django 5.0.6 on 2026-10-18 09:33
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def count_requirements(apps, schema_editor):
+    """
+    Fill the counters from the existing requirements, as ClearanceCounter.objects.rebuild() does
+    """
+    ClearanceCounter = apps.get_model('MySite', 'ClearanceCounter')
+    counters = []
+    for unit in ('department', 'faculty', 'hostel', 'bursary'):
+        group = ['session', 'semester', 'status'] + (['name'] if unit != 'bursary' else [])
+        for row in apps.get_model('MySite', unit).objects.order_by().values(*group).annotate(total=Count('pk')):
+            counters.append(ClearanceCounter(unit=unit, name=row.get('name', ''), session=row['session'],
+                                             semester=row['semester'], status=row['status'], count=row['total']))
+    ClearanceCounter.objects.bulk_create(counters)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('MySite', '0010_student_search_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClearanceCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('unit', models.CharField(choices=[('department', 'Department'), ('faculty', 'Faculty'), ('hostel', 'Hostel'), ('bursary', 'Bursary')], max_length=255)),
+                ('name', models.CharField(blank=True, max_length=255)),
+                ('session', models.CharField(choices=[('2023/2024', '2023/2024'), ('2024/2025', '2024/2025'), ('2025/2026', '2025/2026'), ('2026/2027', '2026/2027'), ('2027/2028', '2027/2028'), ('2028/2029', '2028/2029'), ('2029/2030', '2029/2030')], max_length=11)),
+                ('semester', models.CharField(choices=[('alpha', 'Alpha'), ('omega', 'Omega')], max_length=255)),
+                ('status', models.CharField(max_length=255)),
+                ('count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='clearancecounter',
+            constraint=models.UniqueConstraint(fields=('unit', 'name', 'session', 'semester', 'status'), name='unique_clearance_counter'),
+        ),
+        migrations.RunPython(count_requirements, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+from django.db import migrations
+
+
+def create_search_table(apps, schema_editor):
+    """
+    Create the FTS5 student search table (see MySite.search) and index the existing students. Slashes, @ and
+    dots are word characters, so matric numbers and emails are single words; the prefix indexes on the first
+    two and three characters make short prefixes index lookups.
+    """
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        'CREATE VIRTUAL TABLE IF NOT EXISTS "MySite_studentsearch" USING fts5(matric_number, first_name, '
+        "last_name, email, tokenize = \"unicode61 remove_diacritics 2 tokenchars '/@.'\", prefix = '2 3')"
+    )
+    schema_editor.execute(
+        'INSERT INTO "MySite_studentsearch" (rowid, matric_number, first_name, last_name, email) '
+        'SELECT user_id, matric_number, first_name, last_name, email FROM "MySite_student"'
+    )
+
+
+def drop_search_table(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS "MySite_studentsearch"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('MySite', '0011_clearancecounter'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_table, drop_search_table),
+    ]
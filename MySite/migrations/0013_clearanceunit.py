@@ -0,0 +1,247 @@
+# Generated by Django 5.0.6 on 2026-10-18 09:58
+
+import django.db.models.deletion
+from django.core.management.color import no_style
+from django.db import migrations, models
+from django.db.models import F, Max
+
+UNITS = ('department', 'faculty', 'hostel', 'bursary')
+BATCH_SIZE = 2000
+
+
+def unit_fields(unit):
+    fields = ['id', 'student_id', 'semester', 'session', 'status']
+    return fields + (['total_amount_paid', 'total_fees', 'outstanding_fees'] if unit == 'bursary' else ['name'])
+
+
+def create_in_batches(model, objects):
+    batch = []
+    for obj in objects:
+        batch.append(obj)
+        if len(batch) >= BATCH_SIZE:
+            model.objects.bulk_create(batch)
+            batch = []
+    model.objects.bulk_create(batch)
+
+
+def reset_sequences(schema_editor, models):
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(), models):  # Ids were set explicitly
+            cursor.execute(sql)
+
+
+def copy_units(apps, schema_editor):
+    """
+    Copy the four requirement tables into ClearanceUnit, with their documents and the clearance requests' links.
+    Each table's ids are shifted past the previous tables' largest, so every link is moved by one UPDATE.
+    """
+    ClearanceUnit = apps.get_model('MySite', 'ClearanceUnit')
+    StudentClearanceRequests = apps.get_model('MySite', 'StudentClearanceRequests')
+    UnitDocument = ClearanceUnit.documents.through
+    offset = 0
+    for unit in UNITS:
+        model = apps.get_model('MySite', unit)
+        rows = model.objects.order_by('pk').values(*unit_fields(unit)).iterator(chunk_size=BATCH_SIZE)
+        create_in_batches(ClearanceUnit, (
+            ClearanceUnit(unit_type=unit, **{**row, 'id': row['id'] + offset}) for row in rows
+        ))
+        links = model.documents.through.objects.order_by('pk').values_list(f'{unit}_id', 'clearancedocument_id')
+        create_in_batches(UnitDocument, (
+            UnitDocument(clearanceunit_id=unit_id + offset, clearancedocument_id=document_id)
+            for unit_id, document_id in links.iterator(chunk_size=BATCH_SIZE)
+        ))
+        StudentClearanceRequests.objects.filter(**{f'{unit}__isnull': False}).update(
+            **{f'{unit}_unit': F(unit) + offset},
+        )
+        offset += model.objects.aggregate(last=Max('pk'))['last'] or 0
+    reset_sequences(schema_editor, [ClearanceUnit])
+
+
+def split_units(apps, schema_editor):
+    """
+    Copy ClearanceUnit back into the four requirement tables, keeping the ids, and relink documents and requests
+    """
+    ClearanceUnit = apps.get_model('MySite', 'ClearanceUnit')
+    StudentClearanceRequests = apps.get_model('MySite', 'StudentClearanceRequests')
+    UnitDocument = ClearanceUnit.documents.through
+    models = []
+    for unit in UNITS:
+        model = apps.get_model('MySite', unit)
+        models.append(model)
+        rows = ClearanceUnit.objects.filter(unit_type=unit).order_by('pk').values(*unit_fields(unit))
+        create_in_batches(model, (model(**row) for row in rows.iterator(chunk_size=BATCH_SIZE)))
+        links = UnitDocument.objects.filter(clearanceunit__unit_type=unit).order_by('pk').values_list(
+            'clearanceunit_id', 'clearancedocument_id',
+        )
+        create_in_batches(model.documents.through, (
+            model.documents.through(**{f'{unit}_id': unit_id, 'clearancedocument_id': document_id})
+            for unit_id, document_id in links.iterator(chunk_size=BATCH_SIZE)
+        ))
+        StudentClearanceRequests.objects.filter(**{f'{unit}_unit__isnull': False}).update(
+            **{unit: F(f'{unit}_unit')},
+        )
+    reset_sequences(schema_editor, models)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('MySite', '0012_student_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClearanceUnit',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('unit_type', models.CharField(choices=[('department', 'Department'), ('faculty', 'Faculty'), ('hostel', 'Hostel'), ('bursary', 'Bursary')], max_length=255)),
+                ('semester', models.CharField(choices=[('alpha', 'Alpha'), ('omega', 'Omega')], max_length=255)),
+                ('session', models.CharField(choices=[('2023/2024', '2023/2024'), ('2024/2025', '2024/2025'), ('2025/2026', '2025/2026'), ('2026/2027', '2026/2027'), ('2027/2028', '2027/2028'), ('2028/2029', '2028/2029'), ('2029/2030', '2029/2030')], default='2023/2024', max_length=11)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('completed', 'Completed'), ('incomplete', 'Incomplete')], default='pending', max_length=255)),
+                ('name', models.CharField(blank=True, choices=[('computer_science', 'Computer Science'), ('software_engineering', 'Software Engineering'), ('cyber_security', 'Cyber Security'), ('microbiology', 'Microbiology'), ('biochemistry', 'Biochemistry'), ('industrial_chemistry', 'Industrial Chemistry'), ('economics', 'Economics'), ('accounting', 'Accounting'), ('business_administration', 'Business Administration'), ('mass_communication', 'Mass Communication'), ('criminology', 'Criminology'), ('computing_and_applied_sciences', 'Computing and Applied Sciences'), ('arts_and_management_sciences', 'Arts and Management Sciences'), ('victory_hall', 'Victory Hall'), ('faith_hall', 'Faith Hall'), ('bishop_hall', 'Bishop Hall'), ('new_hall', 'New Hall'), ('rehoboth_hall', 'Rehoboth Hall')], max_length=255)),
+                ('total_amount_paid', models.DecimalField(decimal_places=2, default=0.0, max_digits=10)),
+                ('total_fees', models.DecimalField(decimal_places=2, default=0.0, max_digits=10)),
+                ('outstanding_fees', models.DecimalField(decimal_places=2, default=0.0, max_digits=10)),
+                ('documents', models.ManyToManyField(blank=True, related_name='clearance_units', to='MySite.clearancedocument')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='clearance_units', to='MySite.student')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['unit_type', 'session', 'semester', 'status'], name='clearance_unit_status_idx'), models.Index(fields=['unit_type', 'name'], name='clearance_unit_name_idx')],
+                'constraints': [models.UniqueConstraint(fields=('student', 'semester', 'session', 'unit_type'), name='unique_clearance_unit_per_term')],
+            },
+        ),
+        migrations.AddField(
+            model_name='studentclearancerequests',
+            name='department_unit',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='MySite.clearanceunit'),
+        ),
+        migrations.AddField(
+            model_name='studentclearancerequests',
+            name='faculty_unit',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='MySite.clearanceunit'),
+        ),
+        migrations.AddField(
+            model_name='studentclearancerequests',
+            name='hostel_unit',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='MySite.clearanceunit'),
+        ),
+        migrations.AddField(
+            model_name='studentclearancerequests',
+            name='bursary_unit',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='MySite.clearanceunit'),
+        ),
+        migrations.RunPython(copy_units, split_units),
+        migrations.RemoveField(
+            model_name='studentclearancerequests',
+            name='department',
+        ),
+        migrations.RemoveField(
+            model_name='studentclearancerequests',
+            name='faculty',
+        ),
+        migrations.RemoveField(
+            model_name='studentclearancerequests',
+            name='hostel',
+        ),
+        migrations.RemoveField(
+            model_name='studentclearancerequests',
+            name='bursary',
+        ),
+        migrations.DeleteModel(
+            name='Department',
+        ),
+        migrations.DeleteModel(
+            name='Faculty',
+        ),
+        migrations.DeleteModel(
+            name='Hostel',
+        ),
+        migrations.DeleteModel(
+            name='Bursary',
+        ),
+        migrations.RenameField(
+            model_name='studentclearancerequests',
+            old_name='department_unit',
+            new_name='department',
+        ),
+        migrations.RenameField(
+            model_name='studentclearancerequests',
+            old_name='faculty_unit',
+            new_name='faculty',
+        ),
+        migrations.RenameField(
+            model_name='studentclearancerequests',
+            old_name='hostel_unit',
+            new_name='hostel',
+        ),
+        migrations.RenameField(
+            model_name='studentclearancerequests',
+            old_name='bursary_unit',
+            new_name='bursary',
+        ),
+        migrations.CreateModel(
+            name='Department',
+            fields=[
+            ],
+            options={
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('MySite.clearanceunit',),
+        ),
+        migrations.CreateModel(
+            name='Faculty',
+            fields=[
+            ],
+            options={
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('MySite.clearanceunit',),
+        ),
+        migrations.CreateModel(
+            name='Hostel',
+            fields=[
+            ],
+            options={
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('MySite.clearanceunit',),
+        ),
+        migrations.CreateModel(
+            name='Bursary',
+            fields=[
+            ],
+            options={
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('MySite.clearanceunit',),
+        ),
+        migrations.AlterField(
+            model_name='studentclearancerequests',
+            name='department',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='department_clearance_requests', to='MySite.department'),
+        ),
+        migrations.AlterField(
+            model_name='studentclearancerequests',
+            name='faculty',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='faculty_clearance_requests', to='MySite.faculty'),
+        ),
+        migrations.AlterField(
+            model_name='studentclearancerequests',
+            name='hostel',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='hostel_clearance_requests', to='MySite.hostel'),
+        ),
+        migrations.AlterField(
+            model_name='studentclearancerequests',
+            name='bursary',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='bursary_clearance_requests', to='MySite.bursary'),
+        ),
+    ]
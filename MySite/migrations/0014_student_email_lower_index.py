@@ -0,0 +1,20 @@
+# Generated by Django 5.0.6 on 2026-10-18 10:06
+
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('MySite', '0013_clearanceunit'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(django.db.models.functions.text.Lower('email'), name='student_email_lower_idx'),
+        ),
+    ]
@@ -1,5 +1,12 @@
+import uuid
+
 from django.contrib.auth.models import User
-from django.db import models
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, models, transaction
+from django.db.models.functions import Lower, Upper
+from django.utils import timezone
+
+from .storage import clearance_document_storage
 
 SEMESTER_CHOICES = (
     ('alpha', 'Alpha'),
@@ -35,6 +42,35 @@ HOSTEL_CHOICES = (
     ('rehoboth_hall', 'Rehoboth Hall'),
 )
 
+CLEARANCE_UNITS = ('department', 'faculty', 'hostel', 'bursary')
+
+COUNTER_FIELDS = ('unit_type', 'name', 'session', 'semester', 'status')  # A ClearanceCounter's key
+
+DOCUMENT_TYPE_CHOICES = (
+    ('course_form_100l_alpha', 'Course Form (100L Alpha Semester)'),
+    ('course_form_100l_omega', 'Course Form (100L Omega Semester)'),
+    ('course_form_200l_alpha', 'Course Form (200L Alpha Semester)'),
+    ('course_form_200l_omega', 'Course Form (200L Omega Semester)'),
+    ('course_form_300l_alpha', 'Course Form (300L Alpha Semester)'),
+    ('course_form_300l_omega', 'Course Form (300L Omega Semester)'),
+    ('course_form_400l_alpha', 'Course Form (400L Alpha Semester)'),
+    ('course_form_400l_omega', 'Course Form (400L Omega Semester)'),
+    ('bio_data', 'Bio-data'),
+    ('local_government_certificate', 'Local Government Certificate'),
+    ('birth_certificate', 'Birth Certificate'),
+    ('jamb_admission_letter', 'Jamb Admission Letter'),
+    ('du_admission_letter', 'DU Admission Letter'),
+    ('letter_of_undertaking', 'Letter of Undertaking'),
+    ('others', 'Others'),
+)
+
+CLEARANCE_TYPE_CHOICES = (
+    ('department', 'Department'),
+    ('faculty', 'Faculty'),
+    ('hostel', 'Hostel'),
+    ('bursary', 'Bursary'),
+)
+
 
 class Student(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True)
@@ -43,89 +79,221 @@ class Student(models.Model):
     matric_number = models.CharField(max_length=255, unique=True)
     email = models.EmailField(unique=True)  # Ensure unique email
 
+    class Meta:
+        indexes = [
+            # Range-scanned by the admin's case-insensitive prefix search (see MySite.admin.StudentSearchMixin)
+            models.Index(Upper('matric_number'), name='student_matric_upper_idx'),
+            models.Index(Upper('last_name'), name='student_last_name_upper_idx'),
+            models.Index(Upper('first_name'), name='student_first_name_upper_idx'),
+            # import_students matches emails case-insensitively; registration stores them as typed
+            models.Index(Lower('email'), name='student_email_lower_idx'),
+        ]
+
     def __str__(self):
         return f"{self.matric_number}"
 
 
 class ClearanceDocument(models.Model):
-    file = models.FileField(upload_to='clearance_documents/')  # Customize upload path
+    file = models.FileField(upload_to='clearance_documents/', storage=clearance_document_storage)  # Content-addressed
     description = models.TextField()
-    document_type = models.CharField(max_length=255, choices=(
-        ('course_form_100l_alpha', 'Course Form (100L Alpha Semester)'),
-        ('course_form_100l_omega', 'Course Form (100L Omega Semester)'),
-        ('course_form_200l_alpha', 'Course Form (200L Alpha Semester)'),
-        ('course_form_200l_omega', 'Course Form (200L Omega Semester)'),
-        ('course_form_300l_alpha', 'Course Form (300L Alpha Semester)'),
-        ('course_form_300l_omega', 'Course Form (300L Omega Semester)'),
-        ('course_form_400l_alpha', 'Course Form (400L Alpha Semester)'),
-        ('course_form_400l_omega', 'Course Form (400L Omega Semester)'),
-        ('bio_data', 'Bio-data'),
-        ('local_government_certificate', 'Local Government Certificate'),
-        ('birth_certificate', 'Birth Certificate'),
-        ('jamb_admission_letter', 'Jamb Admission Letter'),
-        ('du_admission_letter', 'DU Admission Letter'),
-        ('letter_of_undertaking', 'Letter of Undertaking'),
-        ('others', 'Others'),
-    ))
-
-
-class ClearanceRequirement(models.Model):
+    document_type = models.CharField(max_length=255, choices=DOCUMENT_TYPE_CHOICES)
+
+
+class ContentBlobManager(models.Manager):
+    def recount(self, batch_size=1000):
+        """
+        Recompute every blob's reference count from the ClearanceDocument rows. Unreferenced blobs are kept at
+        zero so gc_clearance_documents can still find their files.
+        """
+        counts = dict(ClearanceDocument.objects.exclude(file='').values('file').annotate(
+            total=models.Count('pk'),
+        ).values_list('file', 'total'))
+        storage = ClearanceDocument._meta.get_field('file').storage
+
+        self.exclude(name__in=list(counts)).exclude(references=0).update(references=0)
+        existing = {blob.name: blob for blob in self.filter(name__in=list(counts))}
+        changed, created = [], []
+        for name, total in counts.items():
+            blob = existing.get(name)
+            if blob is None:
+                size = storage.size(name) if storage.exists(name) else 0
+                created.append(self.model(name=name, size=size, references=total))
+            elif blob.references != total:
+                blob.references = total
+                changed.append(blob)
+        self.bulk_create(created, batch_size=batch_size)
+        self.bulk_update(changed, ['references'], batch_size=batch_size)
+        return len(counts)
+
+
+class ContentBlob(models.Model):
     """
-    Base model for clearance requirements
+    A stored file shared by every ClearanceDocument with the same content
     """
-    student = models.ForeignKey(Student, on_delete=models.CASCADE)
-    documents = models.ManyToManyField(ClearanceDocument, blank=True)
+    name = models.CharField(max_length=255, unique=True)  # Storage name, derived from the sha256
+    size = models.PositiveBigIntegerField(default=0)
+    references = models.PositiveIntegerField(default=0)  # ClearanceDocument rows pointing at this blob
+
+    objects = ContentBlobManager()
+
+    def __str__(self):
+        return f"{self.name} ({self.references})"
+
+
+class ClearanceUnitQuerySet(models.QuerySet):
+    def for_term(self, student_id, semester, session):
+        """
+        A student's units for a term: one range over the unique (student, semester, session, unit_type) index
+        """
+        return self.filter(student_id=student_id, semester=semester, session=session)
+
+    def statuses(self, student_id, semester, session):
+        """
+        Status of each of a student's units for a term, keyed by unit type, in one query
+        """
+        return dict(self.for_term(student_id, semester, session).values_list('unit_type', 'status'))
+
+
+class ClearanceUnitManager(models.Manager.from_queryset(ClearanceUnitQuerySet)):
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.model.UNIT_TYPE is not None:
+            queryset = queryset.filter(unit_type=self.model.UNIT_TYPE)  # A proxy sees only its own unit's rows
+        return queryset
+
+
+class ClearanceUnit(models.Model):
+    """
+    A student's clearance with one unit for a term. Department, Faculty, Hostel and Bursary are proxies limited
+    to one unit_type; write through them, as the signals keeping summaries, counters and caches listen to them.
+    """
+    UNIT_TYPE = None  # Set by each proxy
+    NAME_CHOICES = ()
+
+    unit_type = models.CharField(max_length=255, choices=CLEARANCE_TYPE_CHOICES)
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='clearance_units')
+    documents = models.ManyToManyField(ClearanceDocument, blank=True, related_name='clearance_units')
     semester = models.CharField(max_length=255, choices=SEMESTER_CHOICES)
     session = models.CharField(max_length=11, choices=SESSION_CHOICES, default=SESSION_CHOICES[0][0])
     status = models.CharField(max_length=255, default="pending", choices=(
         ('pending', 'Pending'), ('completed', 'Completed'), ('incomplete', 'Incomplete')))
+    # Department, faculty or hostel; empty for bursaries
+    name = models.CharField(max_length=255, blank=True, choices=DEPARTMENT_CHOICES + FACULTY_CHOICES + HOSTEL_CHOICES)
+    # Bursaries only
+    total_amount_paid = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
+    total_fees = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
+    outstanding_fees = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
+
+    objects = ClearanceUnitManager()
 
     class Meta:
-        abstract = True
+        constraints = [
+            # One unit of each type per student and term; led by the term, the index also serves a student's
+            # units for a term and the views' get_or_create lookups
+            models.UniqueConstraint(fields=['student', 'semester', 'session', 'unit_type'],
+                                    name='unique_clearance_unit_per_term'),
+        ]
+        indexes = [
+            models.Index(fields=['unit_type', 'session', 'semester', 'status'], name='clearance_unit_status_idx'),
+            models.Index(fields=['unit_type', 'name'], name='clearance_unit_name_idx'),
+        ]
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.UNIT_TYPE is not None and not self.unit_type:
+            self.unit_type = self.UNIT_TYPE  # Created through a proxy
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored status so save signals can tell whether it changed
+        instance._loaded_status = instance.__dict__.get('status')
+        if all(field in instance.__dict__ for field in COUNTER_FIELDS):
+            instance._loaded_counter_key = instance.counter_key()
+        return instance
 
+    def clean(self):
+        super().clean()
+        if self.NAME_CHOICES and self.name not in dict(self.NAME_CHOICES):
+            raise ValidationError({'name': f'Select a valid {self._meta.verbose_name}.'})
 
-class Department(ClearanceRequirement):
-    name = models.CharField(max_length=255, choices=DEPARTMENT_CHOICES, unique=True)
+    def counter_key(self):
+        """
+        The ClearanceCounter row this unit is counted in
+        """
+        return tuple(getattr(self, field) for field in COUNTER_FIELDS)
 
     def __str__(self):
-        return f"{self.student} - {self.name}"
+        return f"{self.student} - {self.name or self.unit_type}"
 
 
-class Faculty(ClearanceRequirement):
-    name = models.CharField(max_length=255, choices=FACULTY_CHOICES, unique=True)
+class Department(ClearanceUnit):
+    UNIT_TYPE = 'department'
+    NAME_CHOICES = DEPARTMENT_CHOICES
 
-    def __str__(self):
-        return f"{self.student} - {self.name}"
+    class Meta:
+        proxy = True
 
 
-class Hostel(ClearanceRequirement):
-    """
-    Hostel model inherits from ClearanceRequirement
-    """
-    name = models.CharField(max_length=255, unique=True, choices=HOSTEL_CHOICES)
+class Faculty(ClearanceUnit):
+    UNIT_TYPE = 'faculty'
+    NAME_CHOICES = FACULTY_CHOICES
 
-    def __str__(self):
-        return f"{self.student} - {self.name}"
+    class Meta:
+        proxy = True
 
 
-class Bursary(ClearanceRequirement):
-    """
-    Bursary model inherits from ClearanceRequirement
-    """
-    total_amount_paid = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
-    total_fees = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
-    outstanding_fees = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
+class Hostel(ClearanceUnit):
+    UNIT_TYPE = 'hostel'
+    NAME_CHOICES = HOSTEL_CHOICES
+
+    class Meta:
+        proxy = True
+
+
+class Bursary(ClearanceUnit):
+    UNIT_TYPE = 'bursary'
+
+    class Meta:
+        proxy = True
 
     def __str__(self):
         return f"{self.student} - {self.semester} ({self.total_amount_paid})"
 
 
+REQUIREMENT_MODELS = {
+    'department': Department,
+    'faculty': Faculty,
+    'hostel': Hostel,
+    'bursary': Bursary,
+}
+
+
+class StudentClearanceRequestsQuerySet(models.QuerySet):
+    def with_clearance_graph(self):
+        """
+        Join the student, user and the four units; pair with prefetch_unit_documents() on the fetched requests
+        so a page of them costs a fixed number of queries
+        """
+        return self.select_related('student__user', *CLEARANCE_UNITS)
+
+
+def prefetch_unit_documents(clearance_requests):
+    """
+    Prefetch the documents of every unit of the given requests. The four units share one documents table,
+    so this is a single query where prefetch_related() on each unit relation would run four.
+    """
+    units = [getattr(clearance_request, unit) for clearance_request in clearance_requests
+             for unit in CLEARANCE_UNITS]
+    models.prefetch_related_objects([unit for unit in units if unit is not None], 'documents')
+
+
 class StudentClearanceRequests(models.Model):
     student = models.ForeignKey(Student, on_delete=models.CASCADE)
     semester = models.CharField(max_length=255, choices=SEMESTER_CHOICES)
     session = models.CharField(max_length=11, choices=SESSION_CHOICES, default=SESSION_CHOICES[0][0])
 
-    # Foreign keys to clearance requirement models (inherited by Faculty, Department, Hostel, Bursary)
+    # Foreign keys to the unit proxies, all ClearanceUnit rows
     faculty = models.ForeignKey(Faculty, on_delete=models.CASCADE, blank=True, null=True,
                                 related_name='faculty_clearance_requests')
     department = models.ForeignKey(Department, on_delete=models.CASCADE, blank=True, null=True,
@@ -135,5 +303,213 @@ class StudentClearanceRequests(models.Model):
     bursary = models.ForeignKey(Bursary, on_delete=models.CASCADE, blank=True, null=True,
                                 related_name='bursary_clearance_requests')
 
+    objects = StudentClearanceRequestsQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['student', 'semester', 'session'], name='unique_clearance_request_per_term'),
+        ]
+        indexes = [
+            models.Index(fields=['session', 'semester'], name='clearance_request_term_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.student} - {self.semester} ({self.session})"
+
+
+class ClearanceStatusSummaryManager(models.Manager):
+    def _statuses(self, clearance_request):
+        # Read each unit's status off an already joined clearance request
+        statuses = {}
+        for unit in CLEARANCE_UNITS:
+            requirement = getattr(clearance_request, unit)
+            statuses[f'{unit}_status'] = requirement.status if requirement is not None else 'Unknown'
+        return statuses
+
+    def refresh(self, student_id, semester, session):
+        """
+        Recompute the summary row for one (student, semester, session) from its latest clearance request
+        """
+        clearance_request = StudentClearanceRequests.objects.filter(
+            student_id=student_id, semester=semester, session=session,
+        ).select_related(*CLEARANCE_UNITS).order_by('-pk').first()
+
+        if clearance_request is None:
+            self.filter(student_id=student_id, semester=semester, session=session).delete()
+            return None
+
+        summary, _ = self.update_or_create(
+            student_id=student_id, semester=semester, session=session,
+            defaults=self._statuses(clearance_request),
+        )
+        return summary
+
+    def rebuild(self, batch_size=2000):
+        """
+        Drop and recreate every summary row from the clearance requests, returning the number written
+        """
+        clearance_requests = StudentClearanceRequests.objects.select_related(*CLEARANCE_UNITS).order_by(
+            'student_id', 'semester', 'session', '-pk',
+        ).iterator(chunk_size=batch_size)
+
+        written = 0
+        batch = []
+        last_key = None
+        with transaction.atomic():
+            self.all().delete()
+            for clearance_request in clearance_requests:
+                key = (clearance_request.student_id, clearance_request.semester, clearance_request.session)
+                if key == last_key:
+                    continue  # Only the latest request of each group is summarized
+                last_key = key
+                batch.append(self.model(
+                    student_id=clearance_request.student_id,
+                    semester=clearance_request.semester,
+                    session=clearance_request.session,
+                    **self._statuses(clearance_request),
+                ))
+                if len(batch) >= batch_size:
+                    self.bulk_create(batch)
+                    written += len(batch)
+                    batch = []
+            if batch:
+                self.bulk_create(batch)
+                written += len(batch)
+        return written
+
+
+class ClearanceStatusSummary(models.Model):
+    """
+    Denormalized clearance status per student, semester and session, kept current by signals
+    """
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='status_summaries')
+    semester = models.CharField(max_length=255, choices=SEMESTER_CHOICES)
+    session = models.CharField(max_length=11, choices=SESSION_CHOICES, default=SESSION_CHOICES[0][0])
+    department_status = models.CharField(max_length=255, default='Unknown')
+    faculty_status = models.CharField(max_length=255, default='Unknown')
+    hostel_status = models.CharField(max_length=255, default='Unknown')
+    bursary_status = models.CharField(max_length=255, default='Unknown')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = ClearanceStatusSummaryManager()
+
+    class Meta:
+        constraints = [
+            # Leading (student, semester) also serves the status page's latest-semester lookup
+            models.UniqueConstraint(fields=['student', 'semester', 'session'], name='unique_status_summary'),
+        ]
+
     def __str__(self):
         return f"{self.student} - {self.semester} ({self.session})"
+
+
+class ClearanceCounterManager(models.Manager):
+    def adjust(self, deltas):
+        """
+        Add each change to its counter, creating counters on first use; ``deltas`` maps
+        (unit, name, session, semester, status) keys to the change in count
+        """
+        for key, delta in deltas.items():
+            if not delta:
+                continue
+            fields = dict(zip(('unit', 'name', 'session', 'semester', 'status'), key))
+            if self.filter(**fields).update(count=models.F('count') + delta):
+                continue
+            try:
+                with transaction.atomic():
+                    self.create(count=delta, **fields)
+            except IntegrityError:
+                self.filter(**fields).update(count=models.F('count') + delta)  # Created meanwhile
+
+    def rebuild(self):
+        """
+        Recount every clearance unit with one GROUP BY and replace all counters, returning the number written
+        """
+        counters = [
+            self.model(unit=row['unit_type'], name=row['name'], session=row['session'], semester=row['semester'],
+                       status=row['status'], count=row['total'])
+            for row in ClearanceUnit.objects.order_by().values(*COUNTER_FIELDS).annotate(total=models.Count('pk'))
+        ]
+        with transaction.atomic():
+            self.all().delete()
+            self.bulk_create(counters)
+        return len(counters)
+
+
+class ClearanceCounter(models.Model):
+    """
+    Number of requirements per unit, name, term and status, kept current by signals for the analytics endpoint
+    """
+    unit = models.CharField(max_length=255, choices=CLEARANCE_TYPE_CHOICES)
+    name = models.CharField(max_length=255, blank=True)  # Department, faculty or hostel; empty for bursaries
+    session = models.CharField(max_length=11, choices=SESSION_CHOICES)
+    semester = models.CharField(max_length=255, choices=SEMESTER_CHOICES)
+    status = models.CharField(max_length=255)
+    count = models.IntegerField(default=0)
+
+    objects = ClearanceCounterManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['unit', 'name', 'session', 'semester', 'status'],
+                                    name='unique_clearance_counter'),
+        ]
+
+    def __str__(self):
+        return f"{self.unit} {self.name} {self.session} {self.semester} {self.status}: {self.count}"
+
+
+class ChunkedUpload(models.Model):
+    """
+    A clearance document being uploaded in pieces; becomes a ClearanceDocument on finalize
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='chunked_uploads')
+    filename = models.CharField(max_length=255)
+    total_size = models.PositiveBigIntegerField()
+    offset = models.PositiveBigIntegerField(default=0)  # Bytes received so far
+    clearance_type = models.CharField(max_length=255, choices=CLEARANCE_TYPE_CHOICES)
+    document_type = models.CharField(max_length=255, choices=DOCUMENT_TYPE_CHOICES)
+    description = models.TextField()
+    semester = models.CharField(max_length=255, choices=SEMESTER_CHOICES)
+    session = models.CharField(max_length=11, choices=SESSION_CHOICES, default=SESSION_CHOICES[0][0])
+    status = models.CharField(max_length=255, default='uploading', choices=(
+        ('uploading', 'Uploading'), ('complete', 'Complete')))
+    sha256 = models.CharField(max_length=64, blank=True)
+    document = models.ForeignKey(ClearanceDocument, on_delete=models.SET_NULL, blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.student} - {self.filename} ({self.offset}/{self.total_size})"
+
+
+class OutboxEmail(models.Model):
+    """
+    An email waiting to be sent by the send_outbox worker
+    """
+    to = models.EmailField()
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    dedupe_key = models.CharField(max_length=255, blank=True)  # Only one pending email per key
+    status = models.CharField(max_length=255, default='pending', choices=(
+        ('pending', 'Pending'), ('sent', 'Sent'), ('failed', 'Failed')))
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['dedupe_key'], condition=models.Q(status='pending') & ~models.Q(dedupe_key=''),
+                name='unique_pending_outbox_email',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.to} - {self.subject} ({self.status})"
@@ -0,0 +1,133 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import IntegrityError, transaction
+from django.template.loader import get_template, render_to_string
+from django.utils import timezone
+
+from .models import OutboxEmail
+
+
+def queue_email(to, subject, template, context, dedupe_key=''):
+    """
+    Render an email into the outbox; returns None when an unsent email with the same dedupe key is waiting
+    """
+    if dedupe_key and OutboxEmail.objects.filter(dedupe_key=dedupe_key, status='pending').exists():
+        return None
+    try:
+        with transaction.atomic():
+            return OutboxEmail.objects.create(
+                to=to, subject=subject, body=render_to_string(template, context), dedupe_key=dedupe_key,
+            )
+    except IntegrityError:
+        return None  # Lost a race with another request queueing the same email
+
+
+def queue_submission_email(clearance_request):
+    student = clearance_request.student
+    return queue_email(
+        student.email,
+        'Clearance request received',
+        'emails/clearance_submitted.txt',
+        {'student': student, 'clearance_request': clearance_request},
+        dedupe_key=f'submission:{clearance_request.pk}',
+    )
+
+
+def _status_email(requirement):
+    student = requirement.student
+    unit = requirement._meta.verbose_name
+    return (
+        student.email,
+        f'Your {unit} clearance is {requirement.get_status_display().lower()}',
+        'emails/status_changed.txt',
+        {'student': student, 'requirement': requirement, 'unit': unit},
+        f'status:{requirement._meta.model_name}:{requirement.pk}:{requirement.status}',
+    )
+
+
+def queue_status_email(requirement):
+    to, subject, template, context, dedupe_key = _status_email(requirement)
+    return queue_email(to, subject, template, context, dedupe_key=dedupe_key)
+
+
+def queue_status_emails(requirements, batch_size=500):
+    """
+    queue_status_email for many requirements with their students joined, in one insert per batch; returns the
+    number queued
+    """
+    queued = 0
+    templates = {}
+    for start in range(0, len(requirements), batch_size):
+        emails = []
+        for requirement in requirements[start:start + batch_size]:
+            to, subject, template, context, dedupe_key = _status_email(requirement)
+            if template not in templates:
+                templates[template] = get_template(template)  # Looked up once, not per email
+            emails.append(OutboxEmail(to=to, subject=subject, body=templates[template].render(context),
+                                      dedupe_key=dedupe_key))
+        pending = set(OutboxEmail.objects.filter(
+            status='pending', dedupe_key__in=[email.dedupe_key for email in emails],
+        ).values_list('dedupe_key', flat=True))
+        emails = [email for email in emails if email.dedupe_key not in pending]
+        OutboxEmail.objects.bulk_create(emails, ignore_conflicts=True)
+        queued += len(emails)
+    return queued
+
+
+def retry_delay(attempts):
+    return timedelta(seconds=settings.OUTBOX_RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+
+
+def send_due_emails(batch_size=None, connection=None):
+    """
+    Send one batch of due emails over a single connection and return (sent, failed) counts
+    """
+    batch_size = batch_size or settings.OUTBOX_BATCH_SIZE
+    now = timezone.now()
+    claimed_until = now + timedelta(seconds=settings.OUTBOX_CLAIM_SECONDS)
+    with transaction.atomic():  # Takes the write lock on SQLite; elsewhere rows locked by another worker are skipped
+        emails = list(OutboxEmail.objects.select_for_update(skip_locked=True).filter(
+            status='pending', next_attempt_at__lte=now,
+        ).order_by('pk')[:batch_size])
+        ids = [email.pk for email in emails]
+        # Claim the batch by moving it out of the due window; if this worker dies, it is due again after the claim
+        claimed = OutboxEmail.objects.filter(pk__in=ids, status='pending', next_attempt_at__lte=now).update(
+            next_attempt_at=claimed_until,
+        )
+    if claimed < len(emails):  # Another worker claimed some first; send only what this UPDATE took
+        emails = list(OutboxEmail.objects.filter(pk__in=ids, next_attempt_at=claimed_until).order_by('pk'))
+    if not emails:
+        return 0, 0
+
+    connection = connection or get_connection()
+    sent = failed = 0
+    delivered = []
+    connection.open()
+    try:
+        for email in emails:
+            message = EmailMessage(email.subject, email.body, settings.DEFAULT_FROM_EMAIL, [email.to],
+                                   connection=connection)
+            email.attempts += 1
+            try:
+                message.send()
+            except Exception as error:
+                failed += 1
+                email.last_error = str(error)
+                if email.attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+                    email.status = 'failed'
+                else:
+                    email.next_attempt_at = now + retry_delay(email.attempts)
+            else:
+                sent += 1
+                email.status = 'sent'
+                email.sent_at = timezone.now()
+                email.last_error = ''
+            delivered.append(email)
+    finally:
+        connection.close()
+        OutboxEmail.objects.bulk_update(
+            delivered, ['status', 'attempts', 'next_attempt_at', 'last_error', 'sent_at'],
+        )
+    return sent, failed
@@ -0,0 +1,182 @@
+import csv
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.db.models.functions import Lower
+
+from .models import Student
+from .search import index_students
+
+ROSTER_FIELDS = ('matric_number', 'first_name', 'last_name', 'email')
+
+
+def read_roster(path):
+    """
+    Yield roster rows as dicts from a CSV file with a header row or a JSON Lines file
+    """
+    with open(path, newline='', encoding='utf-8') as roster:
+        if path.endswith(('.jsonl', '.ndjson')):
+            for line in roster:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from csv.DictReader(roster)
+
+
+def _setup_worker():
+    # Spawned workers start without Django; forked ones inherit it already configured
+    import django
+    from django.apps import apps
+
+    if not apps.ready:
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ResumptionClearanceSystem.settings')
+        django.setup()
+
+
+def _hash_password(password):
+    return make_password(password or None)  # No initial password gives an unusable one
+
+
+def _text(value):
+    """
+    A roster value as text: JSON Lines rows may hold numbers, such as a numeric matric number. Missing values are
+    empty; lists, objects and booleans are None, so their row is invalid.
+    """
+    if value is None:
+        return ''
+    if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+        return None
+    return str(value)
+
+
+class StudentImporter:
+    """
+    Inserts roster rows as User and Student pairs in batches, skipping students already registered
+    """
+
+    def __init__(self, batch_size=1000, workers=None):
+        self.batch_size = batch_size
+        self.workers = workers or os.cpu_count() or 1
+        self.summary = {'inserted': 0, 'skipped': 0, 'conflicting': 0, 'invalid': 0}
+        self.conflicts = []
+        self._seen_matric_numbers = set()
+        self._seen_emails = set()
+
+    def run(self, rows):
+        executor = None
+        if self.workers > 1:
+            executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_setup_worker)
+        try:
+            batch = []
+            for row in rows:
+                batch.append(row)
+                if len(batch) >= self.batch_size:
+                    self._import_batch(batch, executor)
+                    batch = []
+            if batch:
+                self._import_batch(batch, executor)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        return self.summary
+
+    def _clean(self, row):
+        if not isinstance(row, dict):
+            return None  # A JSON Lines line holding a list or a bare value
+        cleaned = {field: _text(row.get(field)) for field in ROSTER_FIELDS}
+        password = _text(row.get('password'))
+        if None in cleaned.values() or password is None:
+            return None
+        cleaned = {field: value.strip() for field, value in cleaned.items()}
+        if not all(cleaned.values()):
+            return None
+        cleaned['email'] = cleaned['email'].lower()  # Compared with Lower(email): registration keeps the case typed
+        cleaned['password'] = password
+        return cleaned
+
+    def _conflict(self, row, reason):
+        self.summary['conflicting'] += 1
+        self.conflicts.append((row['matric_number'], reason))
+
+    def _import_batch(self, batch, executor):
+        rows = []
+        for row in batch:
+            cleaned = self._clean(row)
+            if cleaned is None:
+                self.summary['invalid'] += 1
+            else:
+                rows.append(cleaned)
+
+        matric_numbers = [row['matric_number'] for row in rows]
+        emails = [row['email'] for row in rows]
+        # One set-based lookup for every matric number and email in the batch, on the student_email_lower_idx index
+        existing = dict(Student.objects.annotate(email_lower=Lower('email')).filter(
+            Q(matric_number__in=matric_numbers) | Q(email_lower__in=emails)
+        ).values_list('matric_number', 'email_lower'))
+        existing_emails = set(existing.values())
+        taken_usernames = set(User.objects.filter(username__in=matric_numbers).values_list('username', flat=True))
+
+        accepted = []
+        for row in rows:
+            matric_number, email = row['matric_number'], row['email']
+            if matric_number in existing:
+                if existing[matric_number] == email:
+                    self.summary['skipped'] += 1
+                else:
+                    self._conflict(row, 'matric number registered with another email')
+            elif email in existing_emails:
+                self._conflict(row, 'email registered to another student')
+            elif matric_number in taken_usernames:
+                self._conflict(row, 'username already taken')
+            elif matric_number in self._seen_matric_numbers or email in self._seen_emails:
+                self._conflict(row, 'duplicate row in roster')
+            else:
+                self._seen_matric_numbers.add(matric_number)
+                self._seen_emails.add(email)
+                accepted.append(row)
+        if not accepted:
+            return
+
+        passwords = [row['password'] for row in accepted]
+        if executor is None:
+            hashes = [_hash_password(password) for password in passwords]
+        else:
+            chunksize = max(1, len(passwords) // (self.workers * 4))
+            hashes = list(executor.map(_hash_password, passwords, chunksize=chunksize))
+
+        try:
+            self._insert(accepted, hashes)
+        except IntegrityError:
+            # A registration committed since the lookup above; insert the rows one by one to find it
+            for row, password_hash in zip(accepted, hashes):
+                try:
+                    self._insert([row], [password_hash])
+                except IntegrityError:
+                    self._conflict(row, 'registered while the import ran')
+
+    def _insert(self, rows, hashes):
+        """
+        Create the rows' users and students in one transaction, rolled back whole on an IntegrityError
+        """
+        with transaction.atomic():
+            User.objects.bulk_create([
+                User(username=row['matric_number'], email=row['email'], password=password_hash,
+                     first_name=row['first_name'], last_name=row['last_name'])
+                for row, password_hash in zip(rows, hashes)
+            ])
+            # Not every backend returns primary keys from bulk_create, so read them back
+            user_ids = dict(User.objects.filter(
+                username__in=[row['matric_number'] for row in rows]
+            ).values_list('username', 'pk'))
+            students = Student.objects.bulk_create([
+                Student(user_id=user_ids[row['matric_number']], matric_number=row['matric_number'],
+                        first_name=row['first_name'], last_name=row['last_name'], email=row['email'])
+                for row in rows
+            ])
+            index_students(students)  # bulk_create sends no post_save, so the search index is filled here
+        self.summary['inserted'] += len(rows)
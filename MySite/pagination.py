@@ -0,0 +1,74 @@
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import QuerySet, Sum
+from django.utils.functional import cached_property
+from rest_framework.pagination import CursorPagination
+
+from .models import ClearanceCounter
+
+
+class ClearanceCursorPagination(CursorPagination):
+    """
+    Keyset pagination over the primary key, so deep pages cost the same as the first
+    """
+    ordering = '-pk'
+    page_size_query_param = 'page_size'  # Default comes from REST_FRAMEWORK['PAGE_SIZE']
+    max_page_size = 500
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Admin paginator that takes the row count of an unfiltered list from the planner statistics once the table
+    is past ESTIMATED_COUNT_THRESHOLD rows, instead of a COUNT(*) over the whole table on every page.
+    Filtered lists, and databases without statistics, are counted exactly.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if isinstance(queryset, QuerySet) and not queryset.query.where:
+            estimate = estimated_row_count(queryset.model, queryset.db)
+            if estimate is not None and estimate >= settings.ESTIMATED_COUNT_THRESHOLD:
+                return estimate
+        return super().count
+
+
+class UnitCountPaginator(Paginator):
+    """
+    Admin paginator for the clearance unit proxies. Their rows share one table, so planner statistics cannot
+    count them; an unfiltered list is counted from the ClearanceCounter rows of its unit instead once they add
+    up to ESTIMATED_COUNT_THRESHOLD. Below that, and for filtered lists, a COUNT(*) is cheap and cannot drift.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if isinstance(queryset, QuerySet) and queryset.query.where == queryset.model.objects.all().query.where:
+            counted = ClearanceCounter.objects.filter(unit=queryset.model.UNIT_TYPE).aggregate(total=Sum('count'))
+            if (counted['total'] or 0) >= settings.ESTIMATED_COUNT_THRESHOLD:
+                return counted['total']
+        return super().count
+
+
+def estimated_row_count(model, using='default'):
+    """
+    The planner's row estimate for the model's table: sqlite_stat1 (written by ANALYZE or PRAGMA optimize) on
+    SQLite, pg_class.reltuples on PostgreSQL; None when there is none
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+            if cursor.fetchone() is None:
+                return None
+            # One row per index, or a NULL index row for a table without any; each starts with the row count
+            cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1', [table])
+            row = cursor.fetchone()
+            return int(row[0].split()[0]) if row else None
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples FROM pg_class WHERE oid = %s::regclass', [table])
+            row = cursor.fetchone()
+            return int(row[0]) if row and row[0] >= 0 else None
+    return None
@@ -0,0 +1,208 @@
+"""
+Bursary reconciliation against bank or payment-gateway statements.
+
+The statement is streamed row by row. Each payment is matched to a student through an in-memory index of
+matric numbers and summed per student and session (and semester, when the statement has one) in Decimal.
+The sums are then applied to the term's Bursary rows, whose outstanding fees are recomputed, and only the
+changed rows are written back.
+"""
+import csv
+import re
+from collections import defaultdict
+from decimal import Decimal, InvalidOperation
+
+from django.db import connections, router, transaction
+
+from .caching import bump_model_generation
+from .models import Bursary, Student, SEMESTER_CHOICES, SESSION_CHOICES
+
+CENT = Decimal('0.01')
+ZERO = Decimal('0.00')
+# A whole cell: an optional currency code or symbol, comma thousands separators only in groups of three, and a
+# minus sign or accounting parentheses for a reversal. Anything else, such as "1.000,00" or "1e5", is no amount.
+AMOUNT = re.compile(r"""
+    (?P<open>\()?\s*
+    (?P<minus>-)?\s*
+    (?:[A-Za-z]{3}\s*|[^\w\s().,+\-]\s*)?
+    (?P<minus_after_currency>-)?\s*
+    (?P<number>\d{1,3}(?:,\d{3})+|\d+)(?P<fraction>\.\d+)?
+    (?:\s*[A-Za-z]{3})?
+    \s*(?P<close>\))?
+""", re.VERBOSE)
+SESSIONS = {value for value, _ in SESSION_CHOICES}
+SEMESTERS = {value for value, _ in SEMESTER_CHOICES}
+
+# Statement header for each value; semester and reference columns are optional
+DEFAULT_COLUMNS = {
+    'matric_number': 'matric_number',
+    'amount': 'amount',
+    'session': 'session',
+    'semester': 'semester',
+    'reference': 'reference',
+}
+
+
+def parse_amount(text):
+    """
+    Exact amount of a statement cell such as "NGN 150,000.00" or "(500.00)"; raises InvalidOperation for a cell
+    that does not hold exactly one amount, rather than guessing at it
+    """
+    match = AMOUNT.fullmatch((text or '').strip())
+    if (match is None or bool(match['open']) != bool(match['close'])
+            or [match['open'], match['minus'], match['minus_after_currency']].count(None) < 2):
+        raise InvalidOperation(text)  # Unbalanced parentheses, or more than one way of saying negative
+    amount = Decimal(match['number'].replace(',', '') + (match['fraction'] or '')).quantize(CENT)
+    return -amount if match['open'] or match['minus'] or match['minus_after_currency'] else amount
+
+
+def outstanding(total_fees, total_amount_paid):
+    return max(total_fees - total_amount_paid, ZERO)
+
+
+def write_totals(changes, batch_size=1000):
+    """
+    Save (id, total_amount_paid, outstanding_fees) ``changes`` with one prepared UPDATE run for every row of a
+    batch. QuerySet.bulk_update would build a CASE over the whole batch for each field, which costs about a
+    millisecond of Python per row and turns a 200k line statement into minutes.
+    """
+    connection = connections[router.db_for_write(Bursary)]
+    quote = connection.ops.quote_name
+    fields = [Bursary._meta.get_field('total_amount_paid'), Bursary._meta.get_field('outstanding_fees')]
+    sql = 'UPDATE {} SET {} WHERE {} = %s'.format(
+        quote(Bursary._meta.db_table), ', '.join(f'{quote(field.column)} = %s' for field in fields),
+        quote(Bursary._meta.pk.column),
+    )
+    with connection.cursor() as cursor:
+        for start in range(0, len(changes), batch_size):
+            cursor.executemany(sql, [
+                [field.get_db_prep_save(value, connection) for field, value in zip(fields, values)] + [pk]
+                for pk, *values in changes[start:start + batch_size]
+            ])
+
+
+class BursaryReconciler:
+    """
+    Sums a statement's payments per student and term and writes the Bursary totals they imply.
+
+    By default a student's total_amount_paid for a term becomes the statement's total for it, so importing the
+    same statement twice changes nothing; with ``add`` the statement's payments are added to the stored totals.
+    Payments without a semester fill the session's bursaries in semester order up to their fees, and whatever is
+    left goes to the last one.
+    """
+
+    def __init__(self, columns=None, session=None, add=False, batch_size=1000):
+        self.columns = {**DEFAULT_COLUMNS, **(columns or {})}
+        self.session = session  # For statements without a session column, or rows with it empty
+        self.add = add
+        self.batch_size = batch_size
+        self.summary = {'rows': 0, 'matched': 0, 'unmatched': 0, 'invalid': 0, 'duplicates': 0, 'unapplied': 0,
+                        'updated': 0}
+        self.unmatched = []  # (line, matric number, amount, reason)
+
+    def run(self, lines, dry_run=False):
+        """
+        Reconcile the CSV statement read from ``lines`` (a file or any iterable of lines) and return the summary
+        """
+        totals = self.aggregate(csv.DictReader(lines))
+        changed = self.apply(totals)
+        self.summary['updated'] = len(changed)
+        if not dry_run and changed:
+            with transaction.atomic():
+                write_totals(changed, self.batch_size)
+                transaction.on_commit(lambda: bump_model_generation(Bursary))  # The UPDATEs send no signals
+        return self.summary
+
+    def _reject(self, line, matric_number, amount, reason, counter='invalid'):
+        self.summary[counter] += 1
+        self.unmatched.append((line, matric_number, amount, reason))
+
+    def aggregate(self, rows):
+        """
+        Sum payments per (student id, session, semester or None), remembering the first line of each
+        """
+        index = {matric_number.strip().upper(): pk
+                 for matric_number, pk in Student.objects.values_list('matric_number', 'pk').iterator(chunk_size=5000)}
+        columns = self.columns
+        totals = defaultdict(Decimal)
+        self.first_lines = {}
+        references = set()
+        for line, row in enumerate(rows, start=2):  # Line 1 is the header
+            self.summary['rows'] += 1
+            matric_number = (row.get(columns['matric_number']) or '').strip()
+            raw_amount = row.get(columns['amount'])
+            try:
+                amount = parse_amount(raw_amount)
+            except InvalidOperation:
+                self._reject(line, matric_number, raw_amount, 'invalid amount')
+                continue
+
+            reference = (row.get(columns['reference']) or '').strip()
+            if reference:
+                if reference in references:
+                    self._reject(line, matric_number, amount, f'duplicate reference {reference}', 'duplicates')
+                    continue
+                references.add(reference)
+
+            session = (row.get(columns['session']) or '').strip() or self.session
+            semester = (row.get(columns['semester']) or '').strip().lower() or None
+            if session not in SESSIONS or (semester is not None and semester not in SEMESTERS):
+                self._reject(line, matric_number, amount, f'unknown term {session} {semester or ""}'.strip())
+                continue
+
+            student_id = index.get(matric_number.upper())
+            if student_id is None:
+                self._reject(line, matric_number, amount, 'unknown matric number', 'unmatched')
+                continue
+
+            self.summary['matched'] += 1
+            key = (student_id, session, semester)
+            totals[key] += amount
+            self.first_lines.setdefault(key, (line, matric_number))
+        return totals
+
+    def apply(self, totals):
+        """
+        Work out each affected Bursary's new totals and return (id, total_amount_paid, outstanding_fees) for the
+        rows that changed. Rows are read as tuples: building model instances would cost more than the matching.
+        """
+        sessions = {session for _, session, _ in totals}
+        students = {student_id for student_id, _, _ in totals}
+        bursaries = defaultdict(list)  # (student id, session) -> (id, semester, fees) in semester order
+        stored = {}  # Bursary id -> (total_amount_paid, outstanding_fees) before the statement
+        rows = Bursary.objects.filter(session__in=sessions).order_by('student_id', 'session', 'semester').values_list(
+            'pk', 'student_id', 'session', 'semester', 'total_fees', 'total_amount_paid', 'outstanding_fees',
+        )
+        for pk, student_id, session, semester, total_fees, total_amount_paid, outstanding_fees in rows.iterator(
+                chunk_size=5000):
+            if student_id in students:
+                bursaries[(student_id, session)].append((pk, semester, total_fees))
+                stored[pk] = (total_amount_paid, outstanding_fees)
+
+        paid = {}  # Bursary id -> new total paid
+        fees = {}
+        # Payments for a named semester first, so payments for the whole session only fill what remains
+        for key in sorted(totals, key=lambda key: key[2] is None):
+            student_id, session, semester = key
+            targets = [bursary for bursary in bursaries.get((student_id, session), ())
+                       if semester is None or bursary[1] == semester]
+            if not targets:
+                line, matric_number = self.first_lines[key]
+                self._reject(line, matric_number, totals[key], f'no bursary for {session} {semester or ""}'.strip(),
+                             'unapplied')
+                continue
+            for pk, _, total_fees in targets:
+                paid.setdefault(pk, stored[pk][0] if self.add else ZERO)
+                fees[pk] = total_fees
+            remaining = totals[key]
+            for pk, _, total_fees in targets[:-1]:
+                share = min(max(total_fees - paid[pk], ZERO), remaining)
+                paid[pk] += share
+                remaining -= share
+            paid[targets[-1][0]] += remaining
+
+        changed = []
+        for pk, total_amount_paid in paid.items():
+            balance = outstanding(fees[pk], total_amount_paid)
+            if (total_amount_paid, balance) != stored[pk]:
+                changed.append((pk, total_amount_paid, balance))
+        return changed
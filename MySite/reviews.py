@@ -0,0 +1,125 @@
+"""
+Set-based status changes for clearance requirements.
+
+QuerySet.update() skips the save signals, so set_status does their work itself once per call instead of once
+per row: it updates the status summaries and analytics counters, queues the students' status emails and
+invalidates their cached pages and the model's API responses. review() applies an officer's batch of decisions
+through it.
+"""
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .caching import bump_model_generation, bump_student_cache_version
+from .events import publish
+from .models import REQUIREMENT_MODELS, StudentClearanceRequests, ClearanceStatusSummary, ClearanceCounter
+from .notifications import queue_status_emails
+
+# Status an officer may move a requirement to from each status. Requirements start as pending, and only officers
+# change the status afterwards
+STATUS_TRANSITIONS = {
+    'pending': {'completed', 'incomplete'},
+    'incomplete': {'completed', 'pending'},
+    'completed': {'incomplete'},
+}
+
+
+def sources_of(status):
+    return [source for source, targets in STATUS_TRANSITIONS.items() if status in targets]
+
+
+def set_status(queryset, status):
+    """
+    Move every requirement in ``queryset`` not already in ``status`` to it with one UPDATE, returning the
+    number changed
+    """
+    model = queryset.model
+    unit = model._meta.model_name
+    with transaction.atomic():
+        rows = queryset.exclude(status=status)
+        changed = list(rows.select_related('student'))
+        if not changed:
+            return 0
+
+        # Summaries first: once updated the rows no longer match ``rows``
+        linked = StudentClearanceRequests.objects.filter(
+            student_id=OuterRef('student_id'), semester=OuterRef('semester'), session=OuterRef('session'),
+            **{f'{unit}__in': rows.values('pk')},
+        )
+        ClearanceStatusSummary.objects.filter(Exists(linked)).update(
+            **{f'{unit}_status': status}, updated_at=timezone.now(),
+        )
+        rows.update(status=status)
+
+        counts = defaultdict(int)
+        for requirement in changed:
+            counts[requirement.counter_key()] -= 1
+            requirement.status = requirement._loaded_status = status
+            requirement._loaded_counter_key = requirement.counter_key()
+            counts[requirement._loaded_counter_key] += 1
+        ClearanceCounter.objects.adjust(counts)
+        queue_status_emails(changed)
+
+        student_ids = {requirement.student_id for requirement in changed}
+
+        def invalidate():
+            for student_id in student_ids:
+                bump_student_cache_version(student_id)
+                publish(student_id)
+            bump_model_generation(model)
+
+        transaction.on_commit(invalidate)
+    return len(changed)
+
+
+def review(items, batch_size=None):
+    """
+    Apply (unit, id, status) decisions in one transaction and return a result per item, in order.
+
+    Each unit's current statuses are read and each (unit, status) group is written through set_status in
+    batches of BULK_REVIEW_BATCH_SIZE ids, so the query count grows with the number of batches, not of items.
+    Results are ``updated``, ``unchanged``, ``not_found``, ``invalid_transition`` or ``duplicate`` (the id
+    already appeared earlier in the items).
+    """
+    batch_size = batch_size or settings.BULK_REVIEW_BATCH_SIZE
+    results = [None] * len(items)
+    by_unit = defaultdict(list)
+    for index, (unit, pk, status) in enumerate(items):
+        by_unit[unit].append((index, pk, status))
+
+    with transaction.atomic():
+        for unit, entries in by_unit.items():
+            model = REQUIREMENT_MODELS[unit]
+            ids = list(dict.fromkeys(pk for _, pk, _ in entries))
+            current = {}
+            for start in range(0, len(ids), batch_size):
+                current.update(model.objects.filter(pk__in=ids[start:start + batch_size]).values_list('pk', 'status'))
+
+            moves = defaultdict(list)  # New status -> ids
+            seen = set()
+            for index, pk, status in entries:
+                previous = current.get(pk)
+                if pk in seen:
+                    outcome = 'duplicate'
+                elif previous is None:
+                    outcome = 'not_found'
+                elif previous == status:
+                    outcome = 'unchanged'
+                elif status not in STATUS_TRANSITIONS[previous]:
+                    outcome = 'invalid_transition'
+                else:
+                    outcome = 'updated'
+                    moves[status].append(pk)
+                seen.add(pk)
+                results[index] = {'type': unit, 'id': pk, 'status': status, 'previous_status': previous,
+                                  'result': outcome}
+
+            for status, pks in moves.items():
+                for start in range(0, len(pks), batch_size):
+                    # The status guard re-checks the transition in the UPDATE itself
+                    set_status(model.objects.filter(pk__in=pks[start:start + batch_size],
+                                                    status__in=sources_of(status)), status)
+    return results
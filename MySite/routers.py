@@ -0,0 +1,75 @@
+"""
+Routes reads made by the status views and read-only API viewsets to the optional ``replica`` database
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+REPLICA_DATABASE = 'replica'
+
+_reading_from_replica = ContextVar('reading_from_replica', default=False)
+
+
+@contextmanager
+def read_from_replica():
+    """
+    Send MySite model reads inside the block to the replica, when one is configured
+    """
+    token = _reading_from_replica.set(True)
+    try:
+        yield
+    finally:
+        _reading_from_replica.reset(token)
+
+
+def replica_reads(view_func):
+    """
+    Run a sync or async view inside read_from_replica()
+    """
+    if iscoroutinefunction(view_func):
+        async def wrapper(request, *args, **kwargs):
+            with read_from_replica():
+                return await view_func(request, *args, **kwargs)
+
+        markcoroutinefunction(wrapper)
+    else:
+        def wrapper(request, *args, **kwargs):
+            with read_from_replica():
+                return view_func(request, *args, **kwargs)
+
+    return wraps(view_func)(wrapper)
+
+
+class ReplicaReadMixin:
+    """
+    Serves a read-only viewset from the replica; sessions and users still come from the primary
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        with read_from_replica():
+            return super().dispatch(request, *args, **kwargs)
+
+
+class ReplicaRouter:
+    """
+    Reads of MySite models go to the replica inside read_from_replica(); sessions, users and every write stay
+    on the primary, so a lagging replica can delay a status change but never a login or a save
+    """
+
+    def db_for_read(self, model, **hints):
+        if (_reading_from_replica.get() and model._meta.app_label == 'MySite'
+                and REPLICA_DATABASE in settings.DATABASES):
+            return REPLICA_DATABASE
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'  # Rows loaded from the replica would otherwise be saved back to it
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True  # Both aliases hold the same data
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return None
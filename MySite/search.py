@@ -0,0 +1,112 @@
+"""
+Student search by matric number, names and email.
+
+On SQLite the students are indexed in an FTS5 table, MySite_studentsearch, whose rowid is the student's id.
+Student signals keep it current; ``manage.py rebuild_student_search`` refills it after loads that bypass them.
+Every word of a query must be the start of a word in one of the columns, and matches are ranked by bm25
+with matric numbers and names weighted above email. Matric numbers and emails are single words, so
+"DU/2020" and "ada@" are prefixes while "example" matches nobody's email rather than everybody's.
+
+bm25 scores every match, about 2 microseconds each, so queries matching more than STUDENT_SEARCH_RANK_LIMIT
+students (a first name alone, say) come back in id order instead; another word narrows them enough to rank.
+Other databases fall back to prefix matches on the Upper() indexes on Student.
+"""
+import re
+
+from django.conf import settings
+from django.db import connections, router
+from django.db.models import Q
+from django.db.models.functions import Upper
+from django.db.models.lookups import GreaterThanOrEqual, LessThan
+
+from .models import Student
+
+TABLE = 'MySite_studentsearch'
+COLUMNS = ('matric_number', 'first_name', 'last_name', 'email')
+WEIGHTS = (10.0, 5.0, 5.0, 1.0)  # bm25 weight of each column
+# Slashes, @ and dots are part of words for the table's tokenizer (see migration 0012), keeping matric
+# numbers and emails whole; queries are split the same way
+SEPARATORS = '/@.'
+WORD = re.compile(r'[\w/@.]+')
+
+INSERT = f'INSERT INTO "{TABLE}" (rowid, {", ".join(COLUMNS)}) VALUES (%s, {", ".join(["%s"] * len(COLUMNS))})'
+DELETE = f'DELETE FROM "{TABLE}" WHERE rowid = %s'
+COUNT = f'SELECT COUNT(*) FROM (SELECT 1 FROM "{TABLE}" WHERE "{TABLE}" MATCH %s LIMIT %s)'
+MATCH = f'SELECT rowid FROM "{TABLE}" WHERE "{TABLE}" MATCH %s ORDER BY rowid LIMIT %s'
+RANKED_MATCH = (f'SELECT rowid FROM "{TABLE}" WHERE "{TABLE}" MATCH %s '
+                f'ORDER BY bm25("{TABLE}", {", ".join(map(str, WEIGHTS))}), rowid LIMIT %s')
+
+
+def prefix_match(field, prefix):
+    """
+    Case-insensitive startswith written as a range over Upper(field), so the expression index is range-scanned
+    """
+    expression, prefix = Upper(field), prefix.upper()
+    return Q(GreaterThanOrEqual(expression, prefix)) & Q(LessThan(expression, prefix + '\U0010ffff'))
+
+
+def uses_index(connection):
+    return connection.vendor == 'sqlite'
+
+
+def index_students(students, using='default'):
+    """
+    Add or replace the search rows of ``students``
+    """
+    connection = connections[using]
+    if not uses_index(connection):
+        return
+    rows = [(student.pk, *(getattr(student, column) for column in COLUMNS)) for student in students]
+    with connection.cursor() as cursor:
+        cursor.executemany(DELETE, [row[:1] for row in rows])
+        cursor.executemany(INSERT, rows)
+
+
+def unindex_students(pks, using='default'):
+    connection = connections[using]
+    if not uses_index(connection):
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(DELETE, [(pk,) for pk in pks])
+
+
+def rebuild_index(using='default'):
+    """
+    Refill the search table from Student, returning the number of students indexed
+    """
+    connection = connections[using]
+    if not uses_index(connection):
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM "{TABLE}"')
+        cursor.execute(f'INSERT INTO "{TABLE}" (rowid, {", ".join(COLUMNS)}) '
+                       f'SELECT user_id, {", ".join(COLUMNS)} FROM "{Student._meta.db_table}"')
+        cursor.execute(f"INSERT INTO \"{TABLE}\" (\"{TABLE}\") VALUES ('optimize')")  # Merge into one b-tree
+        cursor.execute(f'SELECT COUNT(*) FROM "{Student._meta.db_table}"')
+        return cursor.fetchone()[0]
+
+
+def search_students(query, limit=20):
+    """
+    Students matching every word of ``query`` as a prefix, best match first
+    """
+    words = [word for word in (word.strip(SEPARATORS) for word in WORD.findall(query)) if word]
+    if not words:
+        return []
+    using = router.db_for_read(Student)
+    connection = connections[using]
+    students = Student.objects.using(using).select_related('user')
+    if not uses_index(connection):
+        for word in words:
+            students = students.filter(prefix_match('matric_number', word) | prefix_match('first_name', word)
+                                       | prefix_match('last_name', word) | Q(email__istartswith=word))
+        return list(students.order_by('matric_number')[:limit])
+
+    expression = ' '.join(f'"{word}"*' for word in words)  # Quoted, so words like AND or NEAR are not operators
+    with connection.cursor() as cursor:
+        cursor.execute(COUNT, [expression, settings.STUDENT_SEARCH_RANK_LIMIT + 1])
+        ranked_sql = RANKED_MATCH if cursor.fetchone()[0] <= settings.STUDENT_SEARCH_RANK_LIMIT else MATCH
+        cursor.execute(ranked_sql, [expression, limit])
+        ranked = [pk for pk, in cursor.fetchall()]
+    found = students.in_bulk(ranked)
+    return [found[pk] for pk in ranked if pk in found]
@@ -1,53 +1,228 @@
+from django.conf import settings
 from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+
 from .models import (
-    Student, Department, Faculty, Hostel, Bursary, StudentClearanceRequests, ClearanceDocument
+    Student, Department, Faculty, Hostel, Bursary, StudentClearanceRequests, ClearanceDocument,
+    ClearanceStatusSummary, ChunkedUpload, REQUIREMENT_MODELS, SEMESTER_CHOICES, SESSION_CHOICES
 )
+from .reviews import STATUS_TRANSITIONS
+
+
+class SparseFieldsetMixin:
+    """
+    Trims the serialized fields of a read to those named in a comma-separated ``?fields=`` query parameter
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None:
+            return  # Nested serializers are built without context and always render in full
+        if request.method not in SAFE_METHODS:
+            return  # Writes validate every field; dropping required ones would fail the insert instead
+        requested = request.query_params.get('fields')
+        if not requested:
+            return
+        allowed = {name.strip() for name in requested.split(',') if name.strip()}
+        for name in set(self.fields) - allowed:
+            self.fields.pop(name)
 
-class ClearanceDocumentSerializer(serializers.ModelSerializer):
+
+class ClearanceDocumentSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = ClearanceDocument
         fields = '__all__'  # Serialize all fields
 
 
-class DepartmentSerializer(serializers.ModelSerializer):
+# The fields each unit had as its own table, in the order ``'__all__'`` listed them
+NAMED_UNIT_FIELDS = ('id', 'semester', 'session', 'status', 'name', 'student', 'documents')
+
+
+class DepartmentSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Department
-        fields = '__all__'  # Serialize all fields
+        fields = NAMED_UNIT_FIELDS
 
 
-class FacultySerializer(serializers.ModelSerializer):
+class FacultySerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Faculty
-        fields = '__all__'  # Serialize all fields
+        fields = NAMED_UNIT_FIELDS
 
 
-class HostelSerializer(serializers.ModelSerializer):
+class HostelSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Hostel
-        fields = '__all__'  # Serialize all fields
+        fields = NAMED_UNIT_FIELDS
 
 
-class BursarySerializer(serializers.ModelSerializer):
+class BursarySerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Bursary
-        fields = '__all__'  # Serialize all fields
+        fields = ('id', 'semester', 'session', 'status', 'total_amount_paid', 'total_fees', 'outstanding_fees',
+                  'student', 'documents')
 
 
-class StudentSerializer(serializers.ModelSerializer):
+class StudentSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     user = serializers.CharField(source='user.username', read_only=True)  # Show username instead of user object
 
     class Meta:
         model = Student
-        fields = ('user', 'first_name', 'last_name', 'middle_name', 'matric_number', 'email')
+        fields = ('user', 'first_name', 'last_name', 'matric_number', 'email')
 
 
-class StudentClearanceRequestsSerializer(serializers.ModelSerializer):
+class StudentClearanceRequestsSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     student = StudentSerializer(read_only=True)  # Nested serializer for student details
-    faculty_clearance = FacultySerializer(read_only=True)  # Nested serializer for faculty clearance details
-    department_clearance = DepartmentSerializer(read_only=True)  # Nested serializer for department clearance details
-    hostel_clearance = HostelSerializer(read_only=True)  # Nested serializer for hostel clearance details
-    bursary_clearance = BursarySerializer(read_only=True)  # Nested serializer for bursary clearance details
+    faculty_clearance = FacultySerializer(source='faculty', read_only=True)  # Nested serializer for faculty clearance details
+    department_clearance = DepartmentSerializer(source='department', read_only=True)  # Nested serializer for department clearance details
+    hostel_clearance = HostelSerializer(source='hostel', read_only=True)  # Nested serializer for hostel clearance details
+    bursary_clearance = BursarySerializer(source='bursary', read_only=True)  # Nested serializer for bursary clearance details
 
     class Meta:
         model = StudentClearanceRequests
         fields = ('student', 'semester', 'session', 'faculty_clearance', 'department_clearance', 'hostel_clearance', 'bursary_clearance')
+
+
+class ClearanceStatusSummarySerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    class Meta:
+        model = ClearanceStatusSummary
+        fields = ('student', 'semester', 'session', 'department_status', 'faculty_status', 'hostel_status',
+                  'bursary_status', 'updated_at')
+
+
+class ChunkedUploadSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    class Meta:
+        model = ChunkedUpload
+        fields = ('id', 'filename', 'total_size', 'offset', 'clearance_type', 'document_type', 'description',
+                  'semester', 'session', 'status', 'sha256', 'document', 'created_at', 'updated_at')
+        read_only_fields = ('offset', 'status', 'sha256', 'document', 'created_at', 'updated_at')
+
+    def validate_total_size(self, value):
+        if not value:
+            raise serializers.ValidationError('File is empty.')  # Nothing would ever be written to finalize
+        if value > settings.CHUNKED_UPLOAD_MAX_FILE_SIZE:
+            raise serializers.ValidationError('File is larger than the allowed upload size.')
+        return value
+
+
+class StudentClearanceRequestsListSerializer(serializers.BaseSerializer):
+    """
+    Read-only list representation of StudentClearanceRequestsSerializer built straight from model attributes.
+    Expects requests from ``with_clearance_graph()`` with prefetch_unit_documents() applied, and honours
+    ``?fields=`` the same way.
+    """
+
+    @staticmethod
+    def _student(student):
+        return {
+            'user': student.user.username,
+            'first_name': student.first_name,
+            'last_name': student.last_name,
+            'matric_number': student.matric_number,
+            'email': student.email,
+        }
+
+    @staticmethod
+    def _requirement(requirement):
+        if requirement is None:
+            return None
+        data = {
+            'id': requirement.pk,
+            'semester': requirement.semester,
+            'session': requirement.session,
+            'status': requirement.status,
+        }
+        if isinstance(requirement, Bursary):
+            data['total_amount_paid'] = format(requirement.total_amount_paid, 'f')
+            data['total_fees'] = format(requirement.total_fees, 'f')
+            data['outstanding_fees'] = format(requirement.outstanding_fees, 'f')
+        else:
+            data['name'] = requirement.name
+        data['student'] = requirement.student_id
+        data['documents'] = [document.pk for document in requirement.documents.all()]  # Served from the prefetch
+        return data
+
+    def to_representation(self, instance):
+        data = {
+            'student': self._student(instance.student),
+            'semester': instance.semester,
+            'session': instance.session,
+            'faculty_clearance': self._requirement(instance.faculty),
+            'department_clearance': self._requirement(instance.department),
+            'hostel_clearance': self._requirement(instance.hostel),
+            'bursary_clearance': self._requirement(instance.bursary),
+        }
+        request = self.context.get('request')
+        requested = request.query_params.get('fields') if request is not None else None
+        if requested:
+            allowed = {name.strip() for name in requested.split(',') if name.strip()}
+            data = {name: value for name, value in data.items() if name in allowed}
+        return data
+
+
+class BulkReviewSerializer(serializers.BaseSerializer):
+    """
+    Validates a bulk review: either ``items``, a list of {"type", "id", "status"} objects, or a ``filter`` with
+    a requirement ``type`` and optional session, semester, status and name, applied with a top-level ``status``.
+    Checked by hand rather than with nested serializers, which are slow for thousands of items.
+    Produces {"items": [(type, id, status), ...]} or {"filter": {...}, "type": ..., "status": ...}.
+    """
+    filter_fields = {
+        'session': {value for value, _ in SESSION_CHOICES},
+        'semester': {value for value, _ in SEMESTER_CHOICES},
+        'status': set(STATUS_TRANSITIONS),
+    }
+
+    def to_internal_value(self, data):
+        if not isinstance(data, dict) or ('items' in data) == ('filter' in data):
+            raise serializers.ValidationError({'non_field_errors': ['Send either "items" or "filter".']})
+        if 'items' in data:
+            return {'items': self._items(data['items'])}
+        return self._filter(data['filter'], data.get('status'))
+
+    def _items(self, items):
+        if not isinstance(items, list) or not items:
+            raise serializers.ValidationError({'items': ['Expected a non-empty list.']})
+        if len(items) > settings.BULK_REVIEW_MAX_ITEMS:
+            raise serializers.ValidationError({'items': [f'At most {settings.BULK_REVIEW_MAX_ITEMS} items.']})
+        cleaned, errors = [], {}
+        for index, item in enumerate(items):
+            try:
+                unit, pk, status = item['type'], item['id'], item['status']
+            except (KeyError, TypeError):
+                errors[index] = 'Expected "type", "id" and "status".'
+                continue
+            if not isinstance(unit, str) or unit not in REQUIREMENT_MODELS:
+                errors[index] = f'Unknown type "{unit}".'
+            elif not isinstance(pk, int) or isinstance(pk, bool):
+                errors[index] = '"id" must be an integer.'
+            elif not isinstance(status, str) or status not in STATUS_TRANSITIONS:
+                errors[index] = f'Unknown status "{status}".'
+            else:
+                cleaned.append((unit, pk, status))
+        if errors:
+            raise serializers.ValidationError({'items': errors})
+        return cleaned
+
+    def _filter(self, expression, status):
+        # Membership tests on lists or dicts raise TypeError, so values are checked to be strings first
+        if not isinstance(expression, dict) or not isinstance(expression.get('type'), str) \
+                or expression['type'] not in REQUIREMENT_MODELS:
+            raise serializers.ValidationError({'filter': [f'"type" must be one of {", ".join(REQUIREMENT_MODELS)}.']})
+        if not isinstance(status, str) or status not in STATUS_TRANSITIONS:
+            raise serializers.ValidationError({'status': [f'Unknown status "{status}".']})
+        unit = expression['type']
+        allowed = dict(self.filter_fields)
+        if unit != 'bursary':
+            allowed['name'] = {value for value, _ in REQUIREMENT_MODELS[unit].NAME_CHOICES}
+        filters = {}
+        for field, value in expression.items():
+            if field == 'type':
+                continue
+            if field not in allowed:
+                raise serializers.ValidationError({'filter': [f'Cannot filter {unit} on "{field}".']})
+            if not isinstance(value, str) or value not in allowed[field]:
+                raise serializers.ValidationError({'filter': [f'Unknown {field} "{value}".']})
+            filters[field] = value
+        return {'filter': filters, 'type': unit, 'status': status}
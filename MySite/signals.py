@@ -0,0 +1,214 @@
+import re
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models import F
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .caching import bump_model_generation, bump_student_cache_version
+from .events import publish
+from .models import (
+    Student, Department, Faculty, Hostel, Bursary, StudentClearanceRequests, ClearanceStatusSummary,
+    ClearanceDocument, ContentBlob, ClearanceCounter, ClearanceUnit, REQUIREMENT_MODELS, COUNTER_FIELDS
+)
+from .notifications import queue_status_email
+from .search import index_students, unindex_students
+
+# Connection settings SQLITE_PRAGMAS may change; PRAGMA takes no parameters, so names and values are checked
+SQLITE_PRAGMA_NAMES = {
+    'auto_vacuum', 'busy_timeout', 'cache_size', 'cache_spill', 'foreign_keys', 'journal_mode',
+    'journal_size_limit', 'locking_mode', 'mmap_size', 'synchronous', 'temp_store', 'wal_autocheckpoint',
+}
+SQLITE_PRAGMA_VALUE = re.compile(r'-?\d+|[A-Za-z_]+')
+
+
+@receiver(connection_created)
+def configure_sqlite_connection(sender, connection, **kwargs):
+    """
+    Apply SQLITE_PRAGMAS to every new SQLite connection
+    """
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for pragma, value in settings.SQLITE_PRAGMAS.items():
+            if pragma not in SQLITE_PRAGMA_NAMES or not SQLITE_PRAGMA_VALUE.fullmatch(str(value)):
+                raise ImproperlyConfigured(f'Unsupported SQLITE_PRAGMAS entry {pragma!r}: {value!r}')
+            cursor.execute(f'PRAGMA {pragma} = {value}')
+
+
+@receiver(post_save, sender=Department)
+@receiver(post_save, sender=Faculty)
+@receiver(post_save, sender=Hostel)
+@receiver(post_save, sender=Bursary)
+def refresh_summaries_for_requirement(sender, instance, **kwargs):
+    """
+    Refresh the status summary of every clearance request linked to the saved requirement
+    """
+    unit = sender._meta.model_name
+    groups = StudentClearanceRequests.objects.filter(**{unit: instance}).values_list(
+        'student_id', 'semester', 'session',
+    ).distinct()
+    for student_id, semester, session in groups:
+        ClearanceStatusSummary.objects.refresh(student_id, semester, session)
+
+
+@receiver(post_save, sender=Department)
+@receiver(post_save, sender=Faculty)
+@receiver(post_save, sender=Hostel)
+@receiver(post_save, sender=Bursary)
+def notify_status_change(sender, instance, created, **kwargs):
+    """
+    Queue an email to the student when an officer changes a requirement's status
+    """
+    loaded_status = getattr(instance, '_loaded_status', instance.status)
+    if created or loaded_status == instance.status:
+        return
+    queue_status_email(instance)
+    instance._loaded_status = instance.status
+
+
+@receiver(pre_save, sender=Department)
+@receiver(pre_save, sender=Faculty)
+@receiver(pre_save, sender=Hostel)
+@receiver(pre_save, sender=Bursary)
+@receiver(pre_save, sender=ClearanceUnit)  # Saves through the base model count too
+def remember_counter_key(sender, instance, **kwargs):
+    """
+    Read the stored counter key of a requirement saved without having been loaded in full
+    """
+    if instance.pk is None or getattr(instance, '_loaded_counter_key', None) is not None:
+        return
+    instance._loaded_counter_key = ClearanceUnit.objects.filter(pk=instance.pk).values_list(*COUNTER_FIELDS).first()
+
+
+@receiver(post_save, sender=Department)
+@receiver(post_save, sender=Faculty)
+@receiver(post_save, sender=Hostel)
+@receiver(post_save, sender=Bursary)
+@receiver(post_save, sender=ClearanceUnit)
+def count_requirement(sender, instance, created, **kwargs):
+    """
+    Move the requirement to its new analytics counter when it is created or its name, term or status changes
+    """
+    key = instance.counter_key()
+    previous = None if created else getattr(instance, '_loaded_counter_key', None)
+    if previous != key:
+        ClearanceCounter.objects.adjust({key: 1} if previous is None else {previous: -1, key: 1})
+    instance._loaded_counter_key = key
+
+
+@receiver(post_delete, sender=Department)
+@receiver(post_delete, sender=Faculty)
+@receiver(post_delete, sender=Hostel)
+@receiver(post_delete, sender=Bursary)
+@receiver(post_delete, sender=ClearanceUnit)  # Sent by the cascade when a student is deleted
+def uncount_requirement(sender, instance, **kwargs):
+    ClearanceCounter.objects.adjust({getattr(instance, '_loaded_counter_key', None) or instance.counter_key(): -1})
+
+
+@receiver(post_save, sender=StudentClearanceRequests)
+@receiver(post_delete, sender=StudentClearanceRequests)
+def refresh_summary_for_request(sender, instance, **kwargs):
+    """
+    Refresh the status summary of the saved or deleted clearance request
+    """
+    ClearanceStatusSummary.objects.refresh(instance.student_id, instance.semester, instance.session)
+
+
+@receiver(post_save, sender=ClearanceDocument)
+def count_blob_reference(sender, instance, created, **kwargs):
+    """
+    Count a new document against the content blob its file points at
+    """
+    if not created or not instance.file:
+        return
+    name, storage = instance.file.name, instance.file.storage
+    blob, _ = ContentBlob.objects.get_or_create(
+        name=name, defaults={'size': storage.size(name) if storage.exists(name) else 0},
+    )
+    ContentBlob.objects.filter(pk=blob.pk).update(references=F('references') + 1)
+
+
+@receiver(post_delete, sender=ClearanceDocument)
+def release_blob_reference(sender, instance, **kwargs):
+    """
+    Drop a deleted document's reference. The file stays until gc_clearance_documents removes blobs left at zero:
+    a concurrent upload of the same content may already be pointing at it without having committed.
+    """
+    if instance.file.name:
+        ContentBlob.objects.filter(name=instance.file.name, references__gt=0).update(
+            references=F('references') - 1,
+        )
+
+
+@receiver(post_save, sender=Student)
+def index_student(sender, instance, using, **kwargs):
+    """
+    Keep the student's search row in step with it, in the same transaction
+    """
+    index_students([instance], using=using)
+
+
+@receiver(post_delete, sender=Student)
+def unindex_student(sender, instance, using, **kwargs):
+    unindex_students([instance.pk], using=using)
+
+
+@receiver(post_save, sender=Student)
+@receiver(post_save, sender=Department)
+@receiver(post_save, sender=Faculty)
+@receiver(post_save, sender=Hostel)
+@receiver(post_save, sender=Bursary)
+@receiver(post_save, sender=StudentClearanceRequests)
+@receiver(post_delete, sender=StudentClearanceRequests)
+def invalidate_student_pages(sender, instance, **kwargs):
+    """
+    Bump the student's page cache version once the change, and the summary refresh with it, is committed,
+    then wake the student's open status streams
+    """
+    student_id = instance.pk if sender is Student else instance.student_id
+
+    def invalidate():
+        bump_student_cache_version(student_id)
+        publish(student_id)  # After the bump, so streams see the new version
+
+    transaction.on_commit(invalidate)
+
+
+@receiver(post_save, sender=Department)
+@receiver(post_save, sender=Faculty)
+@receiver(post_save, sender=Hostel)
+@receiver(post_save, sender=Bursary)
+@receiver(post_save, sender=ClearanceDocument)
+@receiver(post_delete, sender=Department)
+@receiver(post_delete, sender=Faculty)
+@receiver(post_delete, sender=Hostel)
+@receiver(post_delete, sender=Bursary)
+@receiver(post_delete, sender=ClearanceDocument)
+@receiver(post_delete, sender=ClearanceUnit)
+def invalidate_api_responses(sender, instance, **kwargs):
+    """
+    Move the model's cached API responses to a new generation after commit; units deleted through the base
+    model, as a student's are when it is deleted, bump their proxy
+    """
+    model = REQUIREMENT_MODELS[instance.unit_type] if sender is ClearanceUnit else sender
+    transaction.on_commit(lambda: bump_model_generation(model))
+
+
+@receiver(m2m_changed, sender=ClearanceUnit.documents.through)
+def invalidate_api_responses_for_documents(sender, instance, action, reverse, **kwargs):
+    """
+    Unit responses list their document ids, so adding or removing documents bumps the unit's proxy, or every
+    proxy when the change is made from the document's side
+    """
+    if action.startswith('post_'):
+        proxies = list(REQUIREMENT_MODELS.values()) if reverse else [REQUIREMENT_MODELS[instance.unit_type]]
+
+        def invalidate():
+            for proxy in proxies:
+                bump_model_generation(proxy)
+
+        transaction.on_commit(invalidate)
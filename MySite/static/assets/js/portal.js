@@ -0,0 +1,67 @@
+/*=== Portal behaviour, the parts of main.js the portal templates use ===========
+
+01.stickyHeader();
+02.backToTopInit();
+
+====================================================*/
+
+(function ($) {
+    'use strict';
+
+    var portalJs = {
+        m: function () {
+            portalJs.stickyHeader();
+            portalJs.backToTopInit();
+        },
+
+        // sticky header activation
+        stickyHeader: function () {
+          $(window).scroll(function () {
+            if ($(this).scrollTop() > 150) {
+                $('.header--sticky').addClass('sticky')
+            } else {
+                $('.header--sticky').removeClass('sticky')
+            }
+          })
+        },
+
+        backToTopInit: function () {
+          $(document).ready(function () {
+            var progressPath = document.querySelector('.progress-wrap path');
+            if (!progressPath) {
+              return;
+            }
+            var pathLength = progressPath.getTotalLength();
+            progressPath.style.transition = progressPath.style.WebkitTransition = 'none';
+            progressPath.style.strokeDasharray = pathLength + ' ' + pathLength;
+            progressPath.style.strokeDashoffset = pathLength;
+            progressPath.getBoundingClientRect();
+            progressPath.style.transition = progressPath.style.WebkitTransition = 'stroke-dashoffset 10ms linear';
+            var updateProgress = function () {
+              var scroll = $(window).scrollTop();
+              var height = $(document).height() - $(window).height();
+              progressPath.style.strokeDashoffset = pathLength - (scroll * pathLength / height);
+            }
+            updateProgress();
+            $(window).scroll(updateProgress);
+            var offset = 50;
+            var duration = 550;
+            $(window).on('scroll', function () {
+              if ($(this).scrollTop() > offset) {
+                $('.progress-wrap').addClass('active-progress');
+              } else {
+                $('.progress-wrap').removeClass('active-progress');
+              }
+            });
+            $('.progress-wrap').on('click', function (event) {
+              event.preventDefault();
+              $('html, body').animate({scrollTop: 0}, duration);
+              return false;
+            })
+          });
+        },
+    }
+
+    portalJs.m();
+
+})(jQuery)
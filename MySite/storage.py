@@ -0,0 +1,88 @@
+import hashlib
+import os
+import tempfile
+
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+from whitenoise.storage import CompressedManifestStaticFilesStorage as WhiteNoiseStorage
+
+
+def content_name(prefix, digest, extension):
+    """
+    Sharded blob path, e.g. clearance_documents/ab/cd/abcd...ef.pdf
+    """
+    return os.path.join(prefix, digest[:2], digest[2:4], digest + extension.lower())
+
+
+def is_content_name(name):
+    stem = os.path.splitext(os.path.basename(name))[0]
+    parts = name.replace('\\', '/').split('/')
+    return (len(stem) == 64 and len(parts) >= 3 and parts[-3] == stem[:2] and parts[-2] == stem[2:4])
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Stores each unique file once under the sha256 of its bytes, hashed while it streams to disk.
+    Saving identical content again returns the existing name instead of writing a copy.
+    Files are never deleted here or on document delete; gc_clearance_documents removes unreferenced ones.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        return name  # The final name is chosen from the content in _save
+
+    def _save(self, name, content):
+        prefix = os.path.dirname(name)
+        extension = os.path.splitext(name)[1]
+        directory = self.path(prefix)
+        os.makedirs(directory, exist_ok=True)
+
+        hasher = hashlib.sha256()
+        handle, temporary_path = tempfile.mkstemp(dir=directory, suffix='.upload')
+        try:
+            with os.fdopen(handle, 'wb') as temporary:
+                if hasattr(content, 'seek'):
+                    content.seek(0)
+                for chunk in content.chunks():
+                    hasher.update(chunk)
+                    temporary.write(chunk)
+
+            blob_name = content_name(prefix, hasher.hexdigest(), extension)
+            blob_path = self.path(blob_name)
+            try:
+                # Already stored once; the fresh mtime keeps gc_clearance_documents away while this upload commits
+                os.utime(blob_path)
+                os.remove(temporary_path)
+            except FileNotFoundError:
+                os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+                os.replace(temporary_path, blob_path)
+                if self.file_permissions_mode is not None:
+                    os.chmod(blob_path, self.file_permissions_mode)
+        except BaseException:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+            raise
+        return blob_name.replace('\\', '/')
+
+
+def clearance_document_storage():
+    return ContentAddressedStorage()
+
+
+class CompressedManifestStaticFilesStorage(WhiteNoiseStorage):
+    """
+    WhiteNoise's hashed, gzip and brotli compressed storage, leaving url() references to files the theme never
+    shipped (jquery-ui icons, saved Google Fonts imports) as they are instead of failing collectstatic
+    """
+
+    def url_converter(self, name, hashed_files, template=None):
+        converter = super().url_converter(name, hashed_files, template)
+
+        def convert(matchobj):
+            try:
+                return converter(matchobj)
+            except (ValueError, SuspiciousFileOperation):  # Missing, or pointing outside STATIC_ROOT
+                return matchobj.group(0)
+
+        return convert
@@ -0,0 +1,17 @@
+from django import template
+from django.conf import settings
+from django.templatetags.static import static
+from django.utils.html import format_html_join
+
+register = template.Library()
+
+
+@register.simple_tag
+def static_bundle(name):
+    """
+    Include a STATIC_BUNDLES entry: the built bundle when STATIC_BUNDLES_ENABLED, otherwise each source file
+    """
+    paths = [name] if settings.STATIC_BUNDLES_ENABLED else settings.STATIC_BUNDLES[name]
+    if name.endswith('.css'):
+        return format_html_join('\n', '<link rel="stylesheet" href="{}">', ((static(path),) for path in paths))
+    return format_html_join('\n', '<script src="{}"></script>', ((static(path),) for path in paths))
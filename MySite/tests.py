@@ -1,3 +1,1264 @@
-from django.test import TestCase
+import csv
+import hashlib
+import io
+import json
+import logging
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.mail.backends import locmem
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.conf import settings
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import path, resolve, reverse
+from django.utils import timezone
+
+from .async_views import clearance_status_events
+from . import async_views, metrics, urls
+from .models import (
+    Student, Department, Faculty, Hostel, Bursary, StudentClearanceRequests, ClearanceDocument, OutboxEmail,
+    ClearanceStatusSummary, ChunkedUpload, ClearanceCounter, ClearanceUnit, ContentBlob, prefetch_unit_documents
+)
+from .caching import cache_stats, model_generation
+from .pagination import ClearanceCursorPagination, UnitCountPaginator
+from .reconciliation import BursaryReconciler, parse_amount
+from .search import search_students
+from .uploads import append_chunk, finalize_upload, part_path
+from .management.commands.build_static_assets import rebase_css
+from .notifications import send_due_emails
+from .onboarding import StudentImporter
+from .routers import ReplicaRouter, read_from_replica
+from .serializers import StudentClearanceRequestsSerializer, StudentClearanceRequestsListSerializer
+from .signals import configure_sqlite_connection
+
+
+def create_student(number):
+    user = User.objects.create_user(username=f'DU{number:04d}')
+    return Student.objects.create(user=user, first_name='Ada', last_name=f'Student{number}',
+                                  matric_number=f'DU{number:04d}', email=f'student{number}@example.com')
+
+
+def create_clearance_request(student, semester='alpha', session='2023/2024'):
+    term = {'student': student, 'semester': semester, 'session': session}
+    department = Department.objects.create(name='computer_science', **term)
+    faculty = Faculty.objects.create(name='computing_and_applied_sciences', **term)
+    hostel = Hostel.objects.create(name='victory_hall', **term)
+    bursary = Bursary.objects.create(total_fees='1500.00', total_amount_paid='1000.00', outstanding_fees='500.00',
+                                     **term)
+    for requirement in (department, faculty, hostel, bursary):
+        document = ClearanceDocument.objects.create(file='clearance_documents/form.pdf', description='Form',
+                                                    document_type='bio_data')
+        requirement.documents.add(document)
+    return StudentClearanceRequests.objects.create(department=department, faculty=faculty, hostel=hostel,
+                                                   bursary=bursary, **term)
+
+
+class StudentClearanceRequestsApiTests(TestCase):
+    def setUp(self):
+        self.students = [create_student(number) for number in range(12)]
+        for student in self.students:
+            create_clearance_request(student)
+        self.client.force_login(self.students[0].user)
+
+    def list_query_count(self, page_size):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/student_clearance_requests/', {'page_size': page_size})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), page_size)
+        return len(queries)
+
+    def test_list_query_count_is_constant_across_page_sizes(self):
+        self.assertEqual(self.list_query_count(1), self.list_query_count(10))
+
+    def test_list_uses_fixed_query_budget(self):
+        # Session, user, the joined page, then one documents prefetch for every unit
+        with self.assertNumQueries(4):
+            self.client.get('/api/student_clearance_requests/', {'page_size': 10})
+
+    def test_list_serializer_matches_model_serializer(self):
+        clearance_requests = list(StudentClearanceRequests.objects.with_clearance_graph().order_by('pk').iterator())
+        with self.assertNumQueries(1):  # Every unit's documents at once
+            prefetch_unit_documents(clearance_requests)
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                StudentClearanceRequestsListSerializer(clearance_requests, many=True).data,
+                StudentClearanceRequestsSerializer(clearance_requests, many=True).data,
+            )
+
+    def test_list_honours_sparse_fieldsets(self):
+        response = self.client.get('/api/student_clearance_requests/', {'fields': 'semester,session'})
+        self.assertEqual(set(response.json()['results'][0]), {'semester', 'session'})
+
+
+class ApiCursorPaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.students = [create_student(number) for number in range(12)]
+        self.requests = [create_clearance_request(student) for student in self.students]
+        departments = [clearance_request.department_id for clearance_request in self.requests]
+        Department.objects.filter(pk__in=departments[:3]).update(status='completed')
+        Department.objects.filter(pk__in=departments[3:5]).update(status='incomplete')
+        self.client.force_login(self.students[0].user)
+
+    def get(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_next_and_previous_cursors_walk_the_pages_newest_first(self):
+        first = self.get('/api/departments/', page_size=5)
+        self.assertIsNone(first['previous'])
+        second = self.get(first['next'])
+        last = self.get(second['next'])
+        self.assertIsNone(last['next'])
+        pages = [[row['id'] for row in page['results']] for page in (first, second, last)]
+        self.assertEqual(sum(pages, []), sorted(Department.objects.values_list('pk', flat=True), reverse=True))
+        self.assertEqual([len(page) for page in pages], [5, 5, 2])
+        self.assertEqual([row['id'] for row in self.get(last['previous'])['results']], pages[1])
+
+    def test_page_size_is_capped(self):
+        with mock.patch.object(ClearanceCursorPagination, 'max_page_size', 3):
+            self.assertEqual(len(self.get('/api/departments/', page_size=10)['results']), 3)
+        self.assertEqual(len(self.get('/api/departments/')['results']), 12)  # Default PAGE_SIZE is 50
+
+    def test_comma_separated_filter_values_select_any_of_them(self):
+        self.assertEqual(len(self.get('/api/departments/', status='completed')['results']), 3)
+        both = self.get('/api/departments/', status='completed, incomplete')['results']
+        self.assertEqual(sorted(row['status'] for row in both), ['completed'] * 3 + ['incomplete'] * 2)
+        self.assertEqual(self.get('/api/departments/', status='completed,', name='cyber_security')['results'], [])
+
+
+class ClearanceExportTests(TestCase):
+    def setUp(self):
+        self.students = [create_student(number) for number in range(3)]
+        first = create_clearance_request(self.students[0])
+        create_clearance_request(self.students[1], semester='omega')
+        create_clearance_request(self.students[2], session='2024/2025')
+        Department.objects.filter(pk=first.department_id).update(status='completed')
+        self.client.force_login(User.objects.create_user(username='officer', is_staff=True))
+
+    def export(self, **params):
+        response = self.client.get('/export-clearance/', params)
+        self.assertEqual(response.status_code, 200)
+        return response, b''.join(response.streaming_content).decode()
+
+    def exported_matric_numbers(self, **params):
+        _, body = self.export(**params)
+        return [row['matric_number'] for row in csv.DictReader(io.StringIO(body))]
+
+    def test_csv_streams_a_header_and_a_row_per_request(self):
+        response, body = self.export()
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertIn('clearance_export.csv', response['Content-Disposition'])
+        rows = list(csv.reader(io.StringIO(body)))
+        self.assertEqual(rows[0][:3], ['request_id', 'matric_number', 'first_name'])
+        self.assertEqual([row[1] for row in rows[1:]], ['DU0000', 'DU0001', 'DU0002'])
+
+    def test_session_semester_and_status_filters(self):
+        self.assertEqual(self.exported_matric_numbers(session='2023/2024'), ['DU0000', 'DU0001'])
+        self.assertEqual(self.exported_matric_numbers(semester='omega'), ['DU0001'])
+        self.assertEqual(self.exported_matric_numbers(status='completed'), ['DU0000'])
+        self.assertEqual(self.exported_matric_numbers(session='2024/2025', status='completed'), [])
+
+    def test_ndjson_has_an_object_per_line(self):
+        response, body = self.export(format='ndjson', semester='omega')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        [row] = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual((row['matric_number'], row['department'], row['outstanding_fees']),
+                         ('DU0001', 'computer_science', '500.00'))
+
+    def test_unsupported_format_and_students_are_refused(self):
+        self.assertEqual(self.client.get('/export-clearance/', {'format': 'xlsx'}).status_code, 400)
+        self.client.force_login(self.students[0].user)
+        response = self.client.get('/export-clearance/')
+        self.assertEqual(response.status_code, 302)
+        self.assertIn('/admin/login/', response['Location'])
+
+    def test_command_writes_the_filtered_export_to_a_file(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = Path(directory, 'export.csv')
+        stderr = io.StringIO()
+        call_command('export_clearance', '--output', str(path), '--status', 'completed', stderr=stderr)
+        self.assertIn('Exported 1 clearance requests', stderr.getvalue())
+        with path.open(newline='') as exported:
+            self.assertEqual([row['matric_number'] for row in csv.DictReader(exported)], ['DU0000'])
+
+    def test_command_writes_to_its_stdout(self):
+        stdout = io.StringIO()
+        call_command('export_clearance', '--format', 'ndjson', '--semester', 'omega', stdout=stdout)
+        rows = [json.loads(line) for line in stdout.getvalue().splitlines()]
+        self.assertEqual([row['matric_number'] for row in rows], ['DU0001'])
+
+
+class StudentImporterTests(TestCase):
+    def setUp(self):
+        self.registered = create_student(1)
+        self.registered.email = 'Ada.Student@Example.com'  # Registration keeps the email as typed
+        self.registered.save()
+
+    def test_rows_are_counted_as_inserted_skipped_conflicting_or_invalid(self):
+        def hash_while_a_student_registers(password):
+            if not Student.objects.filter(matric_number='DU0010').exists():
+                create_student(10)  # Commits after the importer looked for existing students
+            return '!'
+
+        roster = [
+            {'matric_number': 'DU0001', 'first_name': 'Ada', 'last_name': 'Student',
+             'email': 'ada.student@example.com'},
+            {'matric_number': 'DU0100', 'first_name': 'Bola', 'last_name': 'Adams', 'email': 'bola@example.com'},
+            {'matric_number': 'DU0200', 'first_name': 'Ada', 'last_name': 'Other', 'email': 'ADA.STUDENT@example.com'},
+            {'matric_number': 'DU0300', 'first_name': 'Chidi', 'last_name': '', 'email': 'chidi@example.com'},
+            {'matric_number': 'DU0010', 'first_name': 'Ada', 'last_name': 'Late', 'email': 'late@example.com'},
+            {'matric_number': 'DU0101', 'first_name': 'Emeka', 'last_name': 'Obi', 'email': 'Emeka@Example.com'},
+        ]
+        importer = StudentImporter(workers=1)
+        with mock.patch('MySite.onboarding._hash_password', hash_while_a_student_registers):
+            summary = importer.run(roster)
+
+        self.assertEqual(summary, {'inserted': 2, 'skipped': 1, 'conflicting': 2, 'invalid': 1})
+        self.assertEqual(importer.conflicts, [('DU0200', 'email registered to another student'),
+                                              ('DU0010', 'registered while the import ran')])
+        self.assertEqual(Student.objects.get(matric_number='DU0101').email, 'emeka@example.com')
+        self.assertEqual(Student.objects.get(matric_number='DU0010').email, 'student10@example.com')
+        self.assertEqual(Student.objects.count(), 4)
+
+    def test_json_values_that_are_not_strings_do_not_abort_the_import(self):
+        roster = [
+            {'matric_number': 12345, 'first_name': 'Bola', 'last_name': 'Adams', 'email': 'bola@example.com',
+             'password': 2024},
+            {'matric_number': 'DU0400', 'first_name': ['Chidi'], 'last_name': 'Okafor', 'email': 'chidi@example.com'},
+            {'matric_number': 'DU0500', 'first_name': 'Dayo', 'last_name': True, 'email': 'dayo@example.com'},
+            ['DU0600', 'Emeka', 'Obi', 'emeka@example.com'],
+        ]
+        with mock.patch('MySite.onboarding._hash_password', lambda password: '!'):
+            summary = StudentImporter(workers=1).run(roster)
+        self.assertEqual(summary, {'inserted': 1, 'skipped': 0, 'conflicting': 0, 'invalid': 3})
+        self.assertEqual(Student.objects.get(email='bola@example.com').matric_number, '12345')
+
+
+class ChunkedUploadTests(TestCase):
+    content = b'%PDF-1.4 clearance form' * 100
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        overrides = override_settings(MEDIA_ROOT=media_root, CHUNKED_UPLOAD_DIR=Path(media_root, 'chunked_uploads'))
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        middleware_logger = logging.getLogger('MySite.middleware')
+        self.addCleanup(middleware_logger.setLevel, middleware_logger.level)
+        middleware_logger.setLevel(logging.ERROR)  # Finalize runs past the slow-request query threshold
+        self.student = create_student(1)
+        self.client.force_login(self.student.user)
+
+    def start(self, total_size, url='/api/uploads/'):
+        return self.client.post(url, {
+            'filename': 'form.pdf', 'total_size': total_size, 'clearance_type': 'department',
+            'document_type': 'bio_data', 'description': 'Form', 'semester': 'alpha', 'session': '2023/2024',
+        })
+
+    def put_chunk(self, upload_id, offset, data):
+        return self.client.put(f'/api/uploads/{upload_id}/chunk/', data, content_type='application/octet-stream',
+                               headers={'Upload-Offset': str(offset)})
+
+    def finalize(self, upload_id, sha256):
+        return self.client.post(f'/api/uploads/{upload_id}/finalize/', {'sha256': sha256})
+
+    def test_chunks_resume_from_the_received_offset_and_finalize_once(self):
+        upload_id = self.start(len(self.content)).json()['id']
+        self.assertEqual(self.put_chunk(upload_id, 0, self.content[:1000]).json()['offset'], 1000)
+        resent = self.put_chunk(upload_id, 0, self.content[:1000])  # Client lost the reply and sends it again
+        self.assertEqual((resent.status_code, resent.json()['offset']), (409, 1000))
+        self.assertEqual(self.put_chunk(upload_id, 1000, self.content[1000:]).json()['offset'], len(self.content))
+
+        sha256 = hashlib.sha256(self.content).hexdigest()
+        self.assertEqual(self.finalize(upload_id, '0' * 64).status_code, 409)
+        finalized = self.finalize(upload_id, sha256).json()
+        self.assertEqual((finalized['status'], finalized['sha256']), ('complete', sha256))
+        self.assertEqual(self.finalize(upload_id, sha256).status_code, 409)
+        document = Department.objects.get(student=self.student).documents.get()
+        self.assertEqual(document.pk, finalized['document'])
+        with document.file.open('rb') as stored:
+            self.assertEqual(stored.read(), self.content)
+
+    def test_a_chunk_that_fails_partway_leaves_the_checksum_intact(self):
+        upload_id = self.start(len(self.content)).json()['id']
+        self.put_chunk(upload_id, 0, self.content[:1000])
+
+        class DroppedConnection(io.BytesIO):
+            def read(self, size=-1):
+                if self.tell():
+                    raise OSError('connection reset')
+                return super().read(10)
+
+        upload = ChunkedUpload.objects.get(pk=upload_id)
+        with self.assertRaises(OSError):
+            append_chunk(upload, 1000, DroppedConnection(self.content[1000:]), len(self.content) - 1000)
+        self.assertEqual(ChunkedUpload.objects.get(pk=upload_id).offset, 1000)
+
+        self.put_chunk(upload_id, 1000, self.content[1000:])
+        self.assertEqual(self.finalize(upload_id, hashlib.sha256(self.content).hexdigest()).status_code, 200)
+
+    def test_part_file_is_kept_until_the_finalize_commits(self):
+        upload_id = self.start(len(self.content)).json()['id']
+        self.put_chunk(upload_id, 0, self.content)
+        upload = ChunkedUpload.objects.get(pk=upload_id)
+
+        class RolledBack(Exception):
+            pass
+
+        with self.assertRaises(RolledBack), transaction.atomic():
+            finalize_upload(upload)
+            raise RolledBack
+        self.assertEqual(ChunkedUpload.objects.get(pk=upload_id).status, 'uploading')
+        self.assertTrue(part_path(upload).exists())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.finalize(upload_id, hashlib.sha256(self.content).hexdigest()).status_code, 200)
+        self.assertFalse(part_path(upload).exists())
+
+    def test_fields_parameter_trims_reads_but_not_writes(self):
+        started = self.start(len(self.content), url='/api/uploads/?fields=id')
+        self.assertEqual(started.status_code, 201)
+        self.assertEqual(started.json()['total_size'], len(self.content))  # Validated and rendered in full
+        upload = self.client.get(f"/api/uploads/{started.json()['id']}/", {'fields': 'id,offset'})
+        self.assertEqual(upload.json(), {'id': started.json()['id'], 'offset': 0})
+
+    def test_empty_and_oversized_files_are_rejected(self):
+        self.assertEqual(self.start(0).status_code, 400)
+        with override_settings(CHUNKED_UPLOAD_MAX_FILE_SIZE=10):
+            self.assertEqual(self.start(11).status_code, 400)
+
+
+class ContentAddressedStorageTests(TestCase):
+    content = b'%PDF-1.4 admission letter'
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        overrides = override_settings(MEDIA_ROOT=self.media_root)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def upload(self, content, filename='letter.pdf'):
+        return ClearanceDocument.objects.create(file=ContentFile(content, name=filename), description='Letter',
+                                                document_type='jamb_admission_letter')
+
+    def gc(self, *args):
+        output = io.StringIO()
+        call_command('gc_clearance_documents', *args, stdout=output)
+        return output.getvalue()
+
+    def test_identical_uploads_share_one_counted_blob(self):
+        first, second = self.upload(self.content), self.upload(self.content, 'LETTER.PDF')
+        other = self.upload(b'%PDF-1.4 bio data')
+        self.assertEqual(first.file.name, second.file.name)
+        self.assertNotEqual(first.file.name, other.file.name)
+        self.assertEqual(ContentBlob.objects.get(name=first.file.name).references, 2)
+        self.assertEqual(len([path for path in Path(self.media_root).rglob('*') if path.is_file()]), 2)
+
+    def test_files_are_deleted_by_gc_once_nothing_references_them(self):
+        first, second = self.upload(self.content), self.upload(self.content)
+        name, path = first.file.name, Path(first.file.path)
+        first.delete()
+        self.assertEqual(ContentBlob.objects.get(name=name).references, 1)
+        second.delete()
+        self.assertEqual(ContentBlob.objects.get(name=name).references, 0)
+        self.assertTrue(path.exists())  # Left for gc, in case an uncommitted upload already reuses it
+
+        self.assertIn('Deleted 0 unreferenced files', self.gc())  # Still within the grace period
+        dry_run = self.gc('--dry-run', '--grace', '0')
+        self.assertIn(f'Would delete 1 unreferenced files ({len(self.content)} bytes)', dry_run)
+        self.assertTrue(path.exists())
+        self.gc('--grace', '0')
+        self.assertFalse(path.exists())
+        self.assertFalse(ContentBlob.objects.filter(name=name).exists())
+
+    def test_gc_keeps_files_a_document_still_points_at(self):
+        document = self.upload(self.content)
+        ContentBlob.objects.update(references=0)  # Drifted count
+        self.assertIn('Deleted 0 unreferenced files', self.gc('--grace', '0'))
+        self.assertTrue(Path(document.file.path).exists())
+
+    def test_reusing_a_stored_file_refreshes_it_for_gc(self):
+        path = Path(self.upload(self.content).file.path)
+        os.utime(path, (0, 0))
+        self.upload(self.content)
+        self.assertGreater(path.stat().st_mtime, 0)
+
+    def test_dedupe_command_moves_legacy_files_and_reports_bytes_saved(self):
+        legacy = Path(self.media_root, 'clearance_documents')
+        legacy.mkdir()
+        for filename in ('a.pdf', 'b.pdf'):
+            (legacy / filename).write_bytes(self.content)
+        for filename in ('a.pdf', 'b.pdf'):
+            ClearanceDocument.objects.create(file=f'clearance_documents/{filename}', description='Letter',
+                                             document_type='jamb_admission_letter')
+
+        output = io.StringIO()
+        call_command('dedupe_clearance_documents', '--dry-run', stdout=output)
+        self.assertIn(f'Would reclaim {len(self.content)} bytes across 2 documents (2 legacy files, 0 missing)',
+                      output.getvalue())
+        self.assertEqual(sorted(path.name for path in legacy.iterdir()), ['a.pdf', 'b.pdf'])
+
+        output = io.StringIO()
+        call_command('dedupe_clearance_documents', stdout=output)
+        self.assertIn(f'Reclaimed {len(self.content)} bytes across 2 documents', output.getvalue())
+        names = set(ClearanceDocument.objects.values_list('file', flat=True))
+        self.assertEqual(len(names), 1)
+        self.assertFalse((legacy / 'a.pdf').exists() or (legacy / 'b.pdf').exists())
+        self.assertEqual(ContentBlob.objects.get(name=names.pop()).references, 2)
+
+
+class ClearanceSubmissionTests(TestCase):
+    form = {'faculty': 'computing_and_applied_sciences', 'department': 'computer_science', 'hostel': 'victory_hall',
+            'session': '2023/2024', 'semester': 'alpha'}
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        overrides = override_settings(MEDIA_ROOT=media_root)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.student = create_student(1)
+        create_clearance_request(self.student)
+        self.client.force_login(self.student.user)
+
+    def test_resubmitting_corrects_names_of_requirements_not_yet_completed(self):
+        Hostel.objects.filter(student=self.student).update(status='completed')
+        response = self.client.post('/student-clearance-request/', {
+            **self.form, 'department': 'microbiology', 'hostel': 'faith_hall'}, follow=True)
+        self.assertEqual(Department.objects.get(student=self.student).name, 'microbiology')
+        self.assertEqual(Hostel.objects.get(student=self.student).name, 'victory_hall')
+        self.assertContains(response, 'your hostel clearance is already completed and was not changed')
+        self.assertEqual(Department.objects.filter(student=self.student).count(), 1)
+
+    def test_completed_requirements_take_no_more_documents(self):
+        Department.objects.filter(student=self.student).update(status='completed')
+        upload = {'description': 'Form', 'document_type': 'bio_data', 'session': '2023/2024', 'semester': 'alpha'}
+        response = self.client.post('/student-upload-clearance/', {
+            **upload, 'clearance_type': 'department', 'file': SimpleUploadedFile('form.pdf', b'%PDF-1.4')})
+        self.assertContains(response, 'This clearance is already completed')
+        self.assertEqual(Department.objects.get(student=self.student).documents.count(), 1)
+
+        self.client.post('/student-upload-clearance/', {
+            **upload, 'clearance_type': 'faculty', 'file': SimpleUploadedFile('form.pdf', b'%PDF-1.4')})
+        self.assertEqual(Faculty.objects.get(student=self.student).documents.count(), 2)
+
+
+class OutboxTests(TestCase):
+    def setUp(self):
+        self.student = create_student(1)
+        self.clearance_request = create_clearance_request(self.student)
+
+    def test_status_change_is_queued_once_and_sent_in_a_batch(self):
+        department = Department.objects.get(student=self.student)
+        department.status = 'completed'
+        department.save()
+        department.save()  # No change, no second email
+        self.assertEqual(OutboxEmail.objects.filter(status='pending').count(), 1)
+
+        self.assertEqual(send_due_emails(), (1, 0))
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, [self.student.email])
+        self.assertIn('completed', mail.outbox[0].subject)
+
+    def test_overlapping_workers_do_not_send_a_batch_twice(self):
+        OutboxEmail.objects.create(to='student1@example.com', subject='Status', body='Updated')
+        overlapping = []
+
+        class OverlappingWorker(locmem.EmailBackend):
+            def send_messages(self, messages):
+                overlapping.append(send_due_emails())  # A second worker polls while this batch is being sent
+                return super().send_messages(messages)
+
+        self.assertEqual(send_due_emails(connection=OverlappingWorker()), (1, 0))
+        self.assertEqual(overlapping, [(0, 0)])
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_claimed_batch_of_a_dead_worker_is_sent_after_the_claim_runs_out(self):
+        email = OutboxEmail.objects.create(to='student1@example.com', subject='Status', body='Updated')
+        OutboxEmail.objects.filter(pk=email.pk).update(
+            next_attempt_at=timezone.now() + timedelta(seconds=settings.OUTBOX_CLAIM_SECONDS))
+        self.assertEqual(send_due_emails(), (0, 0))
+        OutboxEmail.objects.filter(pk=email.pk).update(next_attempt_at=timezone.now())
+        self.assertEqual(send_due_emails(), (1, 0))
+
+    def test_submission_email_is_deduplicated_while_pending(self):
+        self.client.force_login(self.student.user)
+        form = {'faculty': 'computing_and_applied_sciences', 'department': 'computer_science',
+                'hostel': 'victory_hall', 'session': '2023/2024', 'semester': 'alpha'}
+        self.client.post('/student-clearance-request/', form)
+        self.client.post('/student-clearance-request/', form)
+        self.assertEqual(OutboxEmail.objects.filter(dedupe_key=f'submission:{self.clearance_request.pk}').count(), 1)
+
+
+class ClearanceStatusSummaryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.student = create_student(1)
+        create_clearance_request(self.student)
+
+    def test_summary_follows_requirement_saves(self):
+        summary = ClearanceStatusSummary.objects.get(student=self.student)
+        self.assertEqual((summary.department_status, summary.bursary_status), ('pending', 'pending'))
+
+        department = Department.objects.get(student=self.student)
+        department.status = 'completed'
+        department.save()
+        bursary = Bursary.objects.get(student=self.student)
+        bursary.status = 'incomplete'
+        bursary.save()
+        summary.refresh_from_db()
+        self.assertEqual((summary.department_status, summary.bursary_status), ('completed', 'incomplete'))
+
+    def test_status_page_and_api_read_the_summary(self):
+        create_clearance_request(create_student(2))
+        # Bypasses the signals, so only a page reading the summary shows it
+        ClearanceStatusSummary.objects.filter(student=self.student).update(hostel_status='completed')
+        self.client.force_login(self.student.user)
+        self.assertContains(self.client.get('/student-clearance-status/'), '<span class="success">Completed</span>')
+
+        results = self.client.get('/api/clearance_status/').json()['results']
+        self.assertEqual([row['student'] for row in results], [self.student.pk])
+        self.assertEqual(results[0]['hostel_status'], 'completed')
+
+    def test_rebuild_command_repairs_missing_and_stale_summaries(self):
+        other = create_student(2)
+        create_clearance_request(other)
+        Department.objects.filter(student=self.student).update(status='completed')  # No signal, so stale
+        ClearanceStatusSummary.objects.filter(student=other).delete()
+
+        out = io.StringIO()
+        call_command('rebuild_status_summaries', batch_size=1, stdout=out)
+        self.assertIn('Rebuilt 2 clearance status summaries', out.getvalue())
+        self.assertEqual(ClearanceStatusSummary.objects.get(student=self.student).department_status, 'completed')
+        self.assertEqual(ClearanceStatusSummary.objects.get(student=other).department_status, 'pending')
+
+
+class StudentResolutionTests(TestCase):
+    views = ('/student-dashboard/', '/student-clearance-request/', '/student-upload-clearance/',
+             '/student-clearance-status/', '/change-password/')
+
+    def setUp(self):
+        cache.clear()
+        self.student = create_student(1)
+        create_clearance_request(self.student)
+
+    def view_query_count(self, url):
+        cache.clear()  # Measure the rendering path, not a cached page
+        self.client.force_login(self.student.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertContains(response, self.student.matric_number)
+        return len(queries)
+
+    def test_each_view_saves_the_student_query(self):
+        for url in self.views:
+            with self.subTest(url=url):
+                joined = self.view_query_count(url)
+                with override_settings(AUTHENTICATION_BACKENDS=['django.contrib.auth.backends.ModelBackend']):
+                    separate = self.view_query_count(url)
+                self.assertEqual(separate - joined, 1)
+
+    def test_staff_are_redirected_to_login(self):
+        self.student.user.is_staff = True
+        self.student.user.save()
+        self.client.force_login(self.student.user)
+        for url in self.views:
+            with self.subTest(url=url):
+                self.assertRedirects(self.client.get(url), '/', fetch_redirect_response=False)
+
+
+class StudentPageCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.student = create_student(1)
+        create_clearance_request(self.student)
+        self.client.force_login(self.student.user)
+
+    def test_status_page_is_served_from_cache_until_a_requirement_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            first = self.client.get('/student-clearance-status/')
+        with self.assertNumQueries(2):  # Session and the user joined with the student
+            cached = self.client.get('/student-clearance-status/')
+        self.assertEqual(first.content, cached.content)
+        self.assertEqual((cache_stats()['hits'], cache_stats()['misses']), (1, 1))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            department = Department.objects.get(student=self.student)
+            department.status = 'completed'
+            department.save()
+        refreshed = self.client.get('/student-clearance-status/')
+        self.assertContains(refreshed, 'Completed')
+        self.assertEqual(cache_stats()['misses'], 2)
+
+
+class AsyncStudentUrls:
+    # The URLconf ASYNC_STUDENT_VIEWS=1 builds at import time: earlier patterns win, the rest keep their names
+    urlpatterns = [
+        path('student-dashboard/', async_views.student_dashboard_view),
+        path('student-clearance-status/', async_views.student_clearance_status),
+    ] + urls.urlpatterns
+
+
+class AsyncStudentViewTests(TestCase):
+    views = ('/student-dashboard/', '/student-clearance-status/')
+
+    def setUp(self):
+        cache.clear()
+        self.student = create_student(1)
+        create_clearance_request(self.student)
+
+    async def test_async_views_render_the_sync_pages(self):
+        await sync_to_async(self.client.force_login)(self.student.user)
+        sync_pages = {url: (await sync_to_async(self.client.get)(url)).content for url in self.views}
+        await cache.aclear()
+
+        await self.async_client.aforce_login(self.student.user)
+        with override_settings(ROOT_URLCONF=AsyncStudentUrls):
+            for url in self.views:
+                with self.subTest(url=url):
+                    self.assertTrue(iscoroutinefunction(resolve(url).func))
+                    self.assertEqual((await self.async_client.get(url)).content, sync_pages[url])
+
+    @override_settings(ROOT_URLCONF=AsyncStudentUrls)
+    async def test_async_status_page_is_served_from_cache(self):
+        await self.async_client.aforce_login(self.student.user)
+        first = await self.async_client.get('/student-clearance-status/')
+        self.assertContains(first, self.student.matric_number)
+        cached = await self.async_client.get('/student-clearance-status/')
+        self.assertEqual(first.content, cached.content)
+        self.assertEqual((cache_stats()['hits'], cache_stats()['misses']), (1, 1))
+
+    @override_settings(ROOT_URLCONF=AsyncStudentUrls)
+    async def test_async_views_turn_away_anonymous_users_and_staff(self):
+        for url in self.views:
+            with self.subTest(url=url):
+                self.assertRedirects(await self.async_client.get(url), f'/?next={url}', fetch_redirect_response=False)
+
+        self.student.user.is_staff = True
+        await self.student.user.asave()
+        await self.async_client.aforce_login(self.student.user)
+        for url in self.views:
+            with self.subTest(url=url):
+                self.assertRedirects(await self.async_client.get(url), '/', fetch_redirect_response=False)
+
+
+class ApiResponseCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.student = create_student(1)
+        create_clearance_request(self.student)
+        self.client.force_login(self.student.user)
+
+    def test_etag_revalidation_and_invalidation_on_save(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            first = self.client.get('/api/departments/')
+        etag = first['ETag']
+
+        with self.assertNumQueries(2):  # Session and user only; departments come from the cache
+            self.assertEqual(self.client.get('/api/departments/').json(), first.json())
+        with self.assertNumQueries(2):
+            self.assertEqual(self.client.get('/api/departments/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            department = Department.objects.get(student=self.student)
+            department.status = 'completed'
+            department.save()
+        refreshed = self.client.get('/api/departments/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(refreshed.status_code, 200)
+        self.assertNotEqual(refreshed['ETag'], etag)
+        self.assertEqual(refreshed.json()['results'][0]['status'], 'completed')
+
+
+@override_settings(STATUS_EVENTS_HEARTBEAT_SECONDS=0.05)
+class StatusStreamTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.student = create_student(1)
+        create_clearance_request(self.student)
+
+    def complete_department(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            department = Department.objects.get(student=self.student)
+            department.status = 'completed'
+            department.save()
+
+    async def test_stream_pushes_status_changes_and_resumes_from_last_event_id(self):
+        events = clearance_status_events(self.student, None)
+        self.assertTrue((await anext(events)).startswith('retry: '))
+        snapshot = await anext(events)
+        self.assertIn('"department_status": "pending"', snapshot)
+
+        await sync_to_async(self.complete_department)()
+        update = await anext(events)
+        self.assertIn('"department_status": "completed"', update)
+        await events.aclose()
+
+        # Reconnecting with the latest id only gets heartbeats until something changes
+        last_event_id = update.split('id: ')[1].split('\n')[0]
+        resumed = clearance_status_events(self.student, last_event_id)
+        await anext(resumed)
+        self.assertEqual(await anext(resumed), ': heartbeat\n\n')
+        await resumed.aclose()
+
+    @override_settings(STATUS_EVENTS_MAX_SECONDS=0.2)
+    async def test_stream_endpoint_streams_events_under_asgi(self):
+        await self.async_client.aforce_login(self.student.user)
+        response = await self.async_client.get('/student-clearance-status/stream/')
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+        body = ''.join([chunk.decode() async for chunk in response.streaming_content])
+        self.assertTrue(body.startswith('retry: '))
+        self.assertIn('event: status\n', body)
+        self.assertIn('"department_status": "pending"', body)
+        self.assertTrue(body.endswith(': heartbeat\n\n'))  # Closed once STATUS_EVENTS_MAX_SECONDS ran out
+
+    def test_wsgi_gets_no_stream_and_the_page_no_event_source(self):
+        self.client.force_login(self.student.user)
+        response = self.client.get('/student-clearance-status/stream/')
+        self.assertEqual(response.status_code, 204)  # EventSource stops reconnecting
+        self.assertNotContains(self.client.get('/student-clearance-status/'), 'EventSource')
+        cache.clear()
+        with override_settings(ASYNC_STUDENT_VIEWS=True):
+            self.assertContains(self.client.get('/student-clearance-status/'), 'EventSource')
+
+
+class DatabaseProfileTests(TestCase):
+    def test_sqlite_pragmas_are_applied_to_new_connections(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], settings.SQLITE_PRAGMAS['busy_timeout'])
+
+    def test_unknown_pragmas_and_values_that_are_not_plain_words_are_refused(self):
+        for pragmas in ({'key': "'secret'"}, {'busy_timeout': '1; DROP TABLE auth_user'}):
+            with self.subTest(pragmas=pragmas), override_settings(SQLITE_PRAGMAS=pragmas):
+                with self.assertRaises(ImproperlyConfigured):
+                    configure_sqlite_connection(sender=None, connection=connection)
+
+    def test_router_sends_only_app_reads_inside_replica_block_to_the_replica(self):
+        router = ReplicaRouter()
+        databases = {**settings.DATABASES, 'replica': settings.DATABASES['default']}
+        with override_settings(DATABASES=databases):
+            self.assertIsNone(router.db_for_read(Department))
+            with read_from_replica():
+                self.assertEqual(router.db_for_read(Department), 'replica')
+                self.assertIsNone(router.db_for_read(User))  # Sessions and users stay on the primary
+                self.assertEqual(router.db_for_write(Department), 'default')
+        with read_from_replica():
+            self.assertIsNone(router.db_for_read(Department))  # No replica configured
+
+
+# Most queries each URL in MySite/urls.py may run for a GET, measured by QueryInstrumentationMiddleware with one
+# clearance request on file and an empty page cache. Every URL needs an entry, so no view ships without a budget.
+QUERY_BUDGETS = {
+    'login': 2,
+    'register': 2,
+    'forgot_password': 2,
+    'retrieve_password': 2,
+    'change_password': 2,
+    'logout': 4,
+    'student_dashboard': 2,
+    'student_clearance_request': 2,
+    'student_upload_clearance': 2,
+    'student_clearance_status': 3,
+    'student_clearance_status_stream': 2,  # Before streaming starts
+    'export_clearance': 2,  # Rows are read while the response streams
+    'cache_stats': 2,
+    'bulk_review': 2,  # GET is not allowed; authentication only
+    'clearance_analytics': 3,
+    'metrics': 3,
+    'api-root': 2,
+    'clearance_documents-list': 3,
+    'clearance_documents-detail': 3,
+    'departments-list': 4,
+    'departments-detail': 4,
+    'faculties-list': 4,
+    'faculties-detail': 4,
+    'hostels-list': 4,
+    'hostels-detail': 4,
+    'bursaries-list': 4,
+    'bursaries-detail': 4,
+    'students-list': 3,
+    'students-detail': 3,
+    'students-search': 2,  # Without a query; authentication only
+    'student_clearance_requests-list': 4,
+    'student_clearance_requests-detail': 4,
+    'uploads-list': 2,  # GET is not allowed; authentication only
+    'uploads-detail': 3,
+    'uploads-chunk': 2,
+    'uploads-finalize': 2,
+    'clearance_status-list': 3,
+    'clearance_status-detail': 3,
+}
+# Fetched as staff; students are redirected away
+STAFF_URLS = {'export_clearance', 'cache_stats', 'bulk_review', 'clearance_analytics', 'students-search', 'metrics'}
+
+
+def url_names(patterns):
+    for pattern in patterns:
+        if hasattr(pattern, 'url_patterns'):
+            yield from url_names(pattern.url_patterns)
+        elif pattern.name:
+            yield pattern.name
+
+
+class QueryBudgetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.student = create_student(1)
+        clearance_request = create_clearance_request(self.student)
+        self.staff = User.objects.create_user(username='officer', is_staff=True)
+        upload = ChunkedUpload.objects.create(student=self.student, filename='form.pdf', total_size=10,
+                                              clearance_type='department', document_type='bio_data',
+                                              semester='alpha', session='2023/2024')
+        self.detail_objects = {
+            'clearance_documents': clearance_request.department.documents.get(),
+            'departments': clearance_request.department,
+            'faculties': clearance_request.faculty,
+            'hostels': clearance_request.hostel,
+            'bursaries': clearance_request.bursary,
+            'students': self.student,
+            'student_clearance_requests': clearance_request,
+            'uploads': upload,
+            'clearance_status': ClearanceStatusSummary.objects.get(student=self.student),
+        }
+
+    def url_for(self, name):
+        basename, _, action = name.rpartition('-')
+        if action in ('detail', 'chunk', 'finalize'):
+            return reverse(name, kwargs={'pk': self.detail_objects[basename].pk})
+        return reverse(name)
+
+    def assertWithinQueryBudget(self, name, budget):
+        """
+        GET the named URL and fail, listing its slowest statements, if it runs more than ``budget`` queries
+        """
+        cache.clear()
+        self.client.force_login(self.staff if name in STAFF_URLS else self.student.user)
+        response = self.client.get(self.url_for(name))
+        stats = response.wsgi_request.query_stats
+        statements = '\n'.join(sql for _, sql in stats.slowest_statements())
+        self.assertLessEqual(stats.count, budget, f'{name} ran {stats.count} queries, slowest:\n{statements}')
+        return stats.count
+
+    def test_every_url_has_a_query_budget(self):
+        self.assertEqual(set(url_names(urls.urlpatterns)) - set(QUERY_BUDGETS), set())
+
+    def test_views_stay_within_their_query_budget(self):
+        request_logger = logging.getLogger('django.request')
+        self.addCleanup(request_logger.setLevel, request_logger.level)
+        request_logger.setLevel(logging.ERROR)  # Upload actions answer GET with 405
+        for name, budget in QUERY_BUDGETS.items():
+            with self.subTest(name=name):
+                self.assertWithinQueryBudget(name, budget)
+
+    @override_settings(QUERY_STATS_HEADER=True, QUERY_LOG_MAX_QUERIES=2)
+    def test_measurements_are_reported_in_header_and_log(self):
+        self.client.force_login(self.student.user)
+        with self.assertLogs('MySite.middleware', 'WARNING') as logs:
+            response = self.client.get('/student-clearance-status/')
+        self.assertEqual(response['Server-Timing'].split(';desc=')[1], '"3 queries"')
+        self.assertIn('(student_clearance_status) ran 3 queries', logs.output[0])
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        overrides = override_settings(METRICS_DIR=self.directory, METRICS_TOKEN='scrape-token')
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        metrics.registry.counters.clear()
+        metrics.registry.histograms.clear()
+
+    def test_scrape_adds_up_every_worker_process(self):
+        other_worker = {
+            'counters': [['http_requests_total', [['method', 'GET'], ['route', 'login'], ['status', '200']], 2]],
+            'histograms': [],
+        }
+        Path(self.directory, '999999.json').write_text(json.dumps(other_worker))
+        self.client.get('/')
+        OutboxEmail.objects.create(to='student1@example.com', subject='Status', body='Updated')
+
+        body = self.client.get('/metrics/', headers={'Authorization': 'Bearer scrape-token'}).content.decode()
+        self.assertIn('http_requests_total{method="GET",route="login",status="200"} 3', body)
+        self.assertIn('http_request_duration_seconds_count{method="GET",route="login"} 1', body)
+        self.assertIn('outbox_pending_emails 1', body)
+
+    def test_scrape_needs_staff_or_token(self):
+        self.assertEqual(self.client.get('/metrics/').status_code, 403)
+        self.assertEqual(self.client.get('/metrics/', headers={'Authorization': 'Bearer wrong'}).status_code, 403)
+
+
+class StaticBundleTests(TestCase):
+    def test_pages_include_sources_until_bundles_are_enabled(self):
+        with override_settings(STATIC_BUNDLES_ENABLED=False):
+            html = self.client.get('/').content.decode()
+        self.assertIn('/static/assets/css/style.css', html)
+        self.assertIn('/static/assets/js/portal.js', html)
+        self.assertNotIn('/static/bundles/', html)
+        self.assertNotIn('code.jquery.com', html)
+
+        with override_settings(STATIC_BUNDLES_ENABLED=True):
+            html = self.client.get('/').content.decode()
+        self.assertIn('<link rel="stylesheet" href="/static/bundles/portal.css">', html)
+        self.assertIn('<script src="/static/bundles/portal.js"></script>', html)
+        self.assertNotIn('/static/assets/css/style.css', html)
+
+    def test_css_urls_are_rebased_onto_the_bundle(self):
+        css = ("@import url('../../../css2?family=Inter');"
+               "@font-face{src:url(\"../../fonts/fa-solid-900.woff2?v=6#x\")}"
+               ".icon{background:url(data:image/png;base64,AAAA)}")
+        rebased = rebase_css(css, 'assets/css/plugins/fontawesome-6.css', 'bundles/portal.css')
+        self.assertNotIn('@import', rebased)  # Points outside the static files
+        self.assertIn('url("../assets/fonts/fa-solid-900.woff2?v=6#x")', rebased)
+        self.assertIn('url(data:image/png;base64,AAAA)', rebased)
+
+
+class ClearanceAdminTests(TestCase):
+    def setUp(self):
+        self.students = [create_student(number) for number in range(6)]
+        for student in self.students:
+            create_clearance_request(student)
+        self.officer = User.objects.create_superuser(username='officer', email='officer@example.com')
+        self.client.force_login(self.officer)
+
+    def changelist_query_count(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/admin/MySite/department/')
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        fewer = self.changelist_query_count()
+        for number in range(6, 12):
+            create_clearance_request(create_student(number))
+        self.assertEqual(self.changelist_query_count(), fewer)
+
+    def test_search_matches_name_and_matric_number_prefixes(self):
+        response = self.client.get('/admin/MySite/department/', {'q': 'du0003'})
+        self.assertEqual([row.student for row in response.context['cl'].result_list], [self.students[3]])
+        response = self.client.get('/admin/MySite/department/', {'q': 'ada student1'})
+        self.assertEqual(response.context['cl'].result_count, 1)
+
+    def test_bulk_action_updates_rows_summaries_and_queues_emails(self):
+        already_completed = Department.objects.get(student=self.students[0])
+        already_completed.status = 'completed'
+        already_completed.save()
+        selected = Department.objects.values_list('pk', flat=True)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post('/admin/MySite/department/', {
+                'action': 'mark_completed', '_selected_action': list(selected),
+            })
+        updates = [query['sql'] for query in queries if query['sql'].startswith('UPDATE "MySite_clearanceunit"')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(Department.objects.filter(status='completed').count(), 6)
+        self.assertEqual(ClearanceStatusSummary.objects.filter(department_status='completed').count(), 6)
+        self.assertEqual(OutboxEmail.objects.filter(dedupe_key__startswith='status:department:').count(), 6)
+
+
+class BulkReviewTests(TestCase):
+    def setUp(self):
+        self.students = [create_student(number) for number in range(8)]
+        self.requests = [create_clearance_request(student) for student in self.students]
+        self.client.force_login(User.objects.create_user(username='officer', is_staff=True))
+
+    def post(self, payload):
+        return self.client.post('/api/reviews/', payload, content_type='application/json')
+
+    def test_items_are_applied_in_batches_with_a_result_each(self):
+        departments = [clearance_request.department for clearance_request in self.requests]
+        Department.objects.filter(pk=departments[0].pk).update(status='completed')
+        items = [{'type': 'department', 'id': department.pk, 'status': 'incomplete'} for department in departments]
+        items += [{'type': 'department', 'id': 0, 'status': 'completed'},
+                  {'type': 'department', 'id': departments[1].pk, 'status': 'completed'},
+                  {'type': 'hostel', 'id': self.requests[0].hostel.pk, 'status': 'pending'}]
+
+        with override_settings(BULK_REVIEW_BATCH_SIZE=3), CaptureQueriesContext(connection) as queries:
+            response = self.post({'items': items})
+        body = response.json()
+        self.assertEqual((body['updated'], body['not_found'], body['duplicate'], body['unchanged']), (8, 1, 1, 1))
+        self.assertEqual(body['results'][0]['previous_status'], 'completed')
+        updates = [query['sql'] for query in queries if query['sql'].startswith('UPDATE "MySite_clearanceunit"')]
+        self.assertEqual(len(updates), 3)  # 8 ids in batches of 3
+        self.assertEqual(Department.objects.filter(status='incomplete').count(), 8)
+        self.assertEqual(ClearanceStatusSummary.objects.filter(department_status='incomplete').count(), 8)
+
+    def test_disallowed_transitions_are_reported_and_skipped(self):
+        faculty = self.requests[0].faculty
+        Faculty.objects.filter(pk=faculty.pk).update(status='completed')
+        response = self.post({'items': [{'type': 'faculty', 'id': faculty.pk, 'status': 'pending'}]})
+        self.assertEqual(response.json()['results'][0]['result'], 'invalid_transition')
+        faculty.refresh_from_db()
+        self.assertEqual(faculty.status, 'completed')
+
+    def test_filter_selects_the_requirements(self):
+        response = self.post({'filter': {'type': 'hostel', 'session': '2023/2024', 'name': 'victory_hall'},
+                              'status': 'completed'})
+        self.assertEqual(response.json()['updated'], 8)
+        self.assertFalse(Hostel.objects.exclude(status='completed').exists())
+
+    def test_invalid_payloads_are_rejected(self):
+        self.assertEqual(self.post({'items': [{'type': 'library', 'id': 1, 'status': 'completed'}]}).status_code, 400)
+        self.assertEqual(self.post({'filter': {'type': 'bursary', 'name': 'x'}, 'status': 'completed'}).status_code,
+                         400)
+        # Lists and objects where strings belong
+        for payload in ({'items': [{'type': ['hostel'], 'id': 1, 'status': 'completed'}]},
+                        {'items': [{'type': 'hostel', 'id': 1, 'status': {'completed': 1}}]},
+                        {'filter': {'type': ['hostel']}, 'status': 'completed'},
+                        {'filter': {'type': 'hostel', 'session': ['2023/2024']}, 'status': 'completed'},
+                        {'filter': {'type': 'hostel'}, 'status': ['completed']}):
+            with self.subTest(payload=payload):
+                self.assertEqual(self.post(payload).status_code, 400)
+        self.client.force_login(self.students[0].user)
+        self.assertEqual(self.post({'items': []}).status_code, 403)
+
+
+class ClearanceCounterTests(TestCase):
+    def setUp(self):
+        self.students = [create_student(number) for number in range(4)]
+        self.requests = [create_clearance_request(student) for student in self.students]
+        self.client.force_login(User.objects.create_user(username='officer', is_staff=True))
+        cache.clear()
+
+    def counters(self):
+        return sorted(ClearanceCounter.objects.filter(count__gt=0).values_list(
+            'unit', 'name', 'session', 'semester', 'status', 'count'))
+
+    def assertCountersMatchRecount(self):
+        maintained = self.counters()
+        ClearanceCounter.objects.rebuild()
+        self.assertEqual(maintained, self.counters())
+
+    def test_counters_follow_saves_reviews_and_deletes(self):
+        department = self.requests[0].department
+        department.status = 'completed'
+        department.save()
+        self.client.post('/api/reviews/', {'filter': {'type': 'hostel'}, 'status': 'incomplete'},
+                         content_type='application/json')
+        Faculty.objects.get(pk=self.requests[1].faculty.pk).delete()
+        self.assertIn(('department', 'computer_science', '2023/2024', 'alpha', 'completed', 1), self.counters())
+        self.assertIn(('hostel', 'victory_hall', '2023/2024', 'alpha', 'incomplete', 4), self.counters())
+        self.assertCountersMatchRecount()
+
+    def test_deleting_a_student_uncounts_its_units_and_bumps_their_api_responses(self):
+        generations = {model: model_generation(model) for model in (Department, Bursary)}
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(f'/api/students/{self.students[0].pk}/')
+        self.assertEqual(response.status_code, 204)
+        self.assertIn(('department', 'computer_science', '2023/2024', 'alpha', 'pending', 3), self.counters())
+        self.assertCountersMatchRecount()
+        for model, generation in generations.items():
+            self.assertGreater(model_generation(model), generation)
+
+    def test_completion_rates_are_served_from_the_counters(self):
+        Department.objects.filter(pk=self.requests[0].department.pk).update(status='completed')
+        ClearanceCounter.objects.rebuild()  # The queryset update sent no signals
+        with CaptureQueriesContext(connection) as queries:
+            results = self.client.get('/api/clearance_analytics/', {'unit': 'department'}).json()['results']
+        self.assertEqual(len([query for query in queries if 'MySite_clearancecounter' in query['sql']]), 1)
+        row = next(row for row in results if row['name'] == 'computer_science')
+        self.assertEqual((row['completed'], row['pending'], row['total'], row['completion_rate']), (1, 3, 4, 0.25))
+        self.assertTrue(all(row['unit'] == 'department' for row in results))
+
+        Department.objects.filter(pk=self.requests[1].department.pk).update(status='completed')
+        ClearanceCounter.objects.rebuild()
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/api/clearance_analytics/', {'unit': 'department'})
+        self.assertFalse([query for query in queries if 'MySite_clearancecounter' in query['sql']])  # Cached
+
+    def test_requirements_created_by_uploads_are_reported_unnamed(self):
+        Hostel.objects.create(student=create_student(9), semester='alpha', session='2023/2024')  # As uploads do
+        results = self.client.get('/api/clearance_analytics/', {'unit': 'hostel'}).json()['results']
+        unnamed = next(row for row in results if row['name'] == '')
+        self.assertEqual((unnamed['label'], unnamed['pending'], unnamed['total']), ('Not yet requested', 1, 1))
+        self.assertEqual(sum(row['total'] for row in results), 5)
+
+    def test_rebuild_command_corrects_drift(self):
+        ClearanceCounter.objects.update(count=99)
+        call_command('rebuild_clearance_counters', stdout=io.StringIO())
+        self.assertEqual(sum(ClearanceCounter.objects.values_list('count', flat=True)), 16)
+
+
+class StudentSearchTests(TestCase):
+    def setUp(self):
+        self.ada = create_student(1)
+        self.bola = Student.objects.create(user=User.objects.create_user(username='DU0002'), first_name='Bola',
+                                           last_name='Adams', matric_number='DU/2020/002', email='bola@example.com')
+        self.chidi = create_student(3)
+        self.chidi.email = 'bola.chidi@example.com'
+        self.chidi.save()
+        self.client.force_login(User.objects.create_user(username='officer', is_staff=True))
+
+    def search(self, query):
+        return [student.matric_number for student in search_students(query)]
+
+    def test_words_match_as_prefixes_ranked_by_column(self):
+        self.assertEqual(self.search('bola'), ['DU/2020/002', 'DU0003'])  # First name outranks email
+        self.assertEqual(sorted(self.search('ada')), ['DU/2020/002', 'DU0001', 'DU0003'])
+        with override_settings(STUDENT_SEARCH_RANK_LIMIT=2):
+            self.assertEqual(self.search('ada'), ['DU0001', 'DU/2020/002', 'DU0003'])  # Too many to rank; id order
+        self.assertEqual(self.search('du/2020'), ['DU/2020/002'])
+        self.assertEqual(self.search('student1@ex'), ['DU0001'])
+        self.assertEqual(self.search('example'), [])  # Emails are single words
+        self.assertEqual(self.search('Ada Stu'), ['DU0001', 'DU0003'])
+        self.assertEqual(self.search('"AND" OR'), [])  # Operators are matched as words
+        self.assertEqual(self.search('  '), [])
+
+    def test_index_follows_saves_and_deletes(self):
+        self.bola.last_name = 'Okafor'
+        self.bola.save()
+        self.assertEqual(self.search('adams'), [])
+        self.assertEqual(self.search('oka'), ['DU/2020/002'])
+        self.ada.user.delete()
+        self.assertEqual(self.search('student1'), [])
+
+    def test_imported_students_are_searchable(self):
+        StudentImporter(workers=1).run([{'matric_number': 'DU/2021/007', 'first_name': 'Ngozi',
+                                         'last_name': 'Okonkwo', 'email': 'ngozi@example.com'}])
+        self.assertEqual(self.search('ngo oko'), ['DU/2021/007'])
+
+    def test_endpoint_is_for_staff(self):
+        response = self.client.get('/api/students/search/', {'q': 'bola', 'limit': 5})
+        self.assertEqual([student['matric_number'] for student in response.json()['results']],
+                         ['DU/2020/002', 'DU0003'])
+        self.client.force_login(self.ada.user)
+        self.assertEqual(self.client.get('/api/students/search/', {'q': 'bola'}).status_code, 403)
+
+
+class ClearanceUnitTests(TestCase):
+    def setUp(self):
+        self.student = create_student(1)
+        self.clearance_request = create_clearance_request(self.student)
+        create_clearance_request(create_student(2))
+
+    def test_proxies_share_one_table_but_see_only_their_unit(self):
+        self.assertEqual(ClearanceUnit.objects.count(), 8)
+        self.assertEqual(Hostel.objects.count(), 2)
+        self.assertEqual(set(Hostel.objects.values_list('unit_type', flat=True)), {'hostel'})
+        faculty, created = Faculty.objects.get_or_create(student=self.student, semester='omega', session='2023/2024')
+        self.assertEqual((faculty.unit_type, created), ('faculty', True))
+        self.assertFalse(Department.objects.filter(pk=faculty.pk).exists())
+        with self.assertRaises(ValidationError):
+            Department(student=self.student, semester='alpha', name='victory_hall').full_clean(
+                validate_constraints=False)
+
+    def test_term_statuses_and_documents_are_single_queries(self):
+        Department.objects.filter(student=self.student).update(status='completed')
+        with self.assertNumQueries(1):
+            statuses = ClearanceUnit.objects.statuses(self.student.pk, 'alpha', '2023/2024')
+        self.assertEqual(statuses, {'department': 'completed', 'faculty': 'pending', 'hostel': 'pending',
+                                    'bursary': 'pending'})
+        with self.assertNumQueries(1):
+            documents = list(ClearanceDocument.objects.filter(
+                clearance_units__in=ClearanceUnit.objects.for_term(self.student.pk, 'alpha', '2023/2024')))
+        self.assertEqual(len(documents), 4)
+
+    def test_unit_responses_keep_their_fields(self):
+        self.client.force_login(self.student.user)
+        department = self.client.get(f'/api/departments/{self.clearance_request.department.pk}/').json()
+        self.assertEqual(list(department), ['id', 'semester', 'session', 'status', 'name', 'student', 'documents'])
+        bursary = self.client.get(f'/api/bursaries/{self.clearance_request.bursary.pk}/').json()
+        self.assertEqual(list(bursary), ['id', 'semester', 'session', 'status', 'total_amount_paid', 'total_fees',
+                                         'outstanding_fees', 'student', 'documents'])
+
+    def test_admin_counts_large_unfiltered_units_from_the_counters(self):
+        ClearanceCounter.objects.filter(unit='hostel').update(count=0)  # Drifted
+        with self.assertNumQueries(2):  # Small table: the counters are checked, then rows counted exactly
+            self.assertEqual(UnitCountPaginator(Hostel.objects.order_by('pk'), 10).count, 2)
+
+        ClearanceCounter.objects.rebuild()
+        with override_settings(ESTIMATED_COUNT_THRESHOLD=2):
+            with self.assertNumQueries(1):
+                self.assertEqual(UnitCountPaginator(Hostel.objects.order_by('pk'), 10).count, 2)
+            self.assertEqual(
+                UnitCountPaginator(Hostel.objects.filter(student=self.student).order_by('pk'), 10).count, 1)
+
+            self.client.force_login(User.objects.create_superuser(username='admin'))
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.client.get('/admin/MySite/hostel/').status_code, 200)
+            self.assertFalse([query for query in queries if query['sql'].startswith('SELECT COUNT(*)')])
+
+
+class BursaryReconciliationTests(TestCase):
+    statement = (
+        'reference,matric_number,amount,session,semester\n'
+        'TX1,du0001,"NGN 1,000.00",2023/2024,alpha\n'
+        'TX2,DU0001,500.50,2023/2024,\n'
+        'TX2,DU0001,500.50,2023/2024,\n'
+        'TX3,DU0002,2000.00,2023/2024,\n'
+        'TX4,DU9999,100.00,2023/2024,\n'
+        'TX5,DU0002,n/a,2023/2024,\n'
+        'TX6,DU0002,100.00,2025/2026,\n'
+    )
+
+    def setUp(self):
+        self.students = [create_student(number) for number in (1, 2)]
+        for student in self.students:
+            for semester in ('alpha', 'omega'):
+                Bursary.objects.create(student=student, semester=semester, total_fees='1500.00',
+                                       outstanding_fees='1500.00')
+
+    def bursary(self, number, semester):
+        return Bursary.objects.get(student__matric_number=f'DU{number:04d}', semester=semester)
+
+    def test_payments_are_summed_per_term_and_balances_recomputed(self):
+        reconciler = BursaryReconciler()
+        summary = reconciler.run(io.StringIO(self.statement))
+        self.assertEqual(
+            (summary['matched'], summary['unmatched'], summary['invalid'], summary['duplicates'], summary['unapplied']),
+            (4, 1, 1, 1, 1),
+        )
+        self.assertEqual([reason for *_, reason in reconciler.unmatched],
+                         ['duplicate reference TX2', 'unknown matric number', 'invalid amount',
+                          'no bursary for 2025/2026'])
+        # The semester payment lands first; the session payment tops alpha up to its fees, the rest goes to omega
+        self.assertEqual((self.bursary(1, 'alpha').total_amount_paid, self.bursary(1, 'alpha').outstanding_fees),
+                         (Decimal('1500.00'), Decimal('0.00')))
+        self.assertEqual(self.bursary(1, 'omega').outstanding_fees, Decimal('1499.50'))
+        self.assertEqual(self.bursary(2, 'omega').total_amount_paid, Decimal('500.00'))
+
+    def test_reimporting_a_statement_changes_nothing_unless_adding(self):
+        BursaryReconciler().run(io.StringIO(self.statement))
+        self.assertEqual(BursaryReconciler().run(io.StringIO(self.statement))['updated'], 0)
+        BursaryReconciler(add=True).run(io.StringIO(self.statement))
+        self.assertEqual(self.bursary(2, 'omega').total_amount_paid, Decimal('2500.00'))  # Alpha was paid up
+
+    def test_amounts_are_parsed_strictly(self):
+        for text, amount in (('NGN 150,000.00', '150000.00'), ('₦1,000', '1000.00'), ('500.5 NGN', '500.50'),
+                             ('-500', '-500.00'), ('(NGN 1,200.00)', '-1200.00')):
+            with self.subTest(text=text):
+                self.assertEqual(parse_amount(text), Decimal(amount))
+        for text in ('1.000,00', '1e5', '(500', '-(500)', '12,3456', '1 000', ''):
+            with self.subTest(text=text):
+                with self.assertRaises(InvalidOperation):
+                    parse_amount(text)
+
+    def test_malformed_amounts_are_counted_not_guessed(self):
+        statement = ('matric_number,amount,session,semester\n'
+                     'DU0001,"1.000,00",2023/2024,alpha\n'
+                     'DU0001,1e5,2023/2024,alpha\n'
+                     'DU0001,(500.00),2023/2024,alpha\n'
+                     'DU0001,700.00,2023/2024,alpha\n')
+        reconciler = BursaryReconciler()
+        summary = reconciler.run(io.StringIO(statement))
+        self.assertEqual((summary['matched'], summary['invalid']), (2, 2))
+        self.assertEqual([amount for _, _, amount, _ in reconciler.unmatched], ['1.000,00', '1e5'])
+        self.assertEqual(self.bursary(1, 'alpha').total_amount_paid, Decimal('200.00'))  # The reversal is subtracted
@@ -0,0 +1,143 @@
+import hashlib
+import os
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+
+from . import metrics
+from .models import REQUIREMENT_MODELS, StudentClearanceRequests, ClearanceDocument, ClearanceUnit
+
+STREAM_BLOCK_SIZE = 64 * 1024
+
+# Running sha256 per upload id, valid while its offset matches; rebuilt from disk otherwise. Only stored once the
+# offset it covers is saved, so a chunk that fails partway never leaves its bytes in the cached hash
+_hashers = {}
+
+
+class UploadError(Exception):
+    """
+    Raised when a chunk or finalize request does not fit the upload's current state
+    """
+
+    def __init__(self, message, offset=None):
+        super().__init__(message)
+        self.offset = offset
+
+
+def part_path(upload):
+    return Path(settings.CHUNKED_UPLOAD_DIR) / f'{upload.pk}.part'
+
+
+def _hasher(upload):
+    """
+    A sha256 of the first ``upload.offset`` bytes that the caller may update without touching the cached one
+    """
+    cached = _hashers.get(upload.pk)
+    if cached is not None and cached[0] == upload.offset:
+        return cached[1].copy()
+
+    hasher = hashlib.sha256()
+    path = part_path(upload)
+    if path.exists():
+        with open(path, 'rb') as part:
+            remaining = upload.offset
+            while remaining:
+                block = part.read(min(STREAM_BLOCK_SIZE, remaining))
+                if not block:
+                    break
+                hasher.update(block)
+                remaining -= len(block)
+    return hasher
+
+
+def append_chunk(upload, offset, stream, length):
+    """
+    Write ``length`` bytes from ``stream`` at ``offset``, which must equal the bytes already received
+    """
+    if upload.status != 'uploading':
+        raise UploadError('Upload is already finalized.', upload.offset)
+    if offset != upload.offset:
+        raise UploadError('Chunk offset does not match the bytes received so far.', upload.offset)
+    if length > settings.CHUNKED_UPLOAD_MAX_CHUNK_SIZE:
+        raise UploadError('Chunk is larger than the allowed chunk size.', upload.offset)
+    if upload.offset + length > upload.total_size:
+        raise UploadError('Chunk runs past the declared file size.', upload.offset)
+
+    path = part_path(upload)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    hasher = _hasher(upload)
+    written = 0
+    started = time.perf_counter()
+    with open(path, 'r+b' if path.exists() else 'wb') as part:
+        part.seek(upload.offset)
+        part.truncate()  # Drop bytes of an earlier attempt that never got recorded
+        while written < length:
+            block = stream.read(min(STREAM_BLOCK_SIZE, length - written))
+            if not block:
+                break
+            part.write(block)
+            hasher.update(block)
+            written += len(block)
+    metrics.inc('upload_bytes_total', written, kind='chunked')
+    metrics.inc('upload_seconds_total', time.perf_counter() - started, kind='chunked')
+
+    upload.offset += written
+    upload.save(update_fields=['offset', 'updated_at'])
+    _hashers[upload.pk] = (upload.offset, hasher)
+    return upload
+
+
+def attach_document(student, clearance_type, semester, session, document):
+    """
+    Add a document to the student's requirement of the given type for the term, creating it if needed
+    """
+    StudentClearanceRequests.objects.get_or_create(student=student, semester=semester, session=session)
+    requirement, _ = REQUIREMENT_MODELS[clearance_type].objects.get_or_create(
+        student=student, semester=semester, session=session,
+    )
+    requirement.documents.add(document)
+    requirement.save()
+    return requirement
+
+
+def finalize_upload(upload, sha256=None):
+    """
+    Turn a fully received upload into a ClearanceDocument attached to its clearance requirement
+    """
+    if upload.status != 'uploading':
+        raise UploadError('Upload is already finalized.', upload.offset)
+    if upload.offset != upload.total_size:
+        raise UploadError('Upload is missing bytes.', upload.offset)
+    path = part_path(upload)
+    if not path.exists():
+        raise UploadError('Upload has no received bytes.', upload.offset)
+
+    digest = _hasher(upload).hexdigest()
+    if sha256 and sha256.lower() != digest:
+        raise UploadError('Checksum does not match the received bytes.', upload.offset)
+    statuses = ClearanceUnit.objects.statuses(upload.student_id, upload.semester, upload.session)
+    if statuses.get(upload.clearance_type) == 'completed':
+        raise UploadError('This clearance is already completed.', upload.offset)  # Closed to new documents
+
+    with transaction.atomic():
+        document = ClearanceDocument(description=upload.description, document_type=upload.document_type)
+        with open(path, 'rb') as part:
+            document.file.save(os.path.basename(upload.filename), File(part), save=False)
+        document.save()
+        attach_document(upload.student, upload.clearance_type, upload.semester, upload.session, document)
+
+        upload.status = 'complete'
+        upload.sha256 = digest
+        upload.document = document
+        upload.save(update_fields=['status', 'sha256', 'document', 'updated_at'])
+
+    def discard_part():
+        path.unlink(missing_ok=True)
+        _hashers.pop(upload.pk, None)
+
+    # Only once the document is committed: an enclosing transaction that rolls back keeps the upload uploading
+    transaction.on_commit(discard_part)
+    return document
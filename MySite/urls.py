@@ -1,9 +1,12 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 
-from . import views
+from . import async_views, views
 from .api_views import ( DepartmentViewSet, FacultyViewSet, HostelViewSet,
-    BursaryViewSet, StudentViewSet, StudentClearanceRequestsViewSet, ClearanceDocumentViewSet
+    BursaryViewSet, StudentViewSet, StudentClearanceRequestsViewSet, ClearanceDocumentViewSet,
+    ClearanceStatusSummaryViewSet, ChunkedUploadViewSet, CacheStatsView, BulkReviewView,
+    ClearanceAnalyticsView
 )
 
 router = DefaultRouter()
@@ -14,6 +17,11 @@ router.register('hostels', HostelViewSet, basename='hostels')
 router.register('bursaries', BursaryViewSet, basename='bursaries')
 router.register('students', StudentViewSet, basename='students')
 router.register('student_clearance_requests', StudentClearanceRequestsViewSet, basename='student_clearance_requests')
+router.register('uploads', ChunkedUploadViewSet, basename='uploads')
+router.register('clearance_status', ClearanceStatusSummaryViewSet, basename='clearance_status')
+
+# Under ASGI the read-heavy student pages can skip the sync thread entirely
+student_views = async_views if settings.ASYNC_STUDENT_VIEWS else views
 
 urlpatterns = [
     path('', views.login_view, name='login'),
@@ -22,9 +30,16 @@ urlpatterns = [
     path('reset-password/', views.retrieve_password_view, name='retrieve_password'),
     path('change-password/', views.change_password_view, name='change_password'),
     path('logout/', views.logout_view, name='logout'),
-    path('student-dashboard/', views.student_dashboard_view, name='student_dashboard'),
+    path('student-dashboard/', student_views.student_dashboard_view, name='student_dashboard'),
     path('student-clearance-request/', views.student_clearance_request, name='student_clearance_request'),
     path('student-upload-clearance/', views.student_upload_clearance, name='student_upload_clearance'),
-    path('student-clearance-status/', views.student_clearance_status, name='student_clearance_status'),
+    path('student-clearance-status/', student_views.student_clearance_status, name='student_clearance_status'),
+    path('student-clearance-status/stream/', async_views.student_clearance_status_stream,
+         name='student_clearance_status_stream'),
+    path('export-clearance/', views.export_clearance_view, name='export_clearance'),
+    path('api/cache_stats/', CacheStatsView.as_view(), name='cache_stats'),
+    path('api/reviews/', BulkReviewView.as_view(), name='bulk_review'),
+    path('api/clearance_analytics/', ClearanceAnalyticsView.as_view(), name='clearance_analytics'),
+    path('metrics/', views.metrics_view, name='metrics'),
     path('api/', include(router.urls)),
 ]
@@ -1,15 +1,27 @@
 from django.contrib import messages
-from django.contrib.auth import login, logout, authenticate
+from django.contrib.auth import login, logout, authenticate, update_session_auth_hash
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.sites.shortcuts import get_current_site
 from django.core.mail import send_mail
+from django.conf import settings
+from django.db.models import Count, Q
+from django.http import HttpResponse, HttpResponseBadRequest, HttpResponseForbidden, StreamingHttpResponse
 from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare
 
+from . import metrics
+from .caching import cache_stats, cached_student_page
+from .decorators import student_required
+from .exports import EXPORT_FORMATS, export_lines, export_queryset, export_rows
 from .forms import LoginForm, PasswordChangeForm, StudentClearanceRequestForm, StudentClearanceDocumentForm
-from .models import Student, StudentClearanceRequests, Faculty, Department, Hostel, Bursary, ClearanceRequirement, \
-    ClearanceDocument
+from .models import Student, StudentClearanceRequests, Faculty, Department, Hostel, Bursary, ClearanceDocument, \
+    ClearanceStatusSummary, ClearanceUnit, OutboxEmail
+from .notifications import queue_submission_email
+from .routers import replica_reads
 
 
 def login_view(request):
@@ -96,19 +108,20 @@ def retrieve_password_view(request):
         logout(request)
         messages.success(request, 'Password reset successfully!')
         return redirect('login')
-    return render(request, 'password_reset.html')
+    return render(request, 'retrieve_password.html')
 
 
-@login_required
+@student_required
 def change_password_view(request):
-    student = Student.objects.get(user=request.user)
+    student = request.student  # Resolved once by student_required
     if request.method == 'POST':
         old_password = request.POST['old_password']
         new_password = request.POST['new_password']
         confirm_password = request.POST['confirm_password']
         if new_password == confirm_password and student.user.check_password(old_password):
-            student.set_password(new_password)
-            student.save()
+            student.user.set_password(new_password)
+            student.user.save()
+            update_session_auth_hash(request, student.user)  # Keep the student logged in
             messages.success(request, "Password successfully changed")
             return redirect('student_dashboard')
         else:
@@ -123,87 +136,84 @@ def logout_view(request):
     return redirect('login')  # Redirect to login after successful logout
 
 
-@login_required
+@student_required
 def student_dashboard_view(request):
-    if request.user.is_staff or request.user.is_superuser:
-        messages.error(request, "User does not have authorized access")
-        return redirect('login')  # Redirect staff/superuser to home
+    student = request.student  # Resolved once by student_required
+    return cached_student_page(request, student, 'student_dashboard.html', lambda: {'student': student})
 
-    student = Student.objects.get(user=request.user)  # Assuming Student has a user FK
-    context = {'student': student}
-    return render(request, 'student_dashboard.html', context)
 
+def requested_unit(model, term, name):
+    """
+    The student's ``model`` requirement for the term, created with ``name``, or renamed to it unless completed
+    """
+    unit, created = model.objects.get_or_create(**term, defaults={'name': name})
+    if not created and unit.name != name and unit.status != 'completed':
+        unit.name = name  # A resubmission corrects a wrong choice while the officers have not cleared it
+        unit.save()
+    return unit
 
-@login_required
-def student_clearance_request(request):
-    if request.user.is_staff or request.user.is_superuser:
-        messages.error(request, "User does not have authorized access")
-        return redirect('login')  # Redirect staff/superuser to home
 
-    student = Student.objects.get(user=request.user)  # Assuming Student has a user FK
+@student_required
+def student_clearance_request(request):
+    student = request.student  # Resolved once by student_required
 
     if request.method == 'GET':
         form = StudentClearanceRequestForm()
     else:
         form = StudentClearanceRequestForm(request.POST)
         if form.is_valid():
-            # Create or retrieve linked clearance requirement objects, explicitly setting student
-            faculty_clearance, _ = Faculty.objects.get_or_create(
-                name=form.cleaned_data['faculty'],
-                semester=form.cleaned_data['semester'],
-                session=form.cleaned_data['session'],
-                defaults={'student': student},  # Associate student explicitly
-            )
-            department_clearance, _ = Department.objects.get_or_create(
-                name=form.cleaned_data['department'],
-                semester=form.cleaned_data['semester'],
-                session=form.cleaned_data['session'],
-                defaults={'student': student},  # Associate student explicitly
-            )
-            hostel_clearance, _ = Hostel.objects.get_or_create(
-                name=form.cleaned_data['hostel'],
-                semester=form.cleaned_data['semester'],
-                session=form.cleaned_data['session'],
-                defaults={'student': student},  # Associate student explicitly
-            )
+            term = {
+                'student': student,  # Associate student explicitly
+                'semester': form.cleaned_data['semester'],
+                'session': form.cleaned_data['session'],
+            }
+            # Create or retrieve linked clearance requirement objects, correcting names still under review
+            faculty_clearance = requested_unit(Faculty, term, form.cleaned_data['faculty'])
+            department_clearance = requested_unit(Department, term, form.cleaned_data['department'])
+            hostel_clearance = requested_unit(Hostel, term, form.cleaned_data['hostel'])
             # Bursary object creation logic (example)
-            bursary_clearance, _ = Bursary.objects.get_or_create(
-                student=student,  # Link bursary to student
-                semester=form.cleaned_data['semester'],
-                session=form.cleaned_data['session'],
-            )
-
-            # Create student clearance request with linked objects
-            clearance_request = StudentClearanceRequests.objects.create(
-                student=student,
-                semester=form.cleaned_data['semester'],
-                session=form.cleaned_data['session'],
-                faculty=faculty_clearance,
-                department=department_clearance,
-                hostel=hostel_clearance,
-                bursary=bursary_clearance,
+            bursary_clearance, _ = Bursary.objects.get_or_create(**term)
+
+            # Create or update the student's clearance request for the term with linked objects
+            clearance_request, _ = StudentClearanceRequests.objects.update_or_create(
+                **term,
+                defaults={
+                    'faculty': faculty_clearance,
+                    'department': department_clearance,
+                    'hostel': hostel_clearance,
+                    'bursary': bursary_clearance,
+                },
             )
-            clearance_request.save()
-            messages.error(request, "Clearance request has been successfully submitted")
+            queue_submission_email(clearance_request)  # Delivered by the send_outbox worker
+            kept = [unit._meta.verbose_name for unit, name in (
+                (faculty_clearance, form.cleaned_data['faculty']),
+                (department_clearance, form.cleaned_data['department']),
+                (hostel_clearance, form.cleaned_data['hostel']),
+            ) if unit.name != name]
+            if kept:
+                messages.error(request, f"Clearance request has been submitted, but your {' and '.join(kept)} "
+                                        f"clearance is already completed and was not changed")
+            else:
+                messages.error(request, "Clearance request has been successfully submitted")
             return redirect('student_clearance_request')  # Redirect to student dashboard
 
     context = {'form': form, 'student': student}
     return render(request, 'student_clearance_request.html', context)
 
 
-@login_required
+@student_required
 def student_upload_clearance(request):
-    if request.user.is_staff or request.user.is_superuser:
-        messages.error(request, "User does not have authorized access")
-        return redirect('login')  # Redirect staff/superuser to home
-
-    student = Student.objects.get(user=request.user)  # Assuming Student has a user FK
+    student = request.student  # Resolved once by student_required
 
     if request.method == 'GET':
         form = StudentClearanceDocumentForm()
     else:
         form = StudentClearanceDocumentForm(request.POST, request.FILES)
-        if form.is_valid():
+        if form.is_valid() and ClearanceUnit.objects.statuses(
+                student.pk, form.cleaned_data['semester'], form.cleaned_data['session'],
+        ).get(form.cleaned_data['clearance_type']) == 'completed':
+            messages.error(request, "This clearance is already completed and takes no more documents")
+        elif form.is_valid():
 
             semester = form.cleaned_data['semester']
             session = form.cleaned_data['session']
@@ -211,6 +221,7 @@ def student_upload_clearance(request):
             document_type = form.cleaned_data['document_type']
             description = form.cleaned_data['description']
             file = form.cleaned_data['file']
+            metrics.inc('upload_bytes_total', file.size, kind='form')
 
             # Create StudentClearanceRequest object if necessary
             clearance_request, created = StudentClearanceRequests.objects.get_or_create(
@@ -228,29 +239,25 @@ def student_upload_clearance(request):
             # Update clearance request based on clearance type
             if clearance_type == 'department':
                 department, is_created = Department.objects.get_or_create(student=student, semester=semester,
-                                                                          session=session,
-                                                                          status__in=['pending', 'incomplete'])
+                                                                          session=session)
                 department.documents.add(clearance_document)
 
                 department.save()
 
             elif clearance_type == 'faculty':
-                faculty, is_created = Faculty.objects.get_or_create(student=student, semester=semester, session=session,
-                                                                    status__in=['pending', 'incomplete'])
+                faculty, is_created = Faculty.objects.get_or_create(student=student, semester=semester, session=session)
                 faculty.documents.add(clearance_document)
 
                 faculty.save()
 
             elif clearance_type == 'hostel':
-                hostel, is_created = Hostel.objects.get_or_create(student=student, semester=semester, session=session,
-                                                                  status__in=['pending', 'incomplete'])
+                hostel, is_created = Hostel.objects.get_or_create(student=student, semester=semester, session=session)
                 hostel.documents.add(clearance_document)
 
                 hostel.save()
 
             elif clearance_type == 'bursary':
-                bursary, is_created = Bursary.objects.get_or_create(student=student, semester=semester, session=session,
-                                                                    status__in=['pending', 'incomplete'])
+                bursary, is_created = Bursary.objects.get_or_create(student=student, semester=semester, session=session)
                 bursary.documents.add(clearance_document)
 
                 bursary.save()
@@ -263,26 +270,21 @@ def student_upload_clearance(request):
     return render(request, 'student_upload_clearance.html', context)
 
 
-@login_required
-def student_clearance_status(request):
-    if request.user.is_staff or request.user.is_superuser:
-        messages.error(request, "User does not have authorized access")
-        return redirect('login')  # Redirect staff/superuser to home
-
-    student = Student.objects.get(user=request.user)  # Assuming Student has a user FK
-
-    # Prioritize Omega semester for the current session
-    clearance_request = StudentClearanceRequests.objects.filter(
+def status_summaries(student):
+    # Prioritize Omega semester, read from the maintained summary in one indexed lookup
+    return ClearanceStatusSummary.objects.filter(
         student=student,
-    ).order_by('-semester').first()  # Get most recent (Omega first)
+    ).order_by('-semester')  # Most recent (Omega) first
 
+
+def clearance_status_context(student, summary):
     # If no request found for current session, check Alpha semester
-    if clearance_request:
+    if summary:
         context = {
-            'department_status': clearance_request.department.status,
-            'faculty_status': clearance_request.faculty.status,
-            'hostel_status': clearance_request.hostel.status,
-            'bursary_status': clearance_request.bursary.status,
+            'department_status': summary.department_status,
+            'faculty_status': summary.faculty_status,
+            'hostel_status': summary.hostel_status,
+            'bursary_status': summary.bursary_status,
             'student': student,
         }
     else:
@@ -293,5 +295,57 @@ def student_clearance_status(request):
             'bursary_status': 'Unknown',
             'student': student,
         }
+    context['status_stream'] = settings.ASYNC_STUDENT_VIEWS  # Live updates need ASGI (see async_views)
+    return context
+
 
-    return render(request, 'student_clearance_status.html', context)
+@student_required
+@replica_reads  # Inside student_required, so the student itself is resolved on the primary
+def student_clearance_status(request):
+    student = request.student  # Resolved once by student_required
+    return cached_student_page(request, student, 'student_clearance_status.html',
+                               lambda: clearance_status_context(student, status_summaries(student).first()))
+
+
+@staff_member_required
+def export_clearance_view(request):
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return HttpResponseBadRequest(f"Unsupported export format: {export_format}")
+
+    queryset = export_queryset(
+        session=request.GET.get('session'),
+        semester=request.GET.get('semester'),
+        status=request.GET.get('status'),
+    )
+    content_type = 'application/x-ndjson' if export_format == 'ndjson' else 'text/csv'
+    response = StreamingHttpResponse(export_lines(export_format, export_rows(queryset)), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="clearance_export.{export_format}"'
+    return response
+
+
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint; needs a staff session or ``Authorization: Bearer <METRICS_TOKEN>``
+    """
+    token = request.headers.get('Authorization', '').removeprefix('Bearer ')
+    if not (request.user.is_staff or (settings.METRICS_TOKEN and constant_time_compare(token, settings.METRICS_TOKEN))):
+        return HttpResponseForbidden()
+
+    outbox = OutboxEmail.objects.aggregate(
+        pending=Count('pk', filter=Q(status='pending')),
+        due=Count('pk', filter=Q(status='pending', next_attempt_at__lte=timezone.now())),
+        failed=Count('pk', filter=Q(status='failed')),
+    )
+    page_cache = cache_stats()
+    gauges = [
+        ('outbox_pending_emails', 'Queued emails not yet sent', {}, outbox['pending']),
+        ('outbox_due_emails', 'Queued emails whose next attempt is due', {}, outbox['due']),
+        ('outbox_failed_emails', 'Emails that used up every attempt', {}, outbox['failed']),
+        ('student_page_cache_lookups', 'Student page cache lookups by outcome', {'outcome': 'hit'}, page_cache['hits']),
+        ('student_page_cache_lookups', 'Student page cache lookups by outcome', {'outcome': 'miss'},
+         page_cache['misses']),
+        ('student_page_cache_hit_ratio', 'Share of student page requests served from the cache', {},
+         page_cache['hit_rate']),
+    ]
+    return HttpResponse(metrics.render(gauges), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 import os
+import tempfile
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -45,15 +46,29 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'whitenoise.middleware.WhiteNoiseMiddleware',  # Serves static files before any session or database work
+    'MySite.middleware.QueryInstrumentationMiddleware',  # Before sessions and auth, so their queries are counted too
+    'MySite.middleware.MetricsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',  # Add WhiteNoise middleware
 ]
 
+# Query instrumentation (see MySite.middleware.QueryInstrumentationMiddleware)
+QUERY_LOG_MAX_QUERIES = 30  # Requests running more queries are logged with their slowest statements
+QUERY_LOG_MAX_DB_MILLISECONDS = 250  # As are requests spending longer than this in the database
+QUERY_LOG_SLOWEST = 3  # Statements kept per request
+QUERY_STATS_HEADER = DEBUG  # Adds Server-Timing: db;dur=<ms>;desc="<n> queries" to responses
+
+# Metrics (see MySite.metrics); every worker process writes its values to its own file in METRICS_DIR, which all
+# workers on the host must share. Files of exited workers keep counting; empty the directory on deploys to reset
+METRICS_DIR = os.environ.get('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'rcs-metrics'))
+METRICS_FLUSH_SECONDS = 1
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')  # Bearer token for scrapers; staff sessions also work
+
 ROOT_URLCONF = 'ResumptionClearanceSystem.urls'
 
 TEMPLATES = [
@@ -69,6 +84,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'MySite.context_processors.student',
             ],
         },
     },
@@ -76,18 +92,77 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'ResumptionClearanceSystem.wsgi.application'
 
+# Serve the student dashboard and clearance status pages with native async views, and push live status updates
+# to the status page over Server-Sent Events; enable under ASGI only
+ASYNC_STUDENT_VIEWS = os.environ.get('ASYNC_STUDENT_VIEWS', '') == '1'
+
 
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'MySite.db_backends.sqlite3',  # Django's sqlite3 backend plus transaction_mode
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',  # Atomic blocks wait for the write lock up front instead of failing
+        },
+        'CONN_MAX_AGE': int(os.environ.get('DATABASE_CONN_MAX_AGE', '600')),  # Seconds; 0 closes after every request
+        'CONN_HEALTH_CHECKS': True,
+    }
+}
+
+# Read replica for the status views and read-only API viewsets (see MySite.routers). Set DATABASE_REPLICA_NAME to
+# a copy of the database kept in sync by the deployment; cached pages and API responses built from a lagging
+# replica are only refreshed by the next save, so keep the lag well under a second
+if os.environ.get('DATABASE_REPLICA_NAME'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': os.environ['DATABASE_REPLICA_NAME'],
+        'TEST': {'MIRROR': 'default'},
     }
+
+DATABASE_ROUTERS = ['MySite.routers.ReplicaRouter']
+
+# Applied to every new SQLite connection (see MySite.signals.configure_sqlite_connection).
+# WAL lets status reads run during an upload's write, and busy_timeout makes a writer wait for the lock
+# instead of failing with "database is locked"
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',  # Safe with WAL; commits skip the fsync until checkpoint
+    'busy_timeout': 20000,  # Milliseconds
+    'mmap_size': 256 * 1024 * 1024,  # Bytes
 }
 
 
+# Authentication
+# Loads the Student profile together with the session user
+
+AUTHENTICATION_BACKENDS = [
+    'MySite.backends.StudentModelBackend',
+]
+
+
+# Cache
+# Any backend works; a file-based cache shares pages and counters between worker processes
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+STUDENT_PAGE_CACHE_TIMEOUT = 60 * 60  # Seconds; saves invalidate cached student pages sooner
+API_RESPONSE_CACHE_TIMEOUT = 60 * 60  # Seconds; saves bump the model generation sooner
+
+
+# Live clearance status stream (Server-Sent Events)
+# Streams also re-check the student's page cache version on every heartbeat, so changes made by other
+# worker processes arrive within one interval when the cache is shared
+STATUS_EVENTS_HEARTBEAT_SECONDS = 15
+STATUS_EVENTS_RETRY_MILLISECONDS = 3000  # Browser reconnect delay after a dropped stream
+STATUS_EVENTS_MAX_SECONDS = 5 * 60  # Streams are closed and reconnected so no worker is held forever
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -124,10 +199,79 @@ LOGIN_URL = 'login'
 STATIC_URL = '/static/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'  # Path to collect static files
 
+# Asset bundles, built by `manage.py build_static_assets` and included with {% static_bundle %}.
+# Only the files the portal templates use are listed; the rest of the theme is never sent to browsers.
+STATIC_BUNDLES = {
+    'bundles/portal.css': [
+        'assets/css/plugins/fontawesome-6.css',
+        'assets/css/vendor/bootstrap.min.css',
+        'assets/css/style.css',
+    ],
+    'bundles/portal.js': [
+        'assets/js/vendor/jquery.min.js',
+        'assets/js/portal.js',
+    ],
+}
+STATIC_BUNDLES_DIR = BASE_DIR / 'MySite' / 'static'  # Bundles are written under here, so collectstatic finds them
+# Serve the built bundles with hashed names, gzip and brotli variants and far-future cache headers; off in debug so
+# edits to the source files show up without a build
+STATIC_BUNDLES_ENABLED = os.environ.get('STATIC_BUNDLES_ENABLED', str(int(not DEBUG))) == '1'
+
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': ('MySite.storage.CompressedManifestStaticFilesStorage' if STATIC_BUNDLES_ENABLED
+                    else 'django.contrib.staticfiles.storage.StaticFilesStorage'),
+    },
+}
+WHITENOISE_KEEP_ONLY_HASHED_FILES = True
+
 # Media files (user uploads)
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'  # Path to store uploaded media
 
+# Clearance document files nobody references are deleted by `manage.py gc_clearance_documents` once untouched for
+# this long, so an upload reusing a file in the meantime always finds it
+CONTENT_BLOB_GC_GRACE_SECONDS = 24 * 60 * 60
+
+# Chunked document uploads: partial files live here until finalized
+CHUNKED_UPLOAD_DIR = MEDIA_ROOT / 'chunked_uploads'
+CHUNKED_UPLOAD_MAX_CHUNK_SIZE = 8 * 1024 * 1024  # Largest single chunk accepted, in bytes
+CHUNKED_UPLOAD_MAX_FILE_SIZE = 100 * 1024 * 1024
+
+# Email outbox, drained by `manage.py send_outbox`
+DEFAULT_FROM_EMAIL = 'clearance@localhost'
+OUTBOX_BATCH_SIZE = 100
+OUTBOX_MAX_ATTEMPTS = 5
+OUTBOX_RETRY_BASE_SECONDS = 60  # Doubles after every failed attempt
+OUTBOX_CLAIM_SECONDS = 10 * 60  # A batch a worker claimed but never finished is sent again after this
+
+# Admin changelists of tables with at least this many rows (per the planner statistics) show an estimated total
+# instead of counting every row (see MySite.pagination.EstimatedCountPaginator)
+ESTIMATED_COUNT_THRESHOLD = 10000
+
+# Officer bulk review API (see MySite.reviews.review)
+BULK_REVIEW_BATCH_SIZE = 500  # Ids per UPDATE
+BULK_REVIEW_MAX_ITEMS = 10000  # Items per request, or requirements a filter may select
+
+# Clearance analytics endpoint, read from the counters kept by signals; `manage.py rebuild_clearance_counters`
+# recounts them from scratch should they drift
+CLEARANCE_ANALYTICS_CACHE_SECONDS = 10
+
+# Staff student search at /api/students/search/?q=; results per query by default and at most
+STUDENT_SEARCH_RESULTS = 20
+STUDENT_SEARCH_MAX_RESULTS = 100
+# Queries matching more students than this are returned in id order rather than scored (about 2us per match)
+STUDENT_SEARCH_RANK_LIMIT = 5000
+
+# Django REST framework
+REST_FRAMEWORK = {
+    'DEFAULT_PAGINATION_CLASS': 'MySite.pagination.ClearanceCursorPagination',
+    'PAGE_SIZE': 50,
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
@@ -0,0 +1,34 @@
+"""
+Boot Django against a throwaway SQLite database so benchmarks never touch db.sqlite3
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+
+def setup(db_name='benchmark.sqlite3'):
+    """
+    Configure settings to use a fresh database file in a temporary directory and return its path
+    """
+    if str(BASE_DIR) not in sys.path:
+        sys.path.insert(0, str(BASE_DIR))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ResumptionClearanceSystem.settings')
+
+    import django
+    from django.conf import settings
+
+    db_path = Path(tempfile.mkdtemp(prefix='rcs-bench-')) / db_name
+    settings.DATABASES['default']['NAME'] = db_path
+    settings.ALLOWED_HOSTS = ['*']
+    django.setup()
+    return db_path
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
@@ -0,0 +1,103 @@
+"""
+Compare the sync and async student views under concurrent load through Django's in-process ASGI client.
+
+    python -m benchmarks.async_views --students 200 --requests 2000 --concurrency 50
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from benchmarks._django import percentile, setup
+
+VIEWS = ('student-dashboard', 'student-clearance-status')
+
+
+def seed(students):
+    from django.contrib.auth.models import User
+    from MySite.models import Student, Department, Faculty, Hostel, Bursary, StudentClearanceRequests
+    from MySite.models import ClearanceStatusSummary
+
+    numbers = range(1, students + 1)
+    term = {'semester': 'alpha', 'session': '2023/2024'}
+    User.objects.bulk_create([User(id=n, username=f'BENCH{n:05d}', password='!') for n in numbers])
+    Student.objects.bulk_create([
+        Student(user_id=n, first_name='Bench', last_name=str(n), matric_number=f'BENCH{n:05d}',
+                email=f'bench{n}@example.com') for n in numbers
+    ])
+    # The units share one table, so each takes its own range of ids
+    Department.objects.bulk_create([Department(id=n, student_id=n, name='computer_science', **term) for n in numbers])
+    Faculty.objects.bulk_create([
+        Faculty(id=students + n, student_id=n, name='computing_and_applied_sciences', **term) for n in numbers
+    ])
+    Hostel.objects.bulk_create([
+        Hostel(id=2 * students + n, student_id=n, name='victory_hall', **term) for n in numbers
+    ])
+    Bursary.objects.bulk_create([Bursary(id=3 * students + n, student_id=n, **term) for n in numbers])
+    StudentClearanceRequests.objects.bulk_create([
+        StudentClearanceRequests(student_id=n, department_id=n, faculty_id=students + n,
+                                 hostel_id=2 * students + n, bursary_id=3 * students + n, **term)
+        for n in numbers
+    ])
+    ClearanceStatusSummary.objects.rebuild()
+    return list(User.objects.filter(pk__in=numbers))
+
+
+async def run(clients, path, total):
+    latencies = []
+    remaining = iter(range(total))
+
+    async def worker(client):
+        for _ in remaining:
+            started = time.perf_counter()
+            response = await client.get(path)
+            latencies.append(time.perf_counter() - started)
+            assert response.status_code == 200, response.status_code
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(client) for client in clients))
+    elapsed = time.perf_counter() - started
+    return {
+        'requests_per_second': round(total / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--students', type=int, default=200)
+    parser.add_argument('--requests', type=int, default=2000, help='Requests per view and mode')
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--page-cache', action='store_true',
+                        help='Keep the student page cache on; by default every request renders')
+    args = parser.parse_args()
+
+    setup()
+    from django.conf import settings
+    from django.core.management import call_command
+    from django.test import AsyncClient
+
+    settings.ROOT_URLCONF = 'benchmarks.urls'
+    if not args.page_cache:
+        settings.CACHES = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+    call_command('migrate', verbosity=0)
+    users = seed(args.students)
+
+    clients = []
+    for index in range(args.concurrency):
+        client = AsyncClient()
+        client.force_login(users[index % len(users)])
+        clients.append(client)
+
+    results = {}
+    for view in VIEWS:
+        for mode in ('sync', 'async'):
+            path = f'/bench/{mode}/{view}/'
+            asyncio.run(run(clients[:1], path, 10))  # Warm up templates and connections
+            results[f'{mode} {view}'] = asyncio.run(run(clients, path, args.requests))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""
+Time the bursary reconciliation of a generated payment statement: parsing and matching, applying the sums
+to the Bursary rows and writing them back, and compare the write with QuerySet.bulk_update.
+
+    python -m benchmarks.bursary_reconciliation --students 50000 --lines 200000
+"""
+import argparse
+import io
+import json
+import random
+import time
+
+from benchmarks._django import setup
+
+SESSION = '2023/2024'
+FEES = 150000
+
+
+def seed(students, batch_size=5000):
+    from django.contrib.auth.models import User
+    from MySite.models import Student, Bursary
+
+    for start in range(0, students, batch_size):
+        numbers = range(start + 1, min(students, start + batch_size) + 1)
+        User.objects.bulk_create([User(id=n, username=f'BENCH{n:07d}', password='!') for n in numbers])
+        Student.objects.bulk_create([
+            Student(user_id=n, first_name='Bench', last_name=str(n), matric_number=f'BENCH{n:07d}',
+                    email=f'bench{n}@example.com') for n in numbers
+        ])
+        Bursary.objects.bulk_create([
+            Bursary(student_id=n, semester=semester, session=SESSION, total_fees=FEES, outstanding_fees=FEES)
+            for n in numbers for semester in ('alpha', 'omega')
+        ])
+
+
+def statement(students, lines, seed_value):
+    """
+    CSV text of ``lines`` payments; about 1% name unknown matric numbers and half leave the semester out
+    """
+    rng = random.Random(seed_value)
+    output = io.StringIO()
+    output.write('reference,matric_number,amount,session,semester\n')
+    for line in range(lines):
+        number = rng.randint(1, students) if rng.random() > 0.01 else students + rng.randint(1, 1000)
+        semester = rng.choice(('alpha', 'omega', '')) if line % 2 else ''
+        output.write(f'TX{line:08d},bench{number:07d},"NGN {rng.randint(1, 400) * 250:,}.00",{SESSION},{semester}\n')
+    output.seek(0)
+    return output
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--students', type=int, default=50000)
+    parser.add_argument('--lines', type=int, default=200000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--bulk-update-sample', type=int, default=5000,
+                        help='Changed rows written again with bulk_update, and rolled back, for comparison')
+    args = parser.parse_args()
+
+    setup()
+    import csv
+    from django.core.management import call_command
+    from django.db import transaction
+    from MySite.models import Bursary
+    from MySite.reconciliation import BursaryReconciler, write_totals
+
+    call_command('migrate', verbosity=0)
+    seed(args.students)
+    text = statement(args.students, args.lines, args.seed)
+
+    reconciler = BursaryReconciler()
+    started = time.perf_counter()
+    totals = reconciler.aggregate(csv.DictReader(text))
+    aggregated = time.perf_counter()
+    changed = reconciler.apply(totals)
+    applied = time.perf_counter()
+    with transaction.atomic():
+        write_totals(changed)
+    written = time.perf_counter()
+
+    sample = [Bursary(pk=pk, total_amount_paid=paid, outstanding_fees=balance)
+              for pk, paid, balance in changed[:args.bulk_update_sample]]
+    with transaction.atomic():
+        bulk_started = time.perf_counter()
+        Bursary.objects.bulk_update(sample, ['total_amount_paid', 'outstanding_fees'], batch_size=1000)
+        bulk_seconds = time.perf_counter() - bulk_started
+        transaction.set_rollback(True)
+
+    print(json.dumps({
+        'lines': args.lines,
+        'students': args.students,
+        'summary': reconciler.summary,
+        'bursaries_changed': len(changed),
+        'aggregate_seconds': round(aggregated - started, 2),
+        'apply_seconds': round(applied - aggregated, 2),
+        'write_seconds': round(written - applied, 2),
+        'total_seconds': round(written - started, 2),
+        'write_ms_per_row': round((written - applied) * 1000 / max(len(changed), 1), 3),
+        'bulk_update_ms_per_row': round(bulk_seconds * 1000 / max(len(sample), 1), 3),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
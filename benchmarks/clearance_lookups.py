@@ -0,0 +1,114 @@
+"""
+Time the get_or_create lookups made by student_clearance_request and student_upload_clearance
+before and after the (student, semester, session) constraints migration.
+
+    python -m benchmarks.clearance_lookups --students 100000 --samples 2000
+"""
+import argparse
+import random
+import time
+
+from benchmarks._django import percentile, setup
+
+BEFORE_MIGRATION = '0004_clearancestatussummary'
+AFTER_MIGRATION = '0005_clearance_term_constraints'
+SEMESTER = 'alpha'
+SESSION = '2023/2024'
+
+
+def historical_models(migration):
+    """
+    The app registry as of ``migration``; the current models no longer match the schemas being compared
+    """
+    from django.db import connection
+    from django.db.migrations.executor import MigrationExecutor
+
+    return MigrationExecutor(connection).loader.project_state(('MySite', migration)).apps
+
+
+def seed(apps, students, batch_size=5000):
+    User = apps.get_model('auth', 'User')
+    Student = apps.get_model('MySite', 'Student')
+    StudentClearanceRequests = apps.get_model('MySite', 'StudentClearanceRequests')
+    Department, Faculty = apps.get_model('MySite', 'Department'), apps.get_model('MySite', 'Faculty')
+    Hostel, Bursary = apps.get_model('MySite', 'Hostel'), apps.get_model('MySite', 'Bursary')
+
+    for start in range(0, students, batch_size):
+        numbers = range(start + 1, min(students, start + batch_size) + 1)
+        # Unusable password hashes keep seeding fast; the benchmark never logs in
+        User.objects.bulk_create([User(id=n, username=f'BENCH{n:07d}', password='!') for n in numbers])
+        Student.objects.bulk_create([
+            Student(user_id=n, first_name='Bench', last_name=str(n), matric_number=f'BENCH{n:07d}',
+                    email=f'bench{n}@example.com') for n in numbers
+        ])
+        term = {'semester': SEMESTER, 'session': SESSION}
+        # Names stay distinct because the pre-migration schema still has unique requirement names
+        Department.objects.bulk_create([Department(id=n, student_id=n, name=f'dept-{n}', **term) for n in numbers])
+        Faculty.objects.bulk_create([Faculty(id=n, student_id=n, name=f'faculty-{n}', **term) for n in numbers])
+        Hostel.objects.bulk_create([Hostel(id=n, student_id=n, name=f'hostel-{n}', **term) for n in numbers])
+        Bursary.objects.bulk_create([Bursary(id=n, student_id=n, **term) for n in numbers])
+        StudentClearanceRequests.objects.bulk_create([
+            StudentClearanceRequests(student_id=n, faculty_id=n, department_id=n, hostel_id=n, bursary_id=n, **term)
+            for n in numbers
+        ])
+
+
+def measure(apps, student_ids):
+    Department, Faculty = apps.get_model('MySite', 'Department'), apps.get_model('MySite', 'Faculty')
+    Hostel, Bursary = apps.get_model('MySite', 'Hostel'), apps.get_model('MySite', 'Bursary')
+    StudentClearanceRequests = apps.get_model('MySite', 'StudentClearanceRequests')
+
+    calls = {
+        'clearance_request.Faculty': lambda sid: Faculty.objects.get_or_create(
+            student_id=sid, semester=SEMESTER, session=SESSION, defaults={'name': 'computing_and_applied_sciences'}),
+        'clearance_request.Department': lambda sid: Department.objects.get_or_create(
+            student_id=sid, semester=SEMESTER, session=SESSION, defaults={'name': 'computer_science'}),
+        'clearance_request.Hostel': lambda sid: Hostel.objects.get_or_create(
+            student_id=sid, semester=SEMESTER, session=SESSION, defaults={'name': 'victory_hall'}),
+        'clearance_request.Bursary': lambda sid: Bursary.objects.get_or_create(
+            student_id=sid, semester=SEMESTER, session=SESSION),
+        'upload_clearance.StudentClearanceRequests': lambda sid: StudentClearanceRequests.objects.get_or_create(
+            student_id=sid, semester=SEMESTER, session=SESSION),
+        'upload_clearance.Department': lambda sid: Department.objects.get_or_create(
+            student_id=sid, semester=SEMESTER, session=SESSION),
+    }
+    results = {}
+    for label, call in calls.items():
+        timings = []
+        for student_id in student_ids:
+            started = time.perf_counter()
+            call(student_id)
+            timings.append((time.perf_counter() - started) * 1e6)
+        results[label] = (sum(timings) / len(timings), percentile(timings, 0.95))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--students', type=int, default=100000)
+    parser.add_argument('--samples', type=int, default=2000)
+    args = parser.parse_args()
+
+    db_path = setup()
+    from django.core.management import call_command
+
+    call_command('migrate', verbosity=0)
+    call_command('migrate', 'MySite', BEFORE_MIGRATION, verbosity=0)
+
+    started = time.perf_counter()
+    seed(historical_models(BEFORE_MIGRATION), args.students)
+    print(f'Seeded {args.students} students into {db_path} in {time.perf_counter() - started:.1f}s')
+
+    student_ids = random.Random(0).sample(range(1, args.students + 1), min(args.samples, args.students))
+    before = measure(historical_models(BEFORE_MIGRATION), student_ids)
+    call_command('migrate', 'MySite', AFTER_MIGRATION, verbosity=0)
+    after = measure(historical_models(AFTER_MIGRATION), student_ids)
+
+    print(f'{"lookup":45} {"before mean/p95 (us)":>22} {"after mean/p95 (us)":>22}')
+    for label in before:
+        print(f'{label:45} {before[label][0]:>10.1f} / {before[label][1]:<9.1f} '
+              f'{after[label][0]:>10.1f} / {after[label][1]:<9.1f}')
+
+
+if __name__ == '__main__':
+    main()
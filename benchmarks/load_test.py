@@ -0,0 +1,245 @@
+"""
+Replay a resumption-day mix of portal and API journeys with concurrent workers through Django's test client
+and report throughput, latency percentiles and query counts per endpoint as JSON.
+
+    python -m benchmarks.load_test --students 500 --journeys 400 --concurrency 16 --output before.json
+    python -m benchmarks.load_test --students 500 --journeys 400 --concurrency 16 --compare before.json
+
+Journeys are picked by weight from JOURNEYS; each request is checked for a non-error status. Password hashing
+uses MD5 unless --real-password-hashing is given, so a run measures the views rather than PBKDF2.
+"""
+import argparse
+import hashlib
+import itertools
+import json
+import random
+import subprocess
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from benchmarks._django import BASE_DIR, percentile, setup
+
+TERM = {'semester': 'alpha', 'session': '2023/2024'}
+CLEARANCE_REQUEST = {'faculty': 'computing_and_applied_sciences', 'department': 'computer_science',
+                     'hostel': 'victory_hall', **TERM}
+DOCUMENT = b'%PDF-1.4\n' + b'0' * 16 * 1024
+
+
+class Recorder:
+    """
+    Times requests and counts the queries each one runs on the calling thread's connection
+    """
+
+    def __init__(self):
+        self.samples = defaultdict(list)  # endpoint -> [(seconds, queries, ok)]
+        self.lock = threading.Lock()
+
+    def request(self, endpoint, send, expected=(200, 201, 302)):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            response = send()
+            elapsed = time.perf_counter() - started
+        with self.lock:
+            self.samples[endpoint].append((elapsed, len(queries), response.status_code in expected))
+        return response
+
+    def report(self, elapsed):
+        endpoints = {}
+        for endpoint, samples in sorted(self.samples.items()):
+            latencies = [seconds * 1000 for seconds, _, _ in samples]
+            queries = [count for _, count, _ in samples]
+            endpoints[endpoint] = {
+                'requests': len(samples),
+                'errors': sum(not ok for _, _, ok in samples),
+                'requests_per_second': round(len(samples) / elapsed, 2),
+                'p50_ms': round(percentile(latencies, 0.50), 2),
+                'p95_ms': round(percentile(latencies, 0.95), 2),
+                'p99_ms': round(percentile(latencies, 0.99), 2),
+                'mean_queries': round(sum(queries) / len(queries), 2),
+                'max_queries': max(queries),
+            }
+        total = sum(endpoint['requests'] for endpoint in endpoints.values())
+        return {
+            'totals': {
+                'requests': total,
+                'errors': sum(endpoint['errors'] for endpoint in endpoints.values()),
+                'elapsed_seconds': round(elapsed, 2),
+                'requests_per_second': round(total / elapsed, 2),
+            },
+            'endpoints': endpoints,
+        }
+
+
+def new_student(recorder, client, number):
+    """
+    Register, log in, submit the clearance request, upload a document and check the status
+    """
+    matric_number = f'LOAD{number:06d}'
+    password = 'resumption-day'
+    recorder.request('GET /register/', lambda: client.get('/register/'))
+    recorder.request('POST /register/', lambda: client.post('/register/', {
+        'email': f'load{number}@example.com', 'first_name': 'Load', 'last_name': str(number),
+        'matric_number': matric_number, 'password': password, 'confirm_password': password,
+    }))
+    recorder.request('POST /', lambda: client.post('/', {'username': matric_number, 'password': password}))
+    recorder.request('GET /student-dashboard/', lambda: client.get('/student-dashboard/'))
+    recorder.request('GET /student-clearance-request/', lambda: client.get('/student-clearance-request/'))
+    recorder.request('POST /student-clearance-request/',
+                     lambda: client.post('/student-clearance-request/', CLEARANCE_REQUEST))
+    recorder.request('POST /student-upload-clearance/', lambda: client.post('/student-upload-clearance/', {
+        'file': upload_file(number), 'description': 'Course form', 'document_type': 'course_form_100l_alpha',
+        'clearance_type': 'department', **TERM,
+    }))
+    recorder.request('GET /student-clearance-status/', lambda: client.get('/student-clearance-status/'))
+
+
+def returning_student(recorder, client, number):
+    """
+    A seeded student checking on their clearance through the portal and the API
+    """
+    recorder.request('GET /student-dashboard/', lambda: client.get('/student-dashboard/'))
+    recorder.request('GET /student-clearance-status/', lambda: client.get('/student-clearance-status/'))
+    recorder.request('GET /api/clearance_status/', lambda: client.get('/api/clearance_status/'))
+
+
+def api_client(recorder, client, number):
+    """
+    A seeded student using the API: list requirements, then a resumable upload in two chunks
+    """
+    recorder.request('GET /api/departments/', lambda: client.get('/api/departments/', TERM))
+    recorder.request('GET /api/student_clearance_requests/',
+                     lambda: client.get('/api/student_clearance_requests/', TERM))
+    content = DOCUMENT + str(number).encode()
+    created = recorder.request('POST /api/uploads/', lambda: client.post('/api/uploads/', {
+        'filename': f'form-{number}.pdf', 'total_size': len(content), 'clearance_type': 'faculty',
+        'document_type': 'bio_data', 'description': 'Bio-data', **TERM,
+    }, content_type='application/json'))
+    if created.status_code != 201:
+        return
+    upload_url = f'/api/uploads/{created.json()["id"]}/'
+    middle = len(content) // 2
+    for offset, chunk in ((0, content[:middle]), (middle, content[middle:])):
+        recorder.request('PUT /api/uploads/{id}/chunk/', lambda: client.put(
+            upload_url + 'chunk/', chunk, content_type='application/offset+octet-stream',
+            headers={'Upload-Offset': str(offset)},
+        ))
+    recorder.request('POST /api/uploads/{id}/finalize/', lambda: client.post(
+        upload_url + 'finalize/', {'sha256': hashlib.sha256(content).hexdigest()}, content_type='application/json',
+    ))
+
+
+JOURNEYS = {
+    'new_student': (new_student, 1),
+    'returning_student': (returning_student, 3),
+    'api_client': (api_client, 2),
+}
+
+
+def upload_file(number):
+    from django.core.files.uploadedfile import SimpleUploadedFile
+
+    return SimpleUploadedFile(f'course-form-{number}.pdf', DOCUMENT + str(number).encode(), 'application/pdf')
+
+
+def run(users, journeys, concurrency, seed_value):
+    from django.db import connections
+    from django.test import Client
+
+    recorder = Recorder()
+    rng = random.Random(seed_value)
+    names = list(JOURNEYS)
+    plan = rng.choices(names, weights=[JOURNEYS[name][1] for name in names], k=journeys)
+    numbers = itertools.count(1)
+    lock = threading.Lock()
+    counts = defaultdict(int)
+
+    def journey(name):
+        with lock:
+            number = next(numbers)
+            counts[name] += 1
+        client = Client()
+        if name != 'new_student':
+            client.force_login(users[number % len(users)])
+        try:
+            JOURNEYS[name][0](recorder, client, number)
+        finally:
+            connections.close_all()  # Worker threads each hold their own connection
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        list(executor.map(journey, plan))
+    report = recorder.report(time.perf_counter() - started)
+    report['journeys'] = dict(counts)
+    return report
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(previous, current):
+    """
+    Print throughput, p95 and query count changes per endpoint against an earlier report
+    """
+    print(f'{"endpoint":40} {"rps":^18} {"p95 ms":^20} {"queries":^14}')
+    for endpoint, now in current['endpoints'].items():
+        before = previous['endpoints'].get(endpoint)
+        if before is None:
+            print(f'{endpoint:40} {"(new)":>17}')
+            continue
+        print(f'{endpoint:40} {before["requests_per_second"]:>7} -> {now["requests_per_second"]:<7} '
+              f'{before["p95_ms"]:>8} -> {now["p95_ms"]:<8} '
+              f'{before["mean_queries"]:>5} -> {now["mean_queries"]:<5}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--students', type=int, default=500, help='Seeded students for the returning journeys')
+    parser.add_argument('--journeys', type=int, default=400)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--real-password-hashing', action='store_true')
+    parser.add_argument('--output', type=Path, help='Write the JSON report here as well as to stdout')
+    parser.add_argument('--compare', type=Path, help='Earlier JSON report to print per-endpoint changes against')
+    args = parser.parse_args()
+
+    setup()
+    from django.conf import settings
+    from django.core.management import call_command
+    from benchmarks.async_views import seed
+
+    settings.DEBUG = False
+    settings.MEDIA_ROOT = Path(tempfile.mkdtemp(prefix='rcs-load-media-'))
+    settings.CHUNKED_UPLOAD_DIR = settings.MEDIA_ROOT / 'chunked_uploads'
+    if not args.real_password_hashing:
+        settings.PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+    call_command('migrate', verbosity=0)
+    users = seed(args.students)
+
+    report = {
+        'revision': git_revision(),
+        'config': {'students': args.students, 'journeys': args.journeys, 'concurrency': args.concurrency,
+                   'seed': args.seed, 'real_password_hashing': args.real_password_hashing},
+        **run(users, args.journeys, args.concurrency, args.seed),
+    }
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        args.output.write_text(output + '\n')
+    if args.compare:
+        compare(json.loads(args.compare.read_text()), report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+"""
+Hammer one SQLite file with concurrent upload writers and status readers, once with the old database settings
+(rollback journal, deferred BEGIN, Python's default 5 second lock wait) and once with SQLITE_PRAGMAS and
+BEGIN IMMEDIATE, and count "database is locked" errors.
+
+    python -m benchmarks.sqlite_concurrency --students 200 --writers 8 --readers 8 --seconds 10
+"""
+import argparse
+import json
+import multiprocessing
+import random
+import time
+
+from benchmarks._django import percentile, setup
+
+SEMESTER = 'alpha'
+SESSION = '2023/2024'
+BASELINE_PRAGMAS = {'journal_mode': 'delete', 'synchronous': 'full'}  # SQLite defaults, as before the profile
+BASELINE_OPTIONS = {}  # Deferred BEGIN
+
+
+def seed(students):
+    from django.contrib.auth.models import User
+    from MySite.models import (
+        Student, Department, Faculty, Hostel, Bursary, StudentClearanceRequests, ClearanceStatusSummary
+    )
+
+    numbers = range(1, students + 1)
+    term = {'semester': SEMESTER, 'session': SESSION}
+    User.objects.bulk_create([User(id=n, username=f'BENCH{n:07d}', password='!') for n in numbers])
+    Student.objects.bulk_create([
+        Student(user_id=n, first_name='Bench', last_name=str(n), matric_number=f'BENCH{n:07d}',
+                email=f'bench{n}@example.com') for n in numbers
+    ])
+    # The units share one table, so each takes its own range of ids
+    Department.objects.bulk_create([Department(id=n, student_id=n, name='computer_science', **term) for n in numbers])
+    Faculty.objects.bulk_create([Faculty(id=students + n, student_id=n, name='computing_and_applied_sciences', **term)
+                                 for n in numbers])
+    Hostel.objects.bulk_create([
+        Hostel(id=2 * students + n, student_id=n, name='victory_hall', **term) for n in numbers
+    ])
+    Bursary.objects.bulk_create([Bursary(id=3 * students + n, student_id=n, **term) for n in numbers])
+    StudentClearanceRequests.objects.bulk_create([
+        StudentClearanceRequests(student_id=n, department_id=n, faculty_id=students + n,
+                                 hostel_id=2 * students + n, bursary_id=3 * students + n, **term)
+        for n in numbers
+    ])
+    ClearanceStatusSummary.objects.rebuild()
+
+
+def upload(student_id, rng):
+    """
+    The writes student_upload_clearance makes: a document attached to a requirement that goes back to pending
+    """
+    from django.db import transaction
+    from MySite.models import ClearanceDocument, Department
+
+    with transaction.atomic():
+        department = Department.objects.get(student_id=student_id, semester=SEMESTER, session=SESSION)
+        document = ClearanceDocument.objects.create(
+            file=f'clearance_documents/bench-{rng.random()}.pdf', description='Bench', document_type='bio_data',
+        )
+        department.documents.add(document)
+        department.status = rng.choice(('pending', 'incomplete', 'completed'))
+        department.save()
+
+
+def read_status(student_id, rng):
+    from MySite.models import ClearanceStatusSummary
+
+    list(ClearanceStatusSummary.objects.filter(student_id=student_id).order_by('-semester')[:1])
+
+
+def worker(role, students, seconds, seed_value):
+    from django.db import OperationalError, connections
+
+    operation = upload if role == 'writer' else read_status
+    rng = random.Random(seed_value)
+    timings, locked, other_errors = [], 0, 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        try:
+            operation(rng.randint(1, students), rng)
+        except OperationalError as error:
+            if 'locked' in str(error):
+                locked += 1
+            else:
+                other_errors += 1
+            continue
+        timings.append((time.perf_counter() - started) * 1000)
+    connections.close_all()
+    return role, timings, locked, other_errors
+
+
+def run_profile(name, db_path, pragmas, options, args):
+    from django.conf import settings
+    from django.core.management import call_command
+    from django.db import connections
+
+    connections.close_all()
+    settings.DATABASES['default']['NAME'] = db_path.with_name(f'{name}.sqlite3')
+    settings.SQLITE_PRAGMAS = pragmas
+    settings.DATABASES['default']['OPTIONS'] = options
+    call_command('migrate', verbosity=0)
+    seed(args.students)
+    connections.close_all()  # Workers open their own connections after the fork
+
+    jobs = [('writer', args.students, args.seconds, n) for n in range(args.writers)]
+    jobs += [('reader', args.students, args.seconds, 1000 + n) for n in range(args.readers)]
+    with multiprocessing.get_context('fork').Pool(len(jobs)) as pool:
+        outcomes = pool.starmap(worker, jobs)
+
+    result = {}
+    for role in ('writer', 'reader'):
+        timings = [t for r, samples, _, _ in outcomes if r == role for t in samples]
+        result[f'{role}s'] = {
+            'operations_per_second': round(len(timings) / args.seconds, 1),
+            'locked_errors': sum(locked for r, _, locked, _ in outcomes if r == role),
+            'other_errors': sum(other for r, _, _, other in outcomes if r == role),
+            'p50_ms': round(percentile(timings, 0.5), 2),
+            'p99_ms': round(percentile(timings, 0.99), 2),
+        }
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--students', type=int, default=200)
+    parser.add_argument('--writers', type=int, default=8)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=10)
+    args = parser.parse_args()
+
+    db_path = setup()
+    from django.conf import settings
+
+    tuned = dict(settings.SQLITE_PRAGMAS), dict(settings.DATABASES['default']['OPTIONS'])
+    results = {
+        'baseline': run_profile('baseline', db_path, BASELINE_PRAGMAS, BASELINE_OPTIONS, args),
+        'tuned': run_profile('tuned', db_path, *tuned, args),
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
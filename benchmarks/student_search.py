@@ -0,0 +1,106 @@
+"""
+Time student searches against a generated population: FTS5 prefix queries through search_students, and the
+same words as LIKE '%word%' filters for comparison.
+
+    python -m benchmarks.student_search --students 500000
+"""
+import argparse
+import json
+import random
+import time
+
+from benchmarks._django import percentile, setup
+
+FIRST_NAMES = ('Ada', 'Bola', 'Chinedu', 'Damilola', 'Emeka', 'Funmi', 'Gbenga', 'Halima', 'Ifeoma', 'Jide',
+               'Kemi', 'Lanre', 'Musa', 'Ngozi', 'Obinna', 'Precious', 'Rukayat', 'Segun', 'Tolu', 'Uche',
+               'Victor', 'Wale', 'Yemi', 'Zainab')
+# About 2,500 distinct surnames, so a four letter prefix expands to a few dozen of them as it would in practice
+STEMS = ('Ade', 'Ba', 'Chi', 'Da', 'E', 'Fa', 'Ga', 'I', 'Ja', 'Ka', 'La', 'Ma', 'Nwa', 'O', 'Pa', 'Sa', 'Ta',
+         'U', 'Wa', 'Ya', 'Ako', 'Bi', 'Chu', 'Di', 'Eze', 'Fo', 'Gbo', 'Ibe', 'Jo', 'Ke', 'Lo', 'Mo', 'Nna',
+         'Oko', 'Po', 'Sha', 'To', 'Uzo', 'Wo', 'Yu', 'Abu', 'Ogu', 'Obi', 'Ola', 'Ona')
+ENDINGS = ('yemi', 'llo', 'kwu', 'njuma', 'ze', 'shola', 'rba', 'brahim', 'hnson', 'lu', 'wal', 'hammed', 'sou',
+           'kafor', 'lawale', 'poola', 'nni', 'iwo', 'sman', 'suf', 'nde', 'mole', 'diri', 'gbe', 'kere', 'tunde',
+           'nwa', 'chukwu', 'femi', 'bunmi', 'dele', 'kanmi', 'nso', 'yinka', 'lade', 'wumi', 'jide', 'bayo',
+           'runke', 'nike', 'mide', 'seun', 'koya', 'dipo', 'laja', 'mola', 'ruba', 'dike', 'ogu', 'emeka', 'chi',
+           'nedu', 'loye', 'sola', 'tayo')
+LAST_NAMES = tuple(stem + ending for stem in STEMS for ending in ENDINGS)
+
+
+def matric_number(number):
+    return f'DU/{2015 + number % 10}/{number:07d}'
+
+
+def seed(students, seed_value, batch_size=5000):
+    from django.contrib.auth.models import User
+    from MySite.models import Student
+
+    rng = random.Random(seed_value)
+    for start in range(0, students, batch_size):
+        numbers = range(start + 1, min(students, start + batch_size) + 1)
+        User.objects.bulk_create([User(id=n, username=f'BENCH{n:07d}', password='!') for n in numbers])
+        # bulk_create sends no signals; the index is filled afterwards by rebuild_index
+        Student.objects.bulk_create([
+            Student(user_id=n, first_name=rng.choice(FIRST_NAMES), last_name=rng.choice(LAST_NAMES),
+                    matric_number=matric_number(n), email=f'student{n}@example.com') for n in numbers
+        ])
+
+
+def time_queries(queries, search, repeat):
+    samples = []
+    for _ in range(repeat):
+        for query in queries:
+            started = time.perf_counter()
+            search(query)
+            samples.append((time.perf_counter() - started) * 1000)
+    return {'p50_ms': round(percentile(samples, 0.5), 2), 'p95_ms': round(percentile(samples, 0.95), 2),
+            'max_ms': round(max(samples), 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--students', type=int, default=500000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--like-repeat', type=int, default=1, help='Repeats of the slow LIKE comparison')
+    args = parser.parse_args()
+
+    setup()
+    from django.core.management import call_command
+    from django.db.models import Q
+    from MySite.models import Student
+    from MySite.search import rebuild_index, search_students
+
+    call_command('migrate', verbosity=0)
+    seed(args.students, args.seed)
+    started = time.perf_counter()
+    rebuild_index()
+    index_seconds = time.perf_counter() - started
+
+    rng = random.Random(args.seed + 1)
+    picks = [rng.randint(1, args.students) for _ in range(5)]
+    queries = {
+        'matric_number': [matric_number(n) for n in picks],
+        'matric_prefix': [matric_number(n)[:-2] for n in picks],
+        'email': [f'student{n}@example.com' for n in picks],
+        'first_name_prefix': [name[:3] for name in rng.sample(FIRST_NAMES, 5)],  # Too many matches to rank
+        'last_name': [rng.choice(LAST_NAMES) for _ in range(5)],
+        'first_and_last_name': [f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)[:4]}' for _ in range(5)],
+    }
+
+    def like(query):
+        students = Student.objects.all()
+        for word in query.split():
+            students = students.filter(Q(matric_number__icontains=word) | Q(first_name__icontains=word)
+                                       | Q(last_name__icontains=word) | Q(email__icontains=word))
+        return list(students[:20])
+
+    print(json.dumps({
+        'students': args.students,
+        'index_seconds': round(index_seconds, 2),
+        'fts5': {kind: time_queries(words, search_students, args.repeat) for kind, words in queries.items()},
+        'like': {kind: time_queries(words, like, args.like_repeat) for kind, words in queries.items()},
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
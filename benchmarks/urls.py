@@ -0,0 +1,11 @@
+from django.urls import include, path
+
+from MySite import async_views, views
+
+urlpatterns = [
+    path('bench/sync/student-dashboard/', views.student_dashboard_view),
+    path('bench/sync/student-clearance-status/', views.student_clearance_status),
+    path('bench/async/student-dashboard/', async_views.student_dashboard_view),
+    path('bench/async/student-clearance-status/', async_views.student_clearance_status),
+    path('', include('ResumptionClearanceSystem.urls')),  # Names used by the templates
+]